@@ -0,0 +1,90 @@
+"""I/O operations and latency of command flows.
+
+Project files are kept in memory by MemoryFileSystem with simulated
+per-operation latency, remote blog is FakeRemote from tests.  Project
+config and caches are kept in memory as well, nothing is written to disk.
+
+Run as
+$ PYTHONPATH=lib python benchmarks/command_io.py [posts] [latency_ms]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from bloggertool.commands.add import AddCommand
+from bloggertool.commands.build import BuildCommand
+from bloggertool.commands.html import HtmlCommand
+from bloggertool.commands.ls import LsCommand
+from bloggertool.commands.publish import PublishCommand
+from bloggertool.commands.push import PushCommand
+from bloggertool.config import Config
+from bloggertool.config.memory_fs import MemoryFileSystem
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'tests'))
+from fake_remote import FakeRemote
+
+SOURCE = """Title: Post {0}
+Labels: bench, label{1}
+
+# Header
+
+Paragraph with *emphasis* and `code`.
+
+* item 1
+* item 2
+"""
+
+
+def run(project, fs, remote, cls, **kwargs):
+    fs.invalidate()
+    fs.impl.reset_counts()
+    start = time.time()
+    cmd = cls(argparse.Namespace(**kwargs))
+    cmd.load_config(argparse.Namespace(interactive=False),
+                    cwd=project, fs=fs, remote=remote)
+    config = cmd.config
+    try:
+        cmd.run()
+        if config.need_save:
+            config.save()
+    finally:
+        config.close()
+    elapsed = time.time() - start
+    impl = fs.impl
+    print '%-8s %6d ops %8d bytes read %8d bytes written %8.1f msec' % (
+        cls.NAME, impl.total, impl.bytes_read, impl.bytes_written,
+        elapsed * 1e3)
+    print '         %s' % ', '.join('%s=%d' % item
+                                    for item in sorted(impl.counts.items()))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) / 1e3 if len(sys.argv) > 2 else 0.1e-3
+    root = '/bench'
+    fs = MemoryFileSystem(root, latency)
+    for name in (Config.CONFIG_FILENAME, Config.SECRET_FILENAME):
+        fs.private.store(os.path.join(root, name), '')
+    remote = FakeRemote()
+    files = []
+    for i in xrange(count):
+        fname = os.path.join(root, 'p%d.md' % i)
+        fs.impl.store(fname, SOURCE.format(i, i % 10), mtime=1000)
+        files.append(fname)
+
+    run(root, fs, remote, AddCommand, files=files)
+    run(root, fs, remote, BuildCommand, root=root, always=False, jobs=1)
+    run(root, fs, remote, BuildCommand, root=root, always=False, jobs=1)
+    run(root, fs, remote, HtmlCommand, file=files[0],
+        always=False, serve=False)
+    run(root, fs, remote, LsCommand, root=root, long=True, sort='name',
+        label=['bench'], any_label=[])
+    run(root, fs, remote, PublishCommand, file=files[0], always=False)
+    run(root, fs, remote, PushCommand, file=files[0], always=False)
+
+
+if __name__ == '__main__':
+    main()
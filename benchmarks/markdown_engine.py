@@ -0,0 +1,66 @@
+"""Per document latency of Markdown rendering.
+
+Compares new markdown.Markdown instance for every document
+with engine cached by get_engine and reset between documents.
+
+Run as
+$ PYTHONPATH=lib python benchmarks/markdown_engine.py [count]
+"""
+
+import sys
+import time
+
+import markdown
+
+from bloggertool.engine import get_engine, MARKDOWN
+
+SAMPLE = u"""Title: Some post title
+Labels: python, bloggertool
+
+[TOC]
+
+# Header
+
+Paragraph with *emphasis*, `code` and footnote[^1].
+
+## Subheader
+
+* item 1
+* item 2
+
+Term
+:   Definition
+
+| a | b |
+|---|---|
+| 1 | 2 |
+
+[^1]: Footnote text.
+"""
+
+
+def bench(title, count, func):
+    start = time.time()
+    for i in xrange(count):
+        func(SAMPLE)
+    elapsed = time.time() - start
+    print '%-20s %8.1f usec/doc' % (title, elapsed / count * 1e6)
+
+
+def fresh(source):
+    md = markdown.Markdown(extensions=get_engine(MARKDOWN).MARKDOWN_EXTS)
+    return md.convert(source)
+
+
+def cached(source):
+    return get_engine(MARKDOWN).do(source)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    bench('new Markdown', count, fresh)
+    bench('cached engine', count, cached)
+
+
+if __name__ == '__main__':
+    main()
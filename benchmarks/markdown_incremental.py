@@ -0,0 +1,58 @@
+"""Re-render latency of large Markdown post after small edit.
+
+Simulates `html --serve` loop: one paragraph of long post is changed
+between renders.  Compares full render with block by block one.
+
+Run as
+$ PYTHONPATH=lib python benchmarks/markdown_incremental.py [sections]
+"""
+
+import sys
+import time
+
+from bloggertool.engine.markdown import Engine
+
+SECTION = u"""## Section {0}
+
+Paragraph {0} with *emphasis*, `code`, [link][home] and HTML.
+
+* item 1
+* item 2
+
+Term {0}
+:   Definition
+
+```
+code {0}
+```
+
+"""
+
+FOOTER = u"""[home]: http://example.com "Home"
+*[HTML]: Hyper Text Markup Language
+"""
+
+
+def bench(title, engine, sections, count):
+    body = [SECTION.format(i) for i in xrange(sections)]
+    engine.do(u''.join(body) + FOOTER)  # warm up
+    start = time.time()
+    for i in xrange(count):
+        body[sections // 2] = SECTION.format('edit %d' % i)
+        engine.do(u''.join(body) + FOOTER)
+    elapsed = time.time() - start
+    print '%-20s %8.1f msec/render' % (title, elapsed / count * 1e3)
+
+
+def main():
+    sections = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    full = Engine()
+    full.INCREMENTAL_SIZE = sys.maxint
+    bench('full render', full, sections, 10)
+    incremental = Engine()
+    incremental.INCREMENTAL_SIZE = 0
+    bench('incremental', incremental, sections, 10)
+
+
+if __name__ == '__main__':
+    main()
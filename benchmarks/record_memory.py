@@ -0,0 +1,84 @@
+"""Memory and attribute access cost of config records.
+
+Compares slotted Post records with plain __dict__ based objects
+holding the same values.
+
+Run as
+$ PYTHONPATH=lib python benchmarks/record_memory.py [count]
+"""
+
+import gc
+import sys
+import timeit
+
+from bloggertool.config.post import Post
+
+SAMPLE = {
+    'name': 'dir/some-post',
+    'file': 'dir/some-post.md',
+    'link': 'http://example.blogspot.com/2011/02/some-post.html',
+    'postid': '1234567890',
+    'title': 'Some post title',
+    'slug': 'some-post',
+    'labels': ['python', 'bloggertool'],
+    'published': 1298032285,
+    'updated': 1298032285,
+    'local_stamp': 1298032285,
+    'file_encoding': '',
+    'doctype': 'Markdown',
+    'changed': False,
+}
+
+
+class DictRecord(object):
+    """Storage layout used before slotted records"""
+    def __init__(self, post):
+        self._config = None
+        self._changed = post.changed
+        self.need_save = False
+        for name, attr in Post.__attrs__.iteritems():
+            setattr(self, '_' + name, attr.get_val(post))
+
+
+def make_posts(count):
+    ret = []
+    for i in xrange(count):
+        dct = dict(SAMPLE)
+        dct['name'] = '%s-%d' % (SAMPLE['name'], i)
+        ret.append(Post.from_dict(dct))
+    return ret
+
+
+def sizeof(obj):
+    size = sys.getsizeof(obj)
+    dct = getattr(obj, '__dict__', None)
+    if dct:
+        size += sys.getsizeof(dct)
+    return size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    gc.collect()
+    posts = make_posts(count)
+    dicts = [DictRecord(post) for post in posts]
+
+    slotted = sum(sizeof(post) for post in posts)
+    plain = sum(sizeof(obj) for obj in dicts)
+    print "%d records, container size without shared values" % count
+    print "  __dict__ records: %10d bytes (%d per record)" % (
+        plain, plain // count)
+    print "  slotted records:  %10d bytes (%d per record)" % (
+        slotted, slotted // count)
+    print "  saved: %.1f%%" % (100.0 * (plain - slotted) / plain)
+
+    post = posts[0]
+    number = 1000000
+    t = timeit.timeit(lambda: post.title, number=number)
+    print "attr read: %.3f usec" % (t / number * 1e6)
+    t = timeit.timeit(lambda: Post.title.get_val(post), number=number)
+    print "get_val:   %.3f usec" % (t / number * 1e6)
+
+
+if __name__ == '__main__':
+    main()
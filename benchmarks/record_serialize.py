@@ -0,0 +1,85 @@
+"""Throughput of config record loading and dumping.
+
+Compares compiled Record.from_dict/to_dict with generic loops
+over __attrs__ used before.
+
+Run as
+$ PYTHONPATH=lib python benchmarks/record_serialize.py [count]
+"""
+
+import sys
+import time
+
+from bloggertool.config.post import Post
+
+SAMPLE = {
+    'name': 'dir/some-post',
+    'file': 'dir/some-post.md',
+    'link': 'http://example.blogspot.com/2011/02/some-post.html',
+    'postid': '1234567890',
+    'title': 'Some post title',
+    'slug': 'some-post',
+    'labels': ['python', 'bloggertool'],
+    'published': 1298032285,
+    'updated': 1298032285,
+    'local_stamp': 1298032285,
+    'file_encoding': '',
+    'doctype': 'Markdown',
+    'changed': False,
+}
+
+
+def generic_from_dict(cls, dct):
+    instance = cls.__new__(cls)
+    instance._config = None
+    instance.need_save = False
+    for name, val in dct.iteritems():
+        if name in cls.__attrs__:
+            attr = cls.__attrs__[name]
+            value = attr.from_yaml(val)
+            attr.setup(instance, value)
+    instance._changed = bool(dct.get('changed', True))
+    return instance
+
+
+def generic_to_dict(self):
+    ret = {}
+    for name, attr in self.__attrs__.iteritems():
+        val = attr.get_val(self)
+        ret[name] = attr.to_yaml(val)
+    ret['changed'] = self._changed
+    return ret
+
+
+def measure(title, func, items):
+    start = time.time()
+    for item in items:
+        func(item)
+    elapsed = time.time() - start
+    print "  %-10s %8.3f sec %10d records/sec" % (
+        title, elapsed, len(items) / elapsed)
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    dicts = []
+    for i in xrange(count):
+        dct = dict(SAMPLE)
+        dct['name'] = '%s-%d' % (SAMPLE['name'], i)
+        dicts.append(dct)
+
+    print "load %d posts" % count
+    generic = measure('generic', lambda d: generic_from_dict(Post, d), dicts)
+    compiled = measure('compiled', Post.from_dict, dicts)
+    print "  speedup: %.2fx" % (generic / compiled)
+
+    posts = [Post.from_dict(d) for d in dicts]
+    print "dump %d posts" % count
+    generic = measure('generic', generic_to_dict, posts)
+    compiled = measure('compiled', Post.to_dict, posts)
+    print "  speedup: %.2fx" % (generic / compiled)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Per document latency of ReST rendering compared with Markdown.
+
+ReST document is rendered by publish_parts call for every document,
+by engine parsing every document with prepared settings and by
+engine with cached doctree, when only html writer runs.
+The same text in Markdown is rendered by cached Markdown engine.
+
+Run as
+$ PYTHONPATH=lib python benchmarks/rest_engine.py [count]
+"""
+
+import sys
+import time
+
+from docutils.core import publish_parts
+
+from bloggertool.engine import get_engine, MARKDOWN
+from bloggertool.engine.rest import Engine
+
+REST_SAMPLE = u"""==================
+Some post title
+==================
+
+Paragraph with *emphasis*, ``code`` and footnote [#]_.
+
+Subheader
+---------
+
+* item 1
+* item 2
+
+Term
+    Definition
+
+=== ===
+ a   b
+=== ===
+ 1   2
+=== ===
+
+.. [#] Footnote text.
+"""
+
+MARKDOWN_SAMPLE = u"""Title: Some post title
+
+Paragraph with *emphasis*, `code` and footnote[^1].
+
+## Subheader
+
+* item 1
+* item 2
+
+Term
+:   Definition
+
+| a | b |
+|---|---|
+| 1 | 2 |
+
+[^1]: Footnote text.
+"""
+
+
+def bench(title, count, func, source):
+    func(source)  # warm up
+    start = time.time()
+    for i in xrange(count):
+        func(source)
+    elapsed = time.time() - start
+    print '%-20s %8.1f usec/doc' % (title, elapsed / count * 1e6)
+
+
+def publish(source):
+    return publish_parts(source, writer_name='html4css1',
+                         settings_overrides={'output_encoding': 'unicode'})
+
+
+class ParsingEngine(Engine):
+    """Engine without doctree cache"""
+    DOCTREE_CACHE_SIZE = 0
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    bench('publish_parts', count, publish, REST_SAMPLE)
+    bench('rest engine', count, ParsingEngine().do, REST_SAMPLE)
+    bench('rest cached doctree', count, Engine().do, REST_SAMPLE)
+    bench('markdown engine', count, get_engine(MARKDOWN).do,
+          MARKDOWN_SAMPLE)
+
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,7 @@ from .basecommand import BaseCommand
 from .ls import LsCommand
 from .add import AddCommand
 from .html import HtmlCommand
+from .build import BuildCommand
 from .link import LinkCommand
 from .info import InfoCommand
 from .rinfo import RInfoCommand
@@ -22,12 +23,14 @@ from .rm import RmCommand
 from .label import LabelCommand
 from .publish import PublishCommand
 from .show import ShowCommand
+from .migrate import MigrateCommand
 
-commands = [LsCommand, AddCommand, HtmlCommand, LinkCommand,
+commands = [LsCommand, AddCommand, HtmlCommand, BuildCommand, LinkCommand,
             InfoCommand, RInfoCommand, RLsCommand,
             DiffCommand, OpenCommand, ROpenCommand,
             PushCommand,
             InitCommand, RmCommand,
-            LabelCommand, PublishCommand, ShowCommand]
+            LabelCommand, PublishCommand, ShowCommand,
+            MigrateCommand]
 
 __all__ = [cls.__name__ for cls in commands + [BaseCommand]]
@@ -15,7 +15,10 @@ class AddCommand(BaseCommand):
     NAME = 'add'
     HELP = "Add md file"
     DESCR = dedent("""\
-    Add md file to project
+    Add md file to project.
+
+    Doctype, title and word count are scanned from source
+    without rendering.
     """)
 
     @classmethod
@@ -45,6 +48,10 @@ class AddCommand(BaseCommand):
 
             name = config.fs.replace_ext(rel_path, '')
 
-            self.log.info("Add %s -> %s", qname(name), qname(rel_path))
-
-            config.add(name, rel_path)
+            post = config.add(name, rel_path)
+            # doctype is scanned by post, show the rest of metadata
+            meta = post.scan()
+            title = meta.title if meta.title is not None else ''
+            self.log.info("Add %s -> %s [%s, %d words] %s",
+                          qname(name), qname(rel_path),
+                          meta.doctype, meta.words, title)
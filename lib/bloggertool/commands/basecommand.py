@@ -19,8 +19,11 @@ class BaseCommand(object):
 
     require_load_config = True
     require_interactive = False
+    # read only commands share project lock and can run in parallel
+    read_only = False
 
-    def load_config(self, args):
-        self.config = Config.load()
+    def load_config(self, args, cwd=None, fs=None, remote=None):
+        self.config = Config.load(exclusive=not self.read_only, cwd=cwd,
+                                  fs=fs, remote=remote)
         if self.require_interactive:
             self.config.interactive = args.interactive
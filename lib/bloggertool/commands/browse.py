@@ -8,14 +8,14 @@
 from textwrap import dedent
 import webbrowser
 
-from bloggertool.notify import Notifier
 from bloggertool.str_util import T, a
 from bloggertool.exceptions import ConfigError
 
 from .basecommand import BaseCommand
+from .serve import ServeCommand
 
 
-class OpenCommand(BaseCommand):
+class OpenCommand(ServeCommand):
     NAME = 'open'
     HELP = "Open browser with local html output for post."
     DESCR = dedent("""\
@@ -53,16 +53,14 @@ class OpenCommand(BaseCommand):
                 """))
 
         post.refresh_html(self.always)
+        # html is written in background, browser should see whole file
+        config.fs.flush()
         abs_path = config.fs.abs_path(post.nice_html_path)
         self.log.info("Opening '%s'", abs_path)
         webbrowser.open('file:///' + abs_path)
 
         if self.serve:
-            notifier = Notifier(config.fs.root)
-            notifier.add(config.fs.abs_path(post.file),
-                         post.refresh_html, force=False)
-            self.log.info(T("Run serve loop"))
-            notifier.loop()
+            self.serve_loop([post])
 
 
 class ROpenCommand(BaseCommand):
@@ -71,6 +69,7 @@ class ROpenCommand(BaseCommand):
     DESCR = dedent("""\
     Open browser with remote html output for post
     """)
+    read_only = True
 
     @classmethod
     def fill_parser(cls, parser):
@@ -0,0 +1,167 @@
+# commands/build.py
+# Copyright (C) 2011-2014 Andrew Svetlov
+# andrew.svetlov@gmail.com
+#
+# This module is part of BloggerTool and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+import multiprocessing
+import time
+
+from bloggertool.config.file_system import FileSystem
+from bloggertool.config.post import render_source
+from bloggertool.exceptions import ConfigError, FileError
+from bloggertool.str_util import T, a
+from .basecommand import BaseCommand
+from .ls import select_posts
+
+
+def render(task, fs=None):
+    """Render post source in worker process"""
+    name, root, file, doctype, encoding, cache, lookup = task
+    if fs is None:
+        fs = FileSystem(root)
+    try:
+        return name, render_source(fs, file,
+                                   doctype, encoding, cache, lookup), None
+    except Exception as ex:
+        return name, None, '%s: %s' % (type(ex).__name__, ex)
+
+
+class BuildCommand(BaseCommand):
+    NAME = 'build'
+    HELP = T("Generate html for all stale posts.")
+    DESCR = T("""
+    Generate html for registered posts in folder (current one by default)
+    using the same rules as 'ls'. Only posts with changed source,
+    template or engine are processed.
+
+    Sources are rendered in parallel by --jobs worker processes,
+    post title, slug and labels are updated from rendered metadata.
+    Posts which cannot be built are reported and skipped, exit status
+    is 1 in that case.
+    """)
+
+    require_interactive = True
+
+    @classmethod
+    def fill_parser(cls, parser):
+        parser.add_argument('root', nargs='?', default='.',
+                            help=T("folder or md file to build"))
+        parser.add_argument('--always', default=False, action='store_true',
+                            help=T("Always regenerate html files"))
+        parser.add_argument('-j', '--jobs', type=int,
+                            default=multiprocessing.cpu_count(),
+                            help=T("number of worker processes, "
+                                   "default is number of CPUs"))
+
+    def __init__(self, args):
+        self.root = args.root
+        self.always = args.always
+        self.jobs = args.jobs
+
+    def run(self):
+        config = self.config
+        if self.jobs < 1:
+            raise ConfigError(T("--jobs should be positive"))
+
+        started = time.time()
+        self.rendered = self.skipped = self.failed = 0
+
+        sources = []
+        templates = []
+        for post in select_posts(config, self.root):
+            try:
+                if self.always or not post.is_inner_html_fresh:
+                    sources.append(post)
+                elif not post.is_nice_html_fresh:
+                    templates.append(post)
+                else:
+                    self.skipped += 1
+            except FileError as ex:
+                self.failed += 1
+                self.log.error(a("Cannot build {post.name!q}: {ex}"))
+
+        for post in templates:
+            self.log.info(a("Apply template for {post.name!q}"))
+            with config.fs.open(post.inner_html_path, 'r') as f:
+                self.store(post, None, f.read())
+
+        for name, result, error in self.render(sources):
+            post = config[name]
+            if error is not None:
+                self.failed += 1
+                self.log.error(a("Cannot render {post.name!q}: {error}"))
+                continue
+            st, digest, inner_html, meta = result
+            if inner_html is None:
+                self.skipped += 1
+                self.log.warning("Empty source file: '%s'", post.file)
+                continue
+            self.log.info(a("Generate html for {post.name!q}"))
+            self.store(post, result, inner_html)
+
+        if sources:
+            # entries were written by workers
+            config.render_cache.trim(force=True)
+
+        elapsed = time.time() - started
+        self.log.info(T("Rendered {0}, skipped {1}, failed {2} posts "
+                        "in {3:.2f} sec")
+                      .format(self.rendered, self.skipped, self.failed,
+                              elapsed))
+        if self.failed:
+            return 1
+
+    def render(self, posts):
+        root = self.config.root
+        # render cache is safe for concurrent use by worker processes
+        cache = self.config.render_cache
+        lookup = not self.always
+        tasks = [(post.name, root, post.file, post.doctype,
+                  post.effective_encoding, cache, lookup) for post in posts]
+        jobs = min(self.jobs, len(tasks))
+        if jobs > 1 and type(self.config.fs) is not FileSystem:
+            # workers read sources from disk, injected file system
+            # isn't shared with them
+            self.log.debug("Render in main process for %r", self.config.fs)
+            jobs = 1
+        if jobs <= 1:
+            self.warm_up()
+            for task in tasks:
+                yield render(task, self.config.fs)
+            return
+        pool = multiprocessing.Pool(jobs)
+        try:
+            results = pool.imap_unordered(render, tasks)
+            self.warm_up()
+            # results are merged while other posts are rendering
+            for result in results:
+                yield result
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def warm_up(self):
+        """Load template while workers are rendering"""
+        info = self.config.info
+        if info.has_template:
+            try:
+                info.warm_up_template()
+            except ConfigError as ex:
+                # reported for every post by store
+                self.log.debug("%s", ex)
+
+    def store(self, post, result, inner_html):
+        """Update post from render result in main process"""
+        try:
+            if result is not None:
+                st, digest, inner_html, meta = result
+                post.store_inner_html(st, digest, inner_html, meta)
+            post.generate_nice_html(inner_html)
+        except ConfigError as ex:
+            self.failed += 1
+            self.log.error("%s", ex)
+        else:
+            self.rendered += 1
@@ -6,12 +6,11 @@
 # the MIT License: http://www.opensource.org/licenses/mit-license.php
 
 from bloggertool.exceptions import ConfigError
-from bloggertool.notify import Notifier
 from bloggertool.str_util import T, a
-from .basecommand import BaseCommand
+from .serve import ServeCommand
 
 
-class HtmlCommand(BaseCommand):
+class HtmlCommand(ServeCommand):
     NAME = 'html'
     HELP = T("Generate html output for md files.")
     DESCR = T("""
@@ -62,9 +61,4 @@ class HtmlCommand(BaseCommand):
                 self.log.info(a("Skip fresh {post.name!q}"))
 
         if self.serve:
-            notifier = Notifier(config.fs.root)
-            for post in posts:
-                notifier.add(config.fs.abs_path(post.file),
-                             post.refresh_html, force=False)
-            self.log.info(T("Run serve loop"))
-            notifier.loop()
+            self.serve_loop(posts)
@@ -8,6 +8,7 @@
 import os
 from textwrap import dedent
 
+from bloggertool.config.render_cache import RenderCache
 from bloggertool.exceptions import ConfigError
 from bloggertool.str_util import T, a
 from .basecommand import BaseCommand
@@ -51,14 +52,22 @@ class InfoCommand(BaseCommand):
         parser.add_argument('--source-encoding',
                             help=T("""
                                 set default encoding for source files"""))
+        parser.add_argument('--render-cache-size', type=int,
+                            help=T("""
+                                set size limit of rendered html cache
+                                in megabytes"""))
 
     def __init__(self, args):
         self.blogid = args.blogid
         self.template = args.template
         self.drop_template = args.drop_template
         self.source_encoding = args.source_encoding
+        self.render_cache_size = args.render_cache_size
         self.has_updates = any(
             (getattr(args, name) for name in self.FLAGS))
+        # zero size is valid value
+        self.has_updates |= self.render_cache_size is not None
+        self.read_only = not self.has_updates
 
     def run(self):
         config = self.config
@@ -66,6 +75,9 @@ class InfoCommand(BaseCommand):
         info = config.info
 
         if not self.has_updates:
+            size = info.render_cache_size
+            if size is None:
+                size = RenderCache.DEFAULT_SIZE
             out = T("""
                 User info:
                     blogid: {info.blogid!N}
@@ -74,7 +86,8 @@ class InfoCommand(BaseCommand):
                         dir: {info.template_dir!N}
                         file: {info.template_file!N}
                     source-encoding: {info.effective_source_encoding}
-                """)(info=info)
+                    render-cache-size: {size} MB
+                """)(info=info, size=size)
             self.log.info(out)
         else:
             if self.blogid is not None:
@@ -96,5 +109,9 @@ class InfoCommand(BaseCommand):
                 info.template_file = fname
             if self.source_encoding:
                 info.source_encoding = self.source_encoding
+            if self.render_cache_size is not None:
+                if self.render_cache_size < 0:
+                    raise ConfigError("Cache size should not be negative")
+                info.render_cache_size = self.render_cache_size
 
             self.log.info("User updated")
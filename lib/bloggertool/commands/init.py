@@ -28,9 +28,14 @@ class InitCommand(BaseCommand):
     def fill_parser(cls, parser):
         parser.add_argument('root',
                             help="project root")
+        parser.add_argument('--journal', default=False, action='store_true',
+                            help="keep append-only journal of changes "
+                            "instead of rewriting whole config on save. "
+                            "See topic 'storage' for more information")
 
     def __init__(self, args):
         self.root = args.root
+        self.journal = args.journal
 
     def gen_exc(self, root):
         return ConfigError("Already a project: %s" % qname(root))
@@ -47,5 +52,9 @@ class InitCommand(BaseCommand):
                 raise self.gen_exc(root)
             with open(config_filename, 'w'):
                 self.log.info("Create project %s", qname(root))
+            if self.journal:
+                journal_filename = os.path.join(root, Config.JOURNAL_FILENAME)
+                with open(journal_filename, 'w'):
+                    pass
         else:
             raise self.gen_exc(root)
@@ -19,6 +19,9 @@ class LabelCommand(BaseCommand):
     --add adds labels to post.
     --set overrides all post labels.
     --remove drops specified labels, if present.
+    --rename OLD NEW replaces label in all project posts.
+    Without files and options shows all project labels
+    with count of posts.
     Labels should be single comma separated values, so use brackets:
     blog label --add "python, bloggertool"
     """)
@@ -31,15 +34,25 @@ class LabelCommand(BaseCommand):
         labels.add_argument('-a', '--add', help="add labels")
         labels.add_argument('-s', '--set', help="set labels")
         labels.add_argument('-r', '--rm', help="remove labels")
+        labels.add_argument('--rename', nargs=2, metavar=('OLD', 'NEW'),
+                            help="rename label in all posts")
 
     def __init__(self, args):
         self.files = args.files
         self.set = args.set
         self.add = args.add
         self.rm = args.rm
+        self.rename = args.rename
+        self.read_only = not (self.add or self.set or self.rm or self.rename)
 
     def run(self):
         config = self.config
+        if self.rename:
+            self.do_rename()
+            return
+        if not self.files:
+            self.show_counts()
+            return
         for fname in self.files:
             post = config.post_by_path(fname)
             if not post:
@@ -59,6 +72,20 @@ class LabelCommand(BaseCommand):
             else:
                 self.log.info(a("Labels for post {post.name!q}: {labels}"))
 
+    def do_rename(self):
+        old, new = [l.strip() for l in self.rename]
+        posts = self.config.rename_label(old, new)
+        count = len(posts)
+        self.log.info(a("Label {old!q} renamed to {new!q} in {count} posts"))
+
+    def show_counts(self):
+        counts = self.config.label_counts()
+        if not counts:
+            self.log.info("No labels")
+            return
+        out = ['%s: %d' % (label, counts[label]) for label in sorted(counts)]
+        self.log.info("Labels:\n%s", '\n'.join(out))
+
     def do_add(self, post):
         labels = self.labels_to_list(self.add)
         val = set(post.labels)
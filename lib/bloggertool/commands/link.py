@@ -43,6 +43,12 @@ class LinkCommand(BaseCommand):
                            "at remote side", qname(post.name))
             return
 
+        other = config.post_by_link(self.url)
+        if other is not None:
+            self.log.error("Post %s already linked to %s",
+                           qname(other.name), self.url)
+            return
+
         srv = config.info.remote()
 
         rposts = srv.get_posts()
@@ -9,9 +9,35 @@ import itertools
 
 from textwrap import dedent
 
+from bloggertool.config.post import Post
 from .basecommand import BaseCommand
 
 
+def select_posts(config, root, labels=(), any_labels=()):
+    """Posts for root folder or md file, sorted by name.
+
+    Optionally posts should have all `labels` and any of `any_labels`.
+    """
+    root = config.fs.expand_path(root)
+    rel_root = config.fs.rel_path(root)
+
+    def good(post):
+        return post.file.startswith(rel_root)
+
+    # post name is post file without .md extension
+    if rel_root.endswith('.md'):
+        prefix = config.fs.replace_ext(rel_root, '')
+    else:
+        prefix = rel_root
+
+    names = config.index.by_prefix(prefix)
+    if labels or any_labels:
+        labeled = set(config.index.by_labels(labels, any_labels))
+        names = [name for name in names if name in labeled]
+
+    return itertools.ifilter(good, (config[name] for name in names))
+
+
 class LsCommand(BaseCommand):
     NAME = 'ls'
     HELP = 'Display list of registered posts.'
@@ -22,7 +48,16 @@ class LsCommand(BaseCommand):
 
     Values / and ~ has special meaning - both points to root of local
     project.
+
+    --label shows only posts having all specified labels,
+    --any-label shows posts having at least one of them.
+
+    Long format also shows doctype, word count and source metadata
+    not applied to post yet, sources are scanned without rendering.
     """)
+    read_only = True
+
+    TIME_KEYS = ('published', 'updated', 'local_stamp')
 
     @classmethod
     def fill_parser(cls, parser):
@@ -31,23 +66,37 @@ class LsCommand(BaseCommand):
         parser.add_argument('-l', '--long', default=False,
                             action='store_true',
                             help="long output format")
+        parser.add_argument('-s', '--sort', default='name',
+                            choices=('name',) + cls.TIME_KEYS,
+                            help="sort by name (default) or by time, "
+                            "newest first")
+        parser.add_argument('--label', action='append', default=[],
+                            help="show posts with label, can be repeated")
+        parser.add_argument('--any-label', action='append', default=[],
+                            help="show posts with any of labels, "
+                            "can be repeated")
 
     def __init__(self, args):
         self.root = args.root
         self.long = args.long
+        self.sort = args.sort
+        self.labels = args.label
+        self.any_labels = args.any_label
 
     def run(self):
-        config = self.config
-        root = config.fs.expand_path(self.root)
-        rel_root = config.fs.rel_path(root)
-
-        def good(post):
-            return post.file.startswith(rel_root)
+        posts = select_posts(self.config, self.root,
+                             self.labels, self.any_labels)
+        if self.sort in self.TIME_KEYS:
+            # compare raw integer stamps, don't decode datetimes
+            key = getattr(Post, self.sort).stamp
+            posts = sorted(posts, key=key, reverse=True)
 
         out = []
-        filtered = itertools.ifilter(good, config)
-        for post in sorted(filtered, key=lambda p: p.name):
-            out.append(post.info_list(self.long))
+        for post in posts:
+            info = post.info_list(self.long)
+            if self.long:
+                info += '\n' + post.source_info()
+            out.append(info)
 
         if not out:
             self.log.info("No posts")
@@ -0,0 +1,59 @@
+# commands/migrate.py
+# Copyright (C) 2011-2014 Andrew Svetlov
+# andrew.svetlov@gmail.com
+#
+# This module is part of BloggerTool and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+from bloggertool.config.storage import storages
+from bloggertool.str_util import T, a
+from .basecommand import BaseCommand
+
+
+class MigrateCommand(BaseCommand):
+    NAME = 'migrate'
+    HELP = T("Convert project database to other storage.")
+    DESCR = T("""
+        Convert project database to other storage.
+        See topic 'storage' for list of available storages.
+        """)
+
+    STORAGES = dict((cls.NAME, cls) for cls in storages)
+
+    @classmethod
+    def fill_parser(cls, parser):
+        parser.add_argument('storage', choices=sorted(cls.STORAGES),
+                            help=T("target storage"))
+
+    def __init__(self, args):
+        self.storage = args.storage
+
+    def run(self):
+        config = self.config
+        source = config.storage
+        if source.NAME == self.storage:
+            self.log.info(a("Project already uses {self.storage} storage"))
+            return
+
+        target = self.STORAGES[self.storage](config)
+        target.create()
+
+        close = getattr(source, 'close', None)
+        if close is not None:
+            close()
+        impl = config.fs.private
+        for fname in source.files:
+            if fname in target.files:
+                continue
+            if fname == config.config_filename:
+                # keep empty file as project root marker
+                with impl.open(fname, 'w'):
+                    pass
+            elif impl.isdir(fname):
+                impl.rmtree(fname)
+            else:
+                impl.remove(fname)
+
+        config._storage = target
+        self.log.info(a("Project converted from {source.NAME} "
+                        "to {target.NAME} storage"))
@@ -63,5 +63,5 @@ class PublishCommand(BaseCommand):
                       qname(post.name), post.link, post.postid)
 
     def check_post(self, post):
-        post.refresh_html(self.always)
+        post.refresh_html(self.always, (post.INNER,))
         # add check for non-empty title, labels, etc...
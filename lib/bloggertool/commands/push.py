@@ -40,7 +40,7 @@ class PushCommand(BaseCommand):
                            self.file)
             return
 
-        post.refresh_html(self.always)
+        post.refresh_html(self.always, (post.INNER,))
 
         srv = config.info.remote()
 
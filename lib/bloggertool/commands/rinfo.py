@@ -17,6 +17,7 @@ class RInfoCommand(BaseCommand):
     DESCR = dedent("""\
     Display info for remote site.
     """)
+    read_only = True
 
     @classmethod
     def fill_parser(cls, parser):
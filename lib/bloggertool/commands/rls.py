@@ -17,6 +17,7 @@ class RLsCommand(BaseCommand):
     DESCR = dedent("""\
     Display list of remove posts.
     """)
+    read_only = True
 
     @classmethod
     def fill_parser(cls, parser):
@@ -0,0 +1,59 @@
+# commands/serve.py
+# Copyright (C) 2011-2014 Andrew Svetlov
+# andrew.svetlov@gmail.com
+#
+# This module is part of BloggerTool and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+from bloggertool.config import Config
+from bloggertool.notify import Notifier
+from bloggertool.str_util import T
+from .basecommand import BaseCommand
+
+
+class ServeCommand(BaseCommand):
+    """Base for commands regenerating html in --serve loop.
+
+    Project lock is not held while waiting for source changes,
+    so other commands can run in parallel with serve loop.
+    """
+
+    def serve_loop(self, posts):
+        """Refresh html of posts on source change, never returns"""
+        config = self.config
+        root = config.root
+        files = [(config.fs.abs_path(post.file), post.name)
+                 for post in posts]
+        self.release_config()
+        notifier = Notifier(root)
+        for path, name in files:
+            notifier.add(path, self.refresh, root, name)
+        self.log.info(T("Run serve loop"))
+        notifier.loop()
+
+    def release_config(self):
+        """Save and unlock config loaded by command"""
+        config = self.config
+        self.interactive = config.interactive
+        try:
+            if config.need_save:
+                config.save()
+        finally:
+            config.close()
+        self.config = None
+
+    def refresh(self, root, name):
+        # config can be changed by other process while waiting,
+        # reload it under exclusive lock
+        config = Config.load(exclusive=True, cwd=root)
+        try:
+            config.interactive = self.interactive
+            if name not in config:
+                self.log.warning(T("Post {0!q} is not registered anymore")
+                                 .format(name))
+                return
+            config[name].refresh_html(force=False)
+            if config.need_save:
+                config.save()
+        finally:
+            config.close()
@@ -34,6 +34,7 @@ class ShowCommand(BaseCommand):
         self.file = args.file
         self.slug = args.slug
         self.title = args.title
+        self.read_only = not self.slug and not self.title
 
     def run(self):
         config = self.config
@@ -43,7 +44,8 @@ class ShowCommand(BaseCommand):
             return
 
         if not self.slug and not self.title:
-            self.log.info("Post %s", post.info_list(True))
+            self.log.info("Post %s\n%s", post.info_list(True),
+                          post.source_info())
             return
 
         if self.slug:
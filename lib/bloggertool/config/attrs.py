@@ -13,6 +13,8 @@ from dateutil.tz import tzutc
 from bloggertool.log_util import class_logger
 from bloggertool.str_util import to_unicode, from_unicode
 
+from .labels import LabelTable
+
 
 class attr(object):
     TYPE = tuple()
@@ -26,14 +28,19 @@ class attr(object):
         self._name = name
         self._attr_name = '_' + name
 
+    def slot_names(self, name):
+        """Instance slots required to store attr value"""
+        return ('_' + name,)
+
     @property
     def name(self):
         return self._name
 
     def get_val(self, instance):
-        if not hasattr(instance, self._attr_name):
+        try:
+            return getattr(instance, self._attr_name)
+        except AttributeError:
             return self._default
-        return getattr(instance, self._attr_name)
 
     def __get__(self, instance, owner):
         if instance is None:
@@ -50,8 +57,16 @@ class attr(object):
     def set_val(self, instance, value):
         old_val = self.get_val(instance)
         if old_val != value:
-            setattr(instance, self._attr_name, value)
+            self.setup(instance, value)
             instance.changed = True
+            instance.attr_changed(self._name, old_val, value)
+
+    def load(self, instance, val):
+        # restore value from yaml, should not set 'changed' flag
+        self.setup(instance, self.from_yaml(val))
+
+    def dump(self, instance):
+        return self.to_yaml(self.get_val(instance))
 
     def from_yaml(self, val):
         raise NotImplementedError(self._name)
@@ -61,25 +76,34 @@ class attr(object):
 
 
 class bool_attr(attr):
-    def from_yaml(self, val):
-        return bool(val)
+    from_yaml = to_yaml = staticmethod(bool)
+
+    def set_val(self, instance, value):
+        super(bool_attr, self).set_val(instance, bool(value))
+
+
+class int_attr(attr):
+    @staticmethod
+    def from_yaml(val):
+        if val is None:
+            return None
+        return int(val)
 
     to_yaml = from_yaml
 
     def set_val(self, instance, value):
-        super(bool_attr, self).set_val(instance, bool(value))
+        super(int_attr, self).set_val(instance, self.from_yaml(value))
 
 
 class str_attr(attr):
     # unicode actually
-    def from_yaml(self, val):
-        return to_unicode(val)
-
-    def to_yaml(self, val):
-        return from_unicode(val)
+    from_yaml = staticmethod(to_unicode)
+    to_yaml = staticmethod(from_unicode)
 
     def set_val(self, instance, value):
-        super(str_attr, self).set_val(instance, to_unicode(value))
+        if value.__class__ is not unicode:
+            value = to_unicode(value)
+        super(str_attr, self).set_val(instance, value)
 
 
 class set_of_str_attr(attr):
@@ -102,6 +126,55 @@ class set_of_str_attr(attr):
 
 
 class timestamp_attr(attr):
+    """datetime attr stored as integer epoch stamp.
+
+    datetime is decoded on first access and cached in extra slot,
+    use `stamp` for sorting and comparison without decoding.
+    """
+
+    def set_name(self, name):
+        super(timestamp_attr, self).set_name(name)
+        self._cache_name = self._attr_name + '_dt'
+
+    def slot_names(self, name):
+        return ('_' + name, '_' + name + '_dt')
+
+    def stamp(self, instance):
+        try:
+            return getattr(instance, self._attr_name)
+        except AttributeError:
+            return self.to_yaml(self._default)
+
+    def get_val(self, instance):
+        try:
+            return getattr(instance, self._cache_name)
+        except AttributeError:
+            pass
+        try:
+            stamp = getattr(instance, self._attr_name)
+        except AttributeError:
+            return self._default
+        val = self.from_yaml(stamp)
+        setattr(instance, self._cache_name, val)
+        return val
+
+    def setup(self, instance, value):
+        setattr(instance, self._attr_name, self.to_yaml(value))
+        setattr(instance, self._cache_name, value)
+
+    def load(self, instance, stamp):
+        if isinstance(stamp, datetime.datetime):
+            # yaml timestamp written by hand
+            stamp = self.to_yaml(stamp)
+        setattr(instance, self._attr_name, stamp)
+        try:
+            delattr(instance, self._cache_name)
+        except AttributeError:
+            pass
+
+    def dump(self, instance):
+        return self.stamp(instance)
+
     def from_yaml(self, stamp):
         if stamp is None:
             return None
@@ -119,7 +192,103 @@ class timestamp_attr(attr):
         super(timestamp_attr, self).set_val(instance, value)
 
 
+class labels_attr(set_of_str_attr):
+    """set of labels stored as integer bitset.
+
+    Labels are interned in shared `table`, use `bits` to get
+    raw bitset without decoding.
+    """
+    table = LabelTable()
+
+    def bits(self, instance):
+        return getattr(instance, self._attr_name, 0)
+
+    def get_val(self, instance):
+        try:
+            bits = getattr(instance, self._attr_name)
+        except AttributeError:
+            return self._default
+        return self.table.decode(bits)
+
+    def setup(self, instance, value):
+        setattr(instance, self._attr_name, self.table.encode(value))
+
+
+def overrides(a, method):
+    base = getattr(attr, method).im_func
+    return getattr(type(a), method).im_func is not base
+
+
+def compile_serializers(cls):
+    """Make straight-line from_dict and to_dict for record class.
+
+    Attr converters are bound to locals of generated functions,
+    attrs with custom `load`, `dump`, `setup` or `get_val`
+    are called through them.
+    """
+    ns = {'MISSING': object(), 'new': object.__new__}
+    load = ["def from_dict(cls, dct):",
+            "    instance = new(cls)",
+            "    instance._config = None",
+            "    instance.need_save = False",
+            "    get = dct.get"]
+    dump = ["def to_dict(self):",
+            "    return {"]
+    for name, a in sorted(cls.__attrs__.iteritems()):
+        ns['from_' + name] = a.from_yaml
+        ns['to_' + name] = a.to_yaml
+        ns['default_' + name] = a._default
+        load.append("    val = get(%r, MISSING)" % name)
+        load.append("    if val is not MISSING:")
+        if overrides(a, 'load'):
+            ns['load_' + name] = a.load
+            load.append("        load_%s(instance, val)" % name)
+        elif overrides(a, 'setup'):
+            ns['setup_' + name] = a.setup
+            load.append("        setup_%s(instance, from_%s(val))" %
+                        (name, name))
+        else:
+            load.append("        instance.%s = from_%s(val)" %
+                        (a._attr_name, name))
+        if overrides(a, 'dump'):
+            ns['dump_' + name] = a.dump
+            dump.append("        %r: dump_%s(self)," % (name, name))
+        elif overrides(a, 'get_val'):
+            ns['get_' + name] = a.get_val
+            dump.append("        %r: to_%s(get_%s(self))," %
+                        (name, name, name))
+        else:
+            dump.append("        %r: to_%s(getattr(self, %r, default_%s))," %
+                        (name, name, a._attr_name, name))
+    load.append("    instance._changed = bool(get('changed', True))")
+    load.append("    return instance")
+    dump.append("        'changed': self._changed}")
+    source = '\n'.join(load + dump) + '\n'
+    code = compile(source, '<%s serializers>' % cls.__name__, 'exec')
+    exec code in ns
+    cls.from_dict = classmethod(ns['from_dict'])
+    cls.to_dict = ns['to_dict']
+    cls.__serializers_source__ = source
+
+
 class RecordMeta(type):
+    """Collect record attrs and make slotted storage for them.
+
+    Every attr value lives in `_<name>` slot, unset slot means
+    attr default.  Records keep __dict__ for rare non-attr values.
+    Compiled `from_dict` and `to_dict` are generated for every class.
+    """
+
+    def __new__(mcls, name, bases, dct):
+        inherited = set()
+        for base in bases:
+            inherited.update(getattr(base, '__attrs__', ()))
+        slots = list(dct.get('__slots__', ()))
+        for key, val in dct.iteritems():
+            if isinstance(val, attr) and key not in inherited:
+                slots.extend(val.slot_names(key))
+        dct['__slots__'] = tuple(slots)
+        return super(RecordMeta, mcls).__new__(mcls, name, bases, dct)
 
     def __init__(cls, name, bases, dct):
         super(RecordMeta, cls).__init__(name, bases, dct)
@@ -130,20 +299,20 @@ class RecordMeta(type):
                 val.set_name(name)
                 attrs[name] = val
         cls.__attrs__ = attrs
+        compile_serializers(cls)
 
 
 class Record(object):
     """NB: recorded attributes should be immutable"""
     __metaclass__ = RecordMeta
+    __slots__ = ('_config', '_changed', 'need_save', '__dict__')
 
     log = class_logger()
 
-    need_save = False
-    _changed = True
-    _config = None
-
     def __init__(self, config):
         self._config = config
+        self._changed = True
+        self.need_save = False
 
     @property
     def config(self):
@@ -160,21 +329,7 @@ class Record(object):
         self.config.need_save = True
         self._changed = value
 
-    @classmethod
-    def from_dict(cls, dct):
-        instance = cls.__new__(cls)
-        for name, val in dct.iteritems():
-            if name in cls.__attrs__:
-                attr = cls.__attrs__[name]
-                value = attr.from_yaml(val)
-                attr.setup(instance, value)
-        instance._changed = bool(dct.get('changed', True))
-        return instance
-
-    def to_dict(self):
-        ret = {}
-        for name, attr in self.__attrs__.iteritems():
-            val = attr.get_val(self)
-            ret[name] = attr.to_yaml(val)
-        ret['changed'] = self._changed
-        return ret
+    def attr_changed(self, name, old_val, new_val):
+        """Hook called after attribute value has been changed"""
+
+    # from_dict(cls, dct) and to_dict(self) are generated by RecordMeta
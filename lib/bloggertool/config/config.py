@@ -10,34 +10,106 @@ import os
 from .info import Info
 from .post import Post
 
-import yaml
-
-from bloggertool.exceptions import RootNotFoundError
+from bloggertool.exceptions import ConfigError, RootNotFoundError
 from .file_system import FileSystem
+from .index import Index
+from .manifest import Manifest
+from .render_cache import RenderCache
+from .source_index import SourceIndex
+from .storage import detect_storage
 from bloggertool.log_util import class_logger
 
 
 class Config(object):
     CONFIG_FILENAME = '.blogspot.yaml'
+    JOURNAL_FILENAME = '.blogspot.journal'
+    DB_FILENAME = '.blogspot.db'
+    SHARDS_DIRNAME = '.blogspot'
+    CACHE_DIRNAME = '.blogspot.cache'
+    LOCK_FILENAME = '.blogspot.lock'
     SECRET_FILENAME = '.client_secret.json'
     log = class_logger()
 
-    def __init__(self, root):
-        self._fs = FileSystem(root)
+    def __init__(self, root, fs=None, remote=None):
+        # fs and remote replace disk and blogger.com in tests
+        self._fs = fs if fs is not None else FileSystem(root)
+        self._remote = remote
         self._posts = {}
+        self._records = {}
+        self._dropped = set()
+        self._index = None
         self._info = Info(self)
         self._info._config = self
+        self._storage = detect_storage(self)
+        self._lock = self._fs.lock(self.lock_filename)
+        self._manifest = Manifest(self.cache_path('manifest'),
+                                  self._fs.stats.stat, self._fs.private)
+        self._render_cache = None
+        self._source_index = None
         self.need_save = False
         self.interactive = False
 
+    @property
+    def storage(self):
+        return self._storage
+
     @property
     def fs(self):
         return self._fs
 
+    @property
+    def remote(self):
+        """Remote used instead of blogger.com or None"""
+        return self._remote
+
     @property
     def config_filename(self):
         return os.path.join(self.root, self.CONFIG_FILENAME)
 
+    @property
+    def journal_filename(self):
+        return os.path.join(self.root, self.JOURNAL_FILENAME)
+
+    @property
+    def db_filename(self):
+        return os.path.join(self.root, self.DB_FILENAME)
+
+    @property
+    def shards_dir(self):
+        return os.path.join(self.root, self.SHARDS_DIRNAME)
+
+    @property
+    def cache_dir(self):
+        return os.path.join(self.root, self.CACHE_DIRNAME)
+
+    def cache_path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    @property
+    def manifest(self):
+        return self._manifest
+
+    @property
+    def render_cache(self):
+        if self._render_cache is None:
+            size = self.info.render_cache_size
+            if size is not None:
+                size *= 1024 * 1024
+            self._render_cache = RenderCache(self.cache_path('render'), size,
+                                             self.fs.private)
+        return self._render_cache
+
+    @property
+    def source_index(self):
+        if self._source_index is None:
+            self._source_index = SourceIndex(self.cache_path('sources'),
+                                             self.fs)
+        return self._source_index
+
+    @property
+    def lock_filename(self):
+        return os.path.join(self.root, self.LOCK_FILENAME)
+
     @property
     def secret_filename(self):
         return os.path.join(self.root, self.SECRET_FILENAME)
@@ -47,69 +119,103 @@ class Config(object):
         return self.fs.root
 
     @classmethod
-    def find_root(cls, cwd=None):
+    def find_root(cls, cwd=None, impl=None):
+        exists = impl.exists if impl is not None else os.path.exists
         root = os.getcwd() if cwd is None else os.path.abspath(cwd)
         config_path = os.path.join(root, cls.CONFIG_FILENAME)
-        while not os.path.exists(config_path):
+        while not exists(config_path):
             root = os.path.dirname(root)
             config_path = os.path.join(root, cls.CONFIG_FILENAME)
             if root == '/':
-                if not os.path.exists(config_path):
+                if not exists(config_path):
                     raise RootNotFoundError("Cannot find project for '%s'" %
                                             os.getcwd())
         secret_path = os.path.join(root, cls.SECRET_FILENAME)
-        if not os.path.exists(secret_path):
+        if not exists(secret_path):
             raise RootNotFoundError(
                 "Cannot find secret file '%s' beside to config file '%s'"
                 % (secret_path, config_path))
         return root
 
     @classmethod
-    def load(cls):
-        root = cls.find_root()
-        ret = cls(root)
-        with open(ret.config_filename) as f:
-            cfg = yaml.load(f)
-
-            if cfg is not None:
-                if 'posts' in cfg:
-                    for name, data in cfg['posts'].iteritems():
-                        data['name'] = Post.name.from_yaml(name)
-                        post = Post.from_dict(data)
-                        post._config = ret
-                        ret._posts[name] = post
-
-                info = Info.from_dict(cfg.get('info', {}))
-                info._config = ret
-                ret._info = info
-
-            return ret
+    def load(cls, exclusive=True, cwd=None, fs=None, remote=None):
+        """Load project config for cwd (current dir by default).
+
+        Project is locked until `close()`: exclusively for
+        load-modify-save cycle, shared for read only access.
+        fs and remote are passed to config, root is searched in fs.
+        """
+        root = cls.find_root(cwd, fs.private if fs is not None else None)
+        ret = cls(root, fs, remote)
+        ret._lock.acquire(exclusive)
+        try:
+            # storage can be changed by other process before locking
+            ret._storage = detect_storage(ret)
+            ret.storage.load()
+        except Exception:
+            ret.close()
+            raise
+        return ret
 
     def save(self):
-        self.log.debug("Save config to '%s'", self.config_filename)
-        posts = {}
-        for post in self:
-            posts[Post.name.to_yaml(post.name)] = post.to_dict()
-        cfg = {'posts': posts,
-               'info': self.info.to_dict()}
-
-        # NB: save data only after building full yaml dict
-        # Otherwise you can corrupt config file if case of errors
-        with open(self.config_filename, 'w') as f:
-            yaml.dump(cfg, f)
+        if self._lock.locked and not self._lock.exclusive:
+            raise ConfigError("Cannot save config opened for reading only")
+        # report html write errors before saving their manifest records
+        self.fs.flush()
+        self.storage.save()
+        self.manifest.save()
+
+    def close(self):
+        self.fs.flush()
+        if not self._lock.locked or self._lock.exclusive:
+            # html may be found fresh by content after touching source
+            self.manifest.save()
+        if self._source_index is not None:
+            self._source_index.save()
+        if self._render_cache is not None:
+            self._render_cache.trim()
+        close = getattr(self.storage, 'close', None)
+        if close is not None:
+            close()
+        self._lock.release()
 
     # container interface
 
+    def _lookup(self, name):
+        post = self._posts.get(name)
+        if post is None:
+            data = self._records.pop(name, None)
+            if data is not None:
+                post = self.storage.load_post(name, data)
+            elif self.storage.LAZY and name not in self._dropped:
+                post = self.storage.fetch(name)
+        return post
+
+    def _names(self):
+        if not self.storage.LAZY:
+            return self._posts.viewkeys() | self._records.viewkeys()
+        names = set(self.storage.names())
+        names -= self._dropped
+        names.update(self._posts)
+        return names
+
     def __len__(self):
-        return len(self._posts)
+        return len(self._names())
 
     def __nonzero__(self):
-        return bool(self._posts)
+        return bool(self._names())
 
     def __getitem__(self, name):
-        return self._posts[name]
+        post = self._lookup(name)
+        if post is None:
+            raise KeyError(name)
+        return post
 
     def __iter__(self):
+        for name in self._records.keys():
+            self._lookup(name)
+        if self.storage.LAZY:
+            self.storage.fetch_all()
         return self._posts.itervalues()
 
     def __contains__(self, name_or_post):
@@ -117,12 +223,15 @@ class Config(object):
             name = name_or_post.name
         else:
             name = name_or_post
-        return name in self._posts
+        return self._lookup(name) is not None
 
     def add(self, name, rel_path):
         assert name not in self
         post = Post(self, name, rel_path)
         self._posts[post.name] = post
+        self._dropped.discard(post.name)
+        if self._index is not None:
+            self._index.add(post.name, post.postid, post.link, post.labels)
         self.need_save = True
         return post
 
@@ -132,9 +241,113 @@ class Config(object):
         else:
             name = name_or_post
         assert name in self
-        del self._posts[name]
+        post = self._posts.pop(name)
+        self._dropped.add(name)
+        self.manifest.drop(name)
+        if self._source_index is not None:
+            self._source_index.drop(post.file)
+        if self._index is not None:
+            self._index.remove(name, post.postid, post.link, post.labels)
         self.need_save = True
 
+    # indexes
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = self._build_index()
+        return self._index
+
+    def _build_index(self):
+        index = Index(Post.labels.table)
+        index.add_all(self._index_rows())
+        return index
+
+    def _index_rows(self):
+        for name, data in self._records.iteritems():
+            yield (name,
+                   Post.postid.from_yaml(data.get('postid')),
+                   Post.link.from_yaml(data.get('link')),
+                   Post.labels.from_yaml(data.get('labels')))
+        if self.storage.LAZY:
+            for name, postid, link, labels in self.storage.index_rows():
+                if name not in self._posts and name not in self._dropped:
+                    yield name, postid, link, labels
+        for post in self._posts.itervalues():
+            yield post.name, post.postid, post.link, post.labels
+
+    def post_changed(self, post, name, old_val, new_val):
+        if self._index is None or name not in Index.FIELDS:
+            return
+        if self._posts.get(post.name) is not post:
+            return  # not registered yet
+        self._index.update(post.name, name, old_val, new_val)
+
+    def _posts_by_names(self, names):
+        return [self[name] for name in names]
+
+    def _storage_query(self, method):
+        """Storage lookup used while index is not built.
+
+        Storage answers only for posts not loaded yet,
+        loaded posts may have unsaved changes and are checked here.
+        """
+        if self._index is not None:
+            return None
+        return getattr(self.storage, method, None)
+
+    def post_by_postid(self, postid):
+        query = self._storage_query('post_by_postid')
+        if query is None:
+            name = self.index.by_postid(postid)
+            return self[name] if name is not None else None
+        for post in self._posts.itervalues():
+            if post.postid == postid:
+                return post
+        return query(postid)
+
+    def post_by_link(self, link):
+        query = self._storage_query('post_by_link')
+        if query is None:
+            name = self.index.by_link(link)
+            return self[name] if name is not None else None
+        for post in self._posts.itervalues():
+            if post.link == link:
+                return post
+        return query(link)
+
+    def posts_by_label(self, label):
+        query = self._storage_query('posts_by_label')
+        if query is None:
+            return self._posts_by_names(self.index.by_label(label))
+        posts = [post for post in self._posts.itervalues()
+                 if label in (post.labels or ())]
+        posts.extend(query(label))
+        return sorted(posts, key=lambda post: post.name)
+
+    def posts_by_labels(self, all_labels=(), any_labels=()):
+        """Posts having every of all_labels and at least one of any_labels"""
+        return self._posts_by_names(
+            self.index.by_labels(all_labels, any_labels))
+
+    def label_counts(self, names=None):
+        """Return {label: number of posts} for all posts or names only"""
+        return self.index.label_counts(names)
+
+    def rename_label(self, old, new):
+        """Replace label old with new, return list of updated posts"""
+        posts = self.posts_by_label(old)
+        for post in posts:
+            post.labels = (post.labels - frozenset([old])) | frozenset([new])
+        return posts
+
+    def posts_by_prefix(self, prefix):
+        """Posts with name starting from prefix, sorted by name"""
+        return self._posts_by_names(self.index.by_prefix(prefix))
+
+    def labels(self):
+        return self.index.labels()
+
     def post_by_path(self, mdpath, no_existance_check=False):
         if mdpath.endswith('.'):
             mdpath = mdpath[:-1]
@@ -148,10 +361,7 @@ class Config(object):
                                    no_existance_check=no_existance_check)
         name = self.fs.replace_ext(relpath, '')  # drop .md ending
 
-        if name in self:
-            return self[name]
-        else:
-            return None
+        return self._lookup(name)
 
     @property
     def info(self):
@@ -6,25 +6,305 @@
 # the MIT License: http://www.opensource.org/licenses/mit-license.php
 
 import codecs
+import collections
+import contextlib
+import errno
+import hashlib
+import mmap
 import os
+import Queue
+import shutil
+import threading
 
 from bloggertool.exceptions import FileNotFoundError, FileOutOfProject
 
+from .lock import FileLock
+
+
+@contextlib.contextmanager
+def atomic_write(fname, mode='w', sync=True):
+    """Write to temporary file, fsync and rename it over fname on success.
+
+    Readers never see partially written file.
+    sync=False skips fsync calls for data which can be lost on crash.
+    """
+    tmp_fname = '%s.%d.tmp' % (fname, os.getpid())
+    try:
+        with open(tmp_fname, mode) as f:
+            yield f
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.rename(tmp_fname, fname)
+    except BaseException:
+        if os.path.exists(tmp_fname):
+            os.remove(tmp_fname)
+        raise
+    if sync:
+        fsync_dir(os.path.dirname(fname))
+
+
+def fsync_dir(folder):
+    """Make rename in folder durable"""
+    try:
+        fd = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return  # not supported by platform
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_file(path, data):
+    # generated files can be regenerated after crash
+    with atomic_write(path, 'wb', sync=False) as f:
+        f.write(data)
+
+
+MMAP_SIZE = 256 * 1024
+
+
+def read_file(path):
+    """Return (stat, raw content), large files are memory mapped"""
+    with open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        if st.st_size >= MMAP_SIZE:
+            try:
+                return st, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (EnvironmentError, ValueError):
+                pass
+        return st, f.read()
+
+
+class Source(object):
+    """Source file content read once.
+
+    `data` is raw content, str or read only mmap.  Content hash and
+    text decoded with every encoding are computed on first request
+    and shared by doctype detection, freshness check and rendering.
+    """
+
+    def __init__(self, st, data):
+        self.st = st  # taken before reading
+        self.data = data
+        self._digest = None
+        self._texts = {}
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def digest(self):
+        """sha1 hexdigest of raw content"""
+        if self._digest is None:
+            self._digest = hashlib.sha1(self.data).hexdigest()
+        return self._digest
+
+    def text(self, encoding):
+        ret = self._texts.get(encoding)
+        if ret is None:
+            ret = self._texts[encoding] = codecs.decode(self.data, encoding)
+        return ret
+
+    def lines(self, encoding):
+        """Iterate decoded lines without splitting whole text"""
+        text = self.text(encoding)
+        start = 0
+        while start < len(text):
+            end = text.find(u'\n', start) + 1 or len(text)
+            yield text[start:end]
+            start = end
+
+    def same_stat(self, st):
+        return (self.st.st_size == st.st_size and
+                self.st.st_mtime == st.st_mtime)
+
+
+class BackgroundWriter(object):
+    """Write files atomically in background thread.
+
+    Path is pending until queued data is written, `wait` blocks
+    until queue is empty and reraises first write error.
+    """
+
+    def __init__(self, write=write_file):
+        self._write = write
+        self._queue = Queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = {}  # path -> number of queued writes
+        self._errors = []
+        self._thread = None
+
+    def write(self, path, data):
+        with self._lock:
+            self._pending[path] = self._pending.get(path, 0) + 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='writer')
+                self._thread.daemon = True
+                self._thread.start()
+        self._queue.put((path, data))
+
+    def pending(self, path):
+        with self._lock:
+            return path in self._pending
+
+    def wait(self):
+        self._queue.join()
+        with self._lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise errors[0]
+
+    def _run(self):
+        while True:
+            path, data = self._queue.get()
+            try:
+                self._write(path, data)
+            except Exception as ex:
+                # thread must survive any error, otherwise wait hangs
+                with self._lock:
+                    self._errors.append(ex)
+            finally:
+                with self._lock:
+                    count = self._pending.pop(path) - 1
+                    if count:
+                        self._pending[path] = count
+                self._queue.task_done()
+
+
+class StatCache(object):
+    """Directory snapshots answering existence and stat queries.
+
+    Folder is listed once on first query, file is stat'ed once on first
+    request.  Snapshots are not refreshed automatically: writes through
+    FileSystem mark path `changed`, other changes need `invalidate`.
+    """
+
+    def __init__(self, impl):
+        self._impl = impl
+        self._folders = {}  # folder -> {name: stat or None}
+
+    def _entries(self, folder):
+        """Return snapshot of folder or None if it cannot be read"""
+        entries = self._folders.get(folder)
+        if entries is None:
+            try:
+                names = self._impl.listdir(folder)
+            except OSError as ex:
+                if ex.errno not in (errno.ENOENT, errno.ENOTDIR):
+                    # unreadable folder, files in it are checked directly
+                    return None
+                names = ()
+            entries = self._folders[folder] = dict.fromkeys(names)
+        return entries
+
+    def exists(self, path):
+        folder, name = os.path.split(path)
+        entries = self._entries(folder) if name else None
+        if entries is None:
+            return self._impl.exists(path)
+        return name in entries
+
+    def folder_exists(self, folder):
+        """Check folder by listing it, listing is used by later queries"""
+        if self._entries(folder) is not None:
+            return True
+        return self._impl.exists(folder)
+
+    def stat(self, path):
+        folder, name = os.path.split(path)
+        entries = self._entries(folder) if name else None
+        if entries is None:
+            return self._impl.stat(path)
+        if name not in entries:
+            raise OSError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+        st = entries[name]
+        if st is None:
+            try:
+                st = entries[name] = self._impl.stat(path)
+            except OSError:
+                del entries[name]
+                raise
+        return st
+
+    def update(self, path, st):
+        """Remember stat taken by reader"""
+        folder, name = os.path.split(path)
+        entries = self._folders.get(folder)
+        if entries is not None and name in entries:
+            entries[name] = st
+
+    def changed(self, path):
+        """Path is written, keep it existing but stat again"""
+        folder, name = os.path.split(path)
+        entries = self._folders.get(folder)
+        if entries is not None:
+            entries[name] = None
+
+    def invalidate(self, path=None):
+        """Forget snapshot of path folder or all snapshots"""
+        if path is None:
+            self._folders.clear()
+        else:
+            self._folders.pop(os.path.dirname(path), None)
+
+
+class DiskImpl(object):
+    """File operations on absolute paths"""
+    exists = staticmethod(os.path.exists)
+    isdir = staticmethod(os.path.isdir)
+    getmtime = staticmethod(os.path.getmtime)
+    stat = staticmethod(os.stat)
+    listdir = staticmethod(os.listdir)
+    makedirs = staticmethod(os.makedirs)
+    remove = staticmethod(os.remove)
+    rename = staticmethod(os.rename)
+    rmtree = staticmethod(shutil.rmtree)
+    utime = staticmethod(os.utime)
+    open = staticmethod(codecs.open)
+    read = staticmethod(read_file)
+    write = staticmethod(write_file)
+    atomic_write = staticmethod(atomic_write)
+
+    @staticmethod
+    def fsync(f):
+        f.flush()
+        os.fsync(f.fileno())
+
 
 class FileSystem(object):
-    class Impl(object):
-        exists = staticmethod(os.path.exists)
-        getmtime = staticmethod(os.path.getmtime)
-        open = staticmethod(codecs.open)
+    Impl = DiskImpl
+
+    SOURCE_CACHE_SIZE = 32
 
     def __init__(self, root):
         self._root = root
         self._impl = self.Impl()
+        self._private = self._impl
+        self._writer = BackgroundWriter(self._impl.write)
+        self._stats = StatCache(self._impl)
+        self._sources = collections.OrderedDict()  # LRU, path -> Source
 
     @property
     def root(self):
         return self._root
 
+    @property
+    def private(self):
+        """Impl for project config, lock and caches.
+
+        They are accessed by absolute path bypassing stat cache
+        and background writes of project files.
+        """
+        return self._private
+
+    def lock(self, filename):
+        return FileLock(filename)
+
     def expand_path(self, path, role='File'):
         """
         Return full path.
@@ -52,20 +332,85 @@ class FileSystem(object):
             raise FileOutOfProject(ret, self.root, role)
         return ret
 
+    @property
+    def stats(self):
+        """Stat cache for absolute paths"""
+        return self._stats
+
     def exists(self, rel_path):
         full_path = self.abs_path(rel_path, no_existance_check=True)
-        return self._impl.exists(full_path)
+        if self._writer.pending(full_path):
+            return True
+        return self._stats.exists(full_path)
 
     def getmtime(self, rel_path):
+        return self.stat(rel_path).st_mtime
+
+    def stat(self, rel_path):
         full_path = self.abs_path(rel_path)
-        return self._impl.getmtime(full_path)
+        self._sync(full_path)
+        return self._stats.stat(full_path)
 
     def open(self, rel_path, mode, encoding='utf-8'):
         no_existance_check = mode == 'w'
         full_path = self.abs_path(rel_path,
                                   no_existance_check=no_existance_check)
+        self._sync(full_path)
+        if 'w' in mode or 'a' in mode:
+            self._changed(full_path)
         return self._impl.open(full_path, mode, encoding)
 
+    def load(self, rel_path):
+        """Return Source for rel_path.
+
+        File is read again only if its stat has been changed,
+        recently loaded sources are kept in memory.
+        """
+        full_path = self.abs_path(rel_path)
+        self._sync(full_path)
+        sources = self._sources
+        source = sources.pop(full_path, None)
+        if source is None or not source.same_stat(self.stats.stat(full_path)):
+            st, data = self._impl.read(full_path)
+            self._stats.update(full_path, st)
+            source = Source(st, data)
+        sources[full_path] = source
+        while len(sources) > self.SOURCE_CACHE_SIZE:
+            sources.popitem(last=False)
+        return source
+
+    def write(self, rel_path, text, encoding='utf-8'):
+        """Queue text for atomic writing in background.
+
+        Queued file is visible for `exists`, `open` and `stat`
+        wait until it is written.
+        """
+        full_path = self.abs_path(rel_path, no_existance_check=True)
+        self._writer.write(full_path, text.encode(encoding))
+        self._changed(full_path)
+
+    def _changed(self, full_path):
+        self._stats.changed(full_path)
+        self._sources.pop(full_path, None)
+
+    def invalidate(self, rel_path=None):
+        """Forget cached stats and sources changed outside of FileSystem"""
+        if rel_path is None:
+            self._stats.invalidate()
+            self._sources.clear()
+        else:
+            full_path = self.abs_path(rel_path, no_existance_check=True)
+            self._stats.invalidate(full_path)
+            self._sources.pop(full_path, None)
+
+    def flush(self):
+        """Wait for queued writes, reraise write error if any"""
+        self._writer.wait()
+
+    def _sync(self, full_path):
+        if self._writer.pending(full_path):
+            self.flush()
+
     def replace_ext(self, path, new_ext):
         root, old_ext = os.path.splitext(path)
         return root + new_ext
@@ -85,7 +430,14 @@ class FileSystem(object):
         return abs_path
 
     def check_existance(self, abs_path, role):
-        if not self._impl.exists(abs_path):
+        if self._writer.pending(abs_path):
+            return
+        if os.path.normpath(abs_path) == os.path.normpath(self.root):
+            # don't list parent of project
+            exists = self._stats.folder_exists(self.root)
+        else:
+            exists = self._stats.exists(abs_path)
+        if not exists:
             raise FileNotFoundError(abs_path, role=role)
 
     def rel_path(self, abs_path, no_existance_check=False, role='File'):
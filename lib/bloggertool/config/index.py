@@ -0,0 +1,187 @@
+# config/index.py
+# Copyright (C) 2011-2014 Andrew Svetlov
+# andrew.svetlov@gmail.com
+#
+# This module is part of BloggerTool and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+import bisect
+
+from .labels import bitmap_of, iter_bits, popcount
+
+
+class Index(object):
+    """Secondary indexes over post names.
+
+    Keeps postid -> name, link -> name, sorted list of names
+    for prefix queries and label bitmaps.
+
+    Every post gets row number, label bitmap has bit set for every
+    row labeled with it, so label intersection, union
+    and facet counts are integer operations.  Rows of removed posts
+    are renumbered when they outnumber rows in use.
+    """
+    FIELDS = ('postid', 'link', 'labels')
+
+    def __init__(self, table):
+        self._table = table
+        self._postids = {}
+        self._links = {}
+        self._names = []
+        self._rows = {}
+        self._row_names = []  # None for removed row
+        self._bitmaps = {}  # label id -> bitmap of rows
+
+    def add(self, name, postid, link, labels):
+        i = bisect.bisect_left(self._names, name)
+        if i == len(self._names) or self._names[i] != name:
+            self._names.insert(i, name)
+        if name not in self._rows:
+            self._rows[name] = len(self._row_names)
+            self._row_names.append(name)
+        self.update(name, 'postid', None, postid)
+        self.update(name, 'link', None, link)
+        self.update(name, 'labels', None, labels)
+
+    def add_all(self, rows):
+        """Add (name, postid, link, labels) rows in bulk.
+
+        Names list is sorted once instead of insertion for every name,
+        every label bitmap is made once from rows labeled with it.
+        """
+        names = self._names
+        intern = self._table.intern
+        label_rows = {}  # label id -> rows
+        for name, postid, link, labels in rows:
+            row = self._rows.get(name)
+            if row is None:
+                names.append(name)
+                row = self._rows[name] = len(self._row_names)
+                self._row_names.append(name)
+            self.update(name, 'postid', None, postid)
+            self.update(name, 'link', None, link)
+            for label in labels or ():
+                label_rows.setdefault(intern(label), []).append(row)
+        names.sort()
+        bitmaps = self._bitmaps
+        for i, rows in label_rows.iteritems():
+            bitmaps[i] = bitmaps.get(i, 0) | bitmap_of(rows)
+
+    def remove(self, name, postid, link, labels):
+        i = bisect.bisect_left(self._names, name)
+        if i < len(self._names) and self._names[i] == name:
+            del self._names[i]
+        self.update(name, 'postid', postid, None)
+        self.update(name, 'link', link, None)
+        self.update(name, 'labels', labels, None)
+        row = self._rows.pop(name, None)
+        if row is not None:
+            # bitmaps have no bit for removed row
+            self._row_names[row] = None
+            if len(self._row_names) > 2 * len(self._rows):
+                self._compact()
+
+    def _compact(self):
+        """Renumber rows in use"""
+        renumber = {}
+        row_names = []
+        for row, name in enumerate(self._row_names):
+            if name is not None:
+                renumber[row] = len(row_names)
+                row_names.append(name)
+        self._row_names = row_names
+        self._rows = dict((name, row) for row, name in enumerate(row_names))
+        for i, bitmap in self._bitmaps.items():
+            self._bitmaps[i] = bitmap_of([renumber[row]
+                                          for row in iter_bits(bitmap)])
+
+    def update(self, name, field, old, new):
+        if field == 'postid':
+            self._update_unique(self._postids, name, old, new)
+        elif field == 'link':
+            self._update_unique(self._links, name, old, new)
+        elif field == 'labels':
+            row = self._rows.get(name)
+            if row is None:
+                return
+            bit = 1 << row
+            old = self._table.encode(old)
+            new = self._table.encode(new)
+            bitmaps = self._bitmaps
+            for i in iter_bits(old & ~new):
+                bitmap = bitmaps[i] & ~bit
+                if bitmap:
+                    bitmaps[i] = bitmap
+                else:
+                    del bitmaps[i]
+            for i in iter_bits(new & ~old):
+                bitmaps[i] = bitmaps.get(i, 0) | bit
+
+    def _update_unique(self, mapping, name, old, new):
+        if old and mapping.get(old) == name:
+            del mapping[old]
+        if new:
+            mapping[new] = name
+
+    def by_postid(self, postid):
+        return self._postids.get(postid)
+
+    def by_link(self, link):
+        return self._links.get(link)
+
+    def _bitmap(self, label):
+        i = self._table.id(label)
+        if i is None:
+            return 0
+        return self._bitmaps.get(i, 0)
+
+    def _names_of(self, bitmap):
+        row_names = self._row_names
+        return sorted(row_names[row] for row in iter_bits(bitmap))
+
+    def by_label(self, label):
+        return self._names_of(self._bitmap(label))
+
+    def by_labels(self, all_labels=(), any_labels=()):
+        """Names labeled with every of all_labels and any of any_labels"""
+        bitmap = None
+        for label in all_labels:
+            if bitmap is None:
+                bitmap = self._bitmap(label)
+            else:
+                bitmap &= self._bitmap(label)
+        if any_labels:
+            union = 0
+            for label in any_labels:
+                union |= self._bitmap(label)
+            bitmap = union if bitmap is None else bitmap & union
+        if bitmap is None:
+            return sorted(self._rows)
+        return self._names_of(bitmap)
+
+    def label_counts(self, names=None):
+        """Return {label: number of posts}, optionally among names only"""
+        label = self._table.label
+        if names is None:
+            return dict((label(i), popcount(bitmap))
+                        for i, bitmap in self._bitmaps.iteritems())
+        rows = bitmap_of([self._rows[name] for name in names
+                          if name in self._rows])
+        ret = {}
+        for i, bitmap in self._bitmaps.iteritems():
+            count = popcount(bitmap & rows)
+            if count:
+                ret[label(i)] = count
+        return ret
+
+    def labels(self):
+        label = self._table.label
+        return sorted(label(i) for i in self._bitmaps)
+
+    def by_prefix(self, prefix):
+        names = self._names
+        start = bisect.bisect_left(names, prefix)
+        end = start
+        while end < len(names) and names[end].startswith(prefix):
+            end += 1
+        return names[start:end]
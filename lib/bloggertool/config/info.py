@@ -6,14 +6,71 @@
 # the MIT License: http://www.opensource.org/licenses/mit-license.php
 
 import jinja2
+import jinja2.meta
 
+from bloggertool.log_util import class_logger
 from bloggertool.remote import Remote
 from bloggertool.exceptions import ConfigError, RemoteError
 
-from .attrs import Record, str_attr
+from .attrs import Record, str_attr, int_attr
 from .file_system import FileSystem
 
 
+class TemplateBytecodeCache(jinja2.FileSystemBytecodeCache):
+    """Compiled templates shared by all processes.
+
+    Entries are written to temporary file and renamed,
+    write errors are ignored.
+    """
+    log = class_logger()
+
+    def __init__(self, directory, impl):
+        super(TemplateBytecodeCache, self).__init__(directory)
+        self._impl = impl
+
+    def load_bytecode(self, bucket):
+        try:
+            f = self._impl.open(self._get_cache_filename(bucket), 'rb')
+        except IOError:
+            return
+        with f:
+            bucket.load_bytecode(f)
+
+    def dump_bytecode(self, bucket):
+        impl = self._impl
+        fname = self._get_cache_filename(bucket)
+        try:
+            if not impl.exists(self.directory):
+                impl.makedirs(self.directory)
+            with impl.atomic_write(fname, 'wb', sync=False) as f:
+                bucket.write_bytecode(f)
+        except (IOError, OSError) as ex:
+            self.log.debug("Cannot write template bytecode '%s': %s",
+                           fname, ex)
+
+
+class TemplateEnvironment(jinja2.Environment):
+    """Environment collecting file names of loaded templates.
+
+    Names are added to `used` set if it is not None,
+    includes and parents are loaded on rendering.
+    `abspaths` memoizes abspath filter results.
+    """
+    used = None
+
+    def __init__(self, fs, **kwargs):
+        super(TemplateEnvironment, self).__init__(**kwargs)
+        self.fs = fs
+        self.abspaths = {}
+        self.warm = False
+
+    def _load_template(self, name, globals):
+        ret = super(TemplateEnvironment, self)._load_template(name, globals)
+        if self.used is not None and ret.filename:
+            self.used.add(ret.filename)
+        return ret
+
+
 class Info(Record):
     """Project info"""
     _template_env = None
@@ -22,6 +79,7 @@ class Info(Record):
     template_dir = str_attr()
     template_file = str_attr()
     source_encoding = str_attr()
+    render_cache_size = int_attr()  # megabytes
 
     @property
     def effective_source_encoding(self):
@@ -46,13 +104,27 @@ class Info(Record):
         template_name = ctx.name
         assert template_name
         environment = ctx.environment
-        template = environment.get_template(template_name)
-        fname = template.filename
-        assert fname
-        return self.template_fs.abs_path(rel_path)
+        key = (template_name, rel_path)
+        ret = environment.abspaths.get(key)
+        if ret is None:
+            template = environment.get_template(template_name)
+            fname = template.filename
+            assert fname
+            ret = environment.fs.abs_path(rel_path)
+            environment.abspaths[key] = ret
+        if environment.used is not None:
+            environment.used.add(ret)
+        return ret
 
     @property
-    def template(self):
+    def template_key(self):
+        """Template settings affecting nice html"""
+        if not self.has_template:
+            return None
+        return (self.template_dir, self.template_file)
+
+    @property
+    def template_env(self):
         if self._template_env is None:
             if not self.has_template:
                 raise ConfigError("Set user properies `template_dir` and "
@@ -61,13 +133,61 @@ class Info(Record):
             fs = self.template_fs
             fs.check_existance(fs.abs_path(self.template_file),
                                role='Template file')
-            self._template_env = jinja2.Environment(
-                loader=jinja2.FileSystemLoader(fs.root))
+            bytecode_cache = TemplateBytecodeCache(
+                self.config.cache_path('jinja'), self.config.fs.private)
+            self._template_env = TemplateEnvironment(
+                fs,
+                loader=jinja2.FileSystemLoader(fs.root),
+                bytecode_cache=bytecode_cache)
 
             self._template_env.filters['abspath'] = self.abspath_filter
-        return self._template_env.get_template(self.template_file)
+        return self._template_env
+
+    @property
+    def template(self):
+        return self.template_env.get_template(self.template_file)
+
+    def warm_up_template(self):
+        """Load template with all includes and parents.
+
+        Compiled code is taken from bytecode cache if possible,
+        so following renders don't pay compilation cost.
+        """
+        env = self.template_env
+        if env.warm:
+            return
+        env.warm = True
+        names = [self.template_file]
+        seen = set()
+        while names:
+            name = names.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            try:
+                env.get_template(name)
+                source = env.loader.get_source(env, name)[0]
+                ast = env.parse(source)
+                refs = jinja2.meta.find_referenced_templates(ast)
+            except jinja2.TemplateError as ex:
+                self.log.debug("Cannot warm up template '%s': %s", name, ex)
+                continue
+            # dynamic names are None
+            names.extend(ref for ref in refs if ref is not None)
+
+    def render_template(self, args):
+        """Return (html, set of absolute names of used files)"""
+        env = self.template_env
+        env.used = used = set()
+        try:
+            html = env.get_template(self.template_file).render(args)
+        finally:
+            env.used = None
+        return html, used
 
     def remote(self, reset_credentials=False):
+        if self.config.remote is not None:
+            return self.config.remote
         try:
             srv = Remote(reset_credentials,
                          self.blogid,
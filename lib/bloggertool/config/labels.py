@@ -0,0 +1,81 @@
+# config/labels.py
+# Copyright (C) 2011-2014 Andrew Svetlov
+# andrew.svetlov@gmail.com
+#
+# This module is part of BloggerTool and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+
+import binascii
+
+
+def iter_bits(bits):
+    """Yield numbers of set bits"""
+    # shifting long bitmap copies it for every bit, scan its digits
+    digits = bin(bits)[:1:-1]
+    pos = digits.find('1')
+    while pos != -1:
+        yield pos
+        pos = digits.find('1', pos + 1)
+
+
+def bitmap_of(numbers):
+    """Return integer with set bits for every of numbers"""
+    if not numbers:
+        return 0
+    data = bytearray(max(numbers) // 8 + 1)
+    for n in numbers:
+        data[n >> 3] |= 1 << (n & 7)
+    data.reverse()
+    return int(binascii.hexlify(data), 16)
+
+
+def popcount(bits):
+    return bin(bits).count('1')
+
+
+class LabelTable(object):
+    """Interned labels, every label is mapped to bit number.
+
+    Set of labels is encoded as integer bitset, decoded frozensets
+    are shared between all posts with the same labels.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._labels = []
+        self._decoded = {0: frozenset()}
+
+    def __len__(self):
+        return len(self._labels)
+
+    def intern(self, label):
+        ret = self._ids.get(label)
+        if ret is None:
+            ret = len(self._labels)
+            self._ids[label] = ret
+            self._labels.append(label)
+        return ret
+
+    def id(self, label):
+        """Return label bit number or None for unknown label"""
+        return self._ids.get(label)
+
+    def label(self, id):
+        return self._labels[id]
+
+    def encode(self, labels):
+        bits = 0
+        if labels:
+            intern = self.intern
+            for label in labels:
+                bits |= 1 << intern(label)
+        return bits
+
+    def decode(self, bits):
+        ret = self._decoded.get(bits)
+        if ret is None:
+            labels = self._labels
+            ret = frozenset(labels[i] for i in iter_bits(bits))
+            self._decoded[bits] = ret
+        return ret
@@ -0,0 +1,65 @@
+# config/lock.py
+# Copyright (C) 2011-2014 Andrew Svetlov
+# andrew.svetlov@gmail.com
+#
+# This module is part of BloggerTool and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+import errno
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks on Windows
+    fcntl = None
+
+from bloggertool.exceptions import ConfigError
+from bloggertool.log_util import class_logger
+
+
+class FileLock(object):
+    """Advisory lock on project, shared for readers, exclusive for writers"""
+    log = class_logger()
+
+    def __init__(self, filename):
+        self._filename = filename
+        self._file = None
+        self._exclusive = False
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def locked(self):
+        return self._file is not None
+
+    @property
+    def exclusive(self):
+        return self.locked and self._exclusive
+
+    def acquire(self, exclusive, blocking=True):
+        assert not self.locked
+        f = open(self.filename, 'a')
+        if fcntl is not None:
+            op = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            try:
+                fcntl.flock(f.fileno(), op | fcntl.LOCK_NB)
+            except IOError as ex:
+                if ex.errno not in (errno.EAGAIN, errno.EACCES):
+                    f.close()
+                    raise
+                if not blocking:
+                    f.close()
+                    raise ConfigError("Project is locked by other process")
+                self.log.info("Waiting for other blog process to finish")
+                fcntl.flock(f.fileno(), op)
+        self._file = f
+        self._exclusive = exclusive
+
+    def release(self):
+        if self._file is not None:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+            self._exclusive = False
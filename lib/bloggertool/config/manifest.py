@@ -0,0 +1,178 @@
+# config/manifest.py
+# Copyright (C) 2011-2014 Andrew Svetlov
+# andrew.svetlov@gmail.com
+#
+# This module is part of BloggerTool and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+import hashlib
+import marshal
+import os
+import time
+
+from bloggertool.log_util import class_logger
+
+from .file_system import DiskImpl
+
+
+class Manifest(object):
+    """Inputs of last html generation for every post.
+
+    Entry keeps source size, mtime and content hash and engine signature.
+    Html is fresh if inputs are the same: source with unchanged size and
+    mtime is not rehashed unless it was modified shortly before check,
+    touched or checked out source with the same content is still fresh.
+
+    Entry also has template name, values passed to template and hashes
+    of all files used by templating (template itself, includes, parents
+    and files resolved by abspath filter), changing any of them makes
+    only nice html stale.  Hashes of template files are shared by all
+    posts.
+    """
+    log = class_logger()
+
+    VERSION = 2
+    RACY_WINDOW = 2  # seconds
+
+    def __init__(self, filename, stat=os.stat, impl=None):
+        self._filename = filename
+        self._stat = stat  # stat of template files
+        self._impl = impl if impl is not None else DiskImpl()
+        self._entries = None
+        self._files = None
+        self._dirty = False
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            self._entries, self._files = self._load()
+        return self._entries
+
+    @property
+    def files(self):
+        """{path: (size, mtime, digest, checked)} for template files"""
+        if self._files is None:
+            self._entries, self._files = self._load()
+        return self._files
+
+    @staticmethod
+    def digest(data):
+        return hashlib.sha1(data).hexdigest()
+
+    def _load(self):
+        try:
+            with self._impl.open(self.filename, 'rb') as f:
+                data = marshal.loads(f.read())
+            if data[0] == self.VERSION:
+                version, entries, files = data
+                return entries, files
+        except (IOError, OSError, EOFError, ValueError, TypeError) as ex:
+            self.log.debug("Ignore build manifest '%s': %s",
+                           self.filename, ex)
+        return {}, {}
+
+    def get(self, name):
+        return self.entries.get(name)
+
+    def record(self, name, st, digest, engine):
+        """Remember inputs of html generated for post name.
+
+        st is source stat taken before reading source with digest.
+        """
+        entry = self.entries.setdefault(name, {})
+        entry.update(size=st.st_size,
+                     mtime=st.st_mtime,
+                     digest=digest,
+                     engine=engine,
+                     checked=time.time())
+        self._dirty = True
+
+    def record_deps(self, name, template, paths, inputs):
+        """Remember files used by templating of post name.
+
+        template identifies template setting, paths are absolute,
+        inputs are values passed to template.
+        """
+        entry = self.entries.setdefault(name, {})
+        entry['template'] = template
+        entry['inputs'] = inputs
+        entry['deps'] = dict((path, self.file_digest(path))
+                             for path in paths)
+        self._dirty = True
+
+    def file_digest(self, path):
+        """Return content hash of path or None if file is missing"""
+        try:
+            st = self._stat(path)
+        except OSError:
+            return None
+        state = self.files.get(path)
+        if state is not None:
+            size, mtime, digest, checked = state
+            racy = st.st_mtime + self.RACY_WINDOW > checked
+            if size == st.st_size and mtime == st.st_mtime and not racy:
+                return digest
+        try:
+            with open(path, 'rb') as f:
+                digest = self.digest(f.read())
+        except IOError:
+            return None
+        self.files[path] = (st.st_size, st.st_mtime, digest, time.time())
+        self._dirty = True
+        return digest
+
+    def is_deps_fresh(self, name, template, inputs):
+        """Check that templating inputs have not changed"""
+        entry = self.get(name)
+        if entry is None or 'deps' not in entry:
+            return False
+        if entry['template'] != template or entry['inputs'] != inputs:
+            return False
+        for path, digest in entry['deps'].iteritems():
+            if self.file_digest(path) != digest:
+                return False
+        return True
+
+    def drop(self, name):
+        if self.entries.pop(name, None) is not None:
+            self._dirty = True
+
+    def is_fresh(self, name, st, digest, engine):
+        """Check that source has not changed since last generation.
+
+        st is current source stat, digest() returns source content hash
+        and is called only if stat check is not enough.
+        """
+        entry = self.get(name)
+        if entry is None or entry.get('engine') != engine:
+            return False
+        if entry['size'] != st.st_size:
+            return False
+        racy = st.st_mtime + self.RACY_WINDOW > entry['checked']
+        if entry['mtime'] == st.st_mtime and not racy:
+            return True
+        if digest() != entry['digest']:
+            return False
+        # same content, remember new stat to skip hashing next time
+        self.record(name, st, entry['digest'], engine)
+        return True
+
+    def save(self):
+        if not self._dirty:
+            return
+        try:
+            impl = self._impl
+            folder = os.path.dirname(self.filename)
+            if not impl.exists(folder):
+                impl.makedirs(folder)
+            with impl.atomic_write(self.filename, 'wb') as f:
+                f.write(marshal.dumps((self.VERSION, self.entries,
+                                       self.files)))
+            self._dirty = False
+        except (IOError, OSError) as ex:
+            self.log.warning("Cannot write build manifest '%s': %s",
+                             self.filename, ex)
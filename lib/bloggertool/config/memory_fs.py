@@ -0,0 +1,294 @@
+# config/memory_fs.py
+# Copyright (C) 2011-2014 Andrew Svetlov
+# andrew.svetlov@gmail.com
+#
+# This module is part of BloggerTool and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+import codecs
+import collections
+import contextlib
+import errno
+import io
+import os
+import stat
+import threading
+import time
+
+from bloggertool.exceptions import ConfigError
+
+from .file_system import FileSystem
+
+
+class MemoryFile(io.BytesIO):
+    """Written file, content is stored on close"""
+
+    def __init__(self, impl, path):
+        super(MemoryFile, self).__init__()
+        self._impl = impl
+        self._path = path
+
+    def close(self):
+        if not self.closed:
+            self._impl.written(self._path, self.getvalue())
+        super(MemoryFile, self).close()
+
+
+class MemoryImpl(object):
+    """FileSystem.Impl keeping files in memory and counting operations.
+
+    `counts` maps operation name to number of calls, `bytes_read` and
+    `bytes_written` sum transferred data.  Every operation sleeps
+    `latency` seconds to simulate slow storage.
+    """
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self._files = {}  # path -> (data, mtime)
+        self._dirs = set()
+        self.locks = {}  # used by MemoryLock
+        self._lock = threading.Lock()
+        self.reset_counts()
+
+    def reset_counts(self):
+        with self._lock:
+            self.counts = collections.Counter()
+            self.bytes_read = 0
+            self.bytes_written = 0
+
+    @property
+    def total(self):
+        """Number of all operations"""
+        return sum(self.counts.itervalues())
+
+    def _op(self, name, read=0):
+        with self._lock:
+            self.counts[name] += 1
+            self.bytes_read += read
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _missing(self, path):
+        return OSError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+
+    def _isdir(self, path):
+        return path.rstrip('/') in self._dirs
+
+    def makedirs(self, path):
+        path = path.rstrip('/')
+        while path and path not in self._dirs:
+            self._dirs.add(path)
+            path = os.path.dirname(path).rstrip('/')
+
+    def store(self, path, data, mtime=None):
+        """Put file without counting, used to set up fixtures"""
+        if mtime is None:
+            mtime = time.time()
+        self.makedirs(os.path.dirname(path))
+        with self._lock:
+            self._files[path] = (data, mtime)
+
+    def written(self, path, data):
+        with self._lock:
+            self.bytes_written += len(data)
+        self.store(path, data)
+
+    def load(self, path):
+        """Return file content without counting"""
+        return self._files[path][0]
+
+    def remove(self, path):
+        with self._lock:
+            if path not in self._files:
+                raise self._missing(path)
+            del self._files[path]
+
+    @staticmethod
+    def _under(paths, folder):
+        """Paths equal to folder or inside it"""
+        return [path for path in paths
+                if path == folder or path.startswith(folder + '/')]
+
+    def rename(self, old, new):
+        self._op('rename')
+        with self._lock:
+            if old not in self._files and old not in self._dirs:
+                raise self._missing(old)
+            for path in self._under(self._files, old):
+                self._files[new + path[len(old):]] = self._files.pop(path)
+            for path in self._under(self._dirs, old):
+                self._dirs.remove(path)
+                self._dirs.add(new + path[len(old):])
+
+    def rmtree(self, path):
+        self._op('rmtree')
+        path = path.rstrip('/')
+        with self._lock:
+            if path not in self._dirs:
+                raise self._missing(path)
+            for name in self._under(self._files, path):
+                del self._files[name]
+            for name in self._under(self._dirs, path):
+                self._dirs.remove(name)
+
+    def utime(self, path, times):
+        self._op('utime')
+        with self._lock:
+            try:
+                data, mtime = self._files[path]
+            except KeyError:
+                raise self._missing(path)
+            self._files[path] = (data, time.time() if times is None
+                                 else times[1])
+
+    def exists(self, path):
+        self._op('exists')
+        return path in self._files or self._isdir(path)
+
+    def isdir(self, path):
+        self._op('isdir')
+        return self._isdir(path)
+
+    def stat(self, path):
+        self._op('stat')
+        return self._stat(path)
+
+    def getmtime(self, path):
+        self._op('getmtime')
+        return self._stat(path).st_mtime
+
+    def _stat(self, path):
+        if self._isdir(path):
+            return os.stat_result((stat.S_IFDIR | 0755, 0, 0, 1,
+                                   0, 0, 0, 0, 0, 0))
+        try:
+            data, mtime = self._files[path]
+        except KeyError:
+            raise self._missing(path)
+        return os.stat_result((stat.S_IFREG | 0644, 0, 0, 1, 0, 0,
+                               len(data), mtime, mtime, mtime))
+
+    def listdir(self, path):
+        self._op('listdir')
+        path = path.rstrip('/')
+        if path not in self._dirs:
+            raise self._missing(path)
+        names = set()
+        for name in self._files.keys() + list(self._dirs):
+            if os.path.dirname(name) == path:
+                names.add(os.path.basename(name))
+        return sorted(names)
+
+    def open(self, path, mode, encoding=None):
+        if 'w' in mode or 'a' in mode:
+            if not self._isdir(os.path.dirname(path)):
+                self._op('open')
+                raise IOError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+            f = MemoryFile(self, path)
+            if 'a' in mode and path in self._files:
+                f.write(self._files[path][0])
+            self._op('open')
+        else:
+            try:
+                data = self._files[path][0]
+            except KeyError:
+                self._op('open')
+                raise IOError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+            f = io.BytesIO(data)
+            self._op('open', read=len(data))
+        if encoding is None:
+            return f
+        info = codecs.lookup(encoding)
+        return codecs.StreamReaderWriter(f, info.streamreader,
+                                         info.streamwriter)
+
+    def read(self, path):
+        try:
+            data = self._files[path][0]
+        except KeyError:
+            self._op('read')
+            raise IOError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+        self._op('read', read=len(data))
+        return self._stat(path), data
+
+    def write(self, path, data):
+        self._op('write')
+        if not self._isdir(os.path.dirname(path)):
+            raise IOError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+        self.written(path, data)
+
+    @contextlib.contextmanager
+    def atomic_write(self, path, mode='w', sync=True):
+        # content is stored on close only
+        with self.open(path, mode) as f:
+            yield f
+
+    def fsync(self, f):
+        pass
+
+
+class MemoryLock(object):
+    """FileLock for project kept in memory.
+
+    Lock is held by configs sharing impl, conflicting lock
+    raises ConfigError instead of waiting.
+    """
+
+    def __init__(self, filename, impl):
+        self._filename = filename
+        self._impl = impl
+        self._exclusive = None  # None if not locked
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def locked(self):
+        return self._exclusive is not None
+
+    @property
+    def exclusive(self):
+        return bool(self._exclusive)
+
+    def acquire(self, exclusive, blocking=True):
+        assert not self.locked
+        locks = self._impl.locks
+        holders = locks.get(self.filename, 0)  # -1 for exclusive
+        if holders < 0 or holders and exclusive:
+            raise ConfigError("Project is locked by other process")
+        locks[self.filename] = -1 if exclusive else holders + 1
+        self._exclusive = exclusive
+
+    def release(self):
+        if self.locked:
+            locks = self._impl.locks
+            holders = locks.pop(self.filename)
+            if holders > 1:
+                locks[self.filename] = holders - 1
+            self._exclusive = None
+
+
+class MemoryFileSystem(FileSystem):
+    """Project files kept in memory with instrumented operations.
+
+    Used by tests and benchmarks to run commands without touching
+    disk and to check number of I/O operations.  Project config,
+    lock and caches are kept by separate `private` impl, operations
+    on them are not counted with project files.
+    """
+    Impl = MemoryImpl
+
+    def __init__(self, root, latency=0):
+        super(MemoryFileSystem, self).__init__(root)
+        self._impl.latency = latency
+        self._impl.makedirs(root)
+        self._private = MemoryImpl()
+        self._private.makedirs(root)
+
+    @property
+    def impl(self):
+        return self._impl
+
+    def lock(self, filename):
+        return MemoryLock(filename, self._private)
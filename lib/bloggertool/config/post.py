@@ -12,11 +12,46 @@ import markdown
 
 from dateutil.tz import tzutc
 
-from bloggertool.engine import get_engine, find_type
-from bloggertool.exceptions import ConfigError, UserCancel
+from bloggertool.engine import get_engine, Meta
+from bloggertool.exceptions import (ConfigError, FileNotFoundError,
+                                    UnknownDocType, UserCancel)
 from bloggertool.str_util import T, a
 
-from .attrs import Record, str_attr, set_of_str_attr, timestamp_attr
+from .attrs import Record, str_attr, labels_attr, timestamp_attr
+
+
+def render_source(fs, file, doctype, encoding, cache=None, lookup=True):
+    """Render source file.
+
+    Return (st, digest, inner_html, meta), st is source stat taken
+    before reading, inner_html is None for empty source.
+    Rendered html is stored to render cache if passed,
+    cache is looked up before rendering if lookup is true.
+    Used by build worker processes, so doesn't touch config.
+    """
+    engine = get_engine(doctype)
+    source = fs.load(file)
+    st = source.st
+    digest = source.digest
+    if cache is not None:
+        key = cache.key('inner', digest, encoding, engine.signature())
+        cached = cache.get(key) if lookup else None
+        if cached is not None:
+            inner_html, title, slug, labels = cached
+            meta = Meta()
+            meta.title = title
+            meta.slug = slug
+            meta.labels = frozenset(labels) if labels is not None else None
+            return st, digest, inner_html, meta
+    text = source.text(encoding)
+    if not text:
+        return st, None, None, None
+    # engine can keep intermediate results in cache
+    inner_html, meta = engine.do(text, cache if lookup else None)
+    if cache is not None:
+        labels = sorted(meta.labels) if meta.labels is not None else None
+        cache.put(key, (inner_html, meta.title, meta.slug, labels))
+    return st, digest, inner_html, meta
 
 
 class Post(Record):
@@ -26,7 +61,7 @@ class Post(Record):
     postid = str_attr()
     title = str_attr()
     slug = str_attr()
-    labels = set_of_str_attr()
+    labels = labels_attr()
     published = timestamp_attr()
     updated = timestamp_attr()
     local_stamp = timestamp_attr()
@@ -44,14 +79,23 @@ class Post(Record):
     NICE_HTML_SUFFIX = '.html'
     INNER_HTML_SUFFIX = '.inner.html'
 
+    # render targets
+    INNER = 'inner'
+    NICE = 'nice'
+    TARGETS = (INNER, NICE)
+
     def __init__(self, config, name, file):
         super(Post, self).__init__(config)
         self.name = name
         self.file = file
         self.slug = os.path.basename(name)
-        fs = self.config.fs
-        with fs.open(file, 'r', self.effective_encoding) as f:
-            self.doctype = find_type(f)
+        doctype = self.scan().doctype
+        if doctype is None:
+            raise UnknownDocType()
+        self.doctype = doctype
+
+    def attr_changed(self, name, old_val, new_val):
+        self.config.post_changed(self, name, old_val, new_val)
 
     @property
     def effective_encoding(self):
@@ -74,100 +118,189 @@ class Post(Record):
     def labels_str(self):
         return ', '.join(sorted(self.labels))
 
+    def source(self):
+        """Return Source shared by all source readers"""
+        return self.config.fs.load(self.file)
+
+    def source_digest(self):
+        return self.source().digest
+
+    def scan(self):
+        """Return metadata scanned from source without rendering"""
+        return self.config.source_index.scan(self.file,
+                                             self.effective_encoding)
+
     @property
-    def is_html_fresh(self):
+    def is_inner_html_fresh(self):
         fs = self.config.fs
         if not fs.exists(self.inner_html_path):
             return False
-        if not fs.exists(self.nice_html_path):
-            return False
-        md_time = fs.getmtime(self.file)
-        inner_html_time = fs.getmtime(self.inner_html_path)
-        nice_html_time = fs.getmtime(self.nice_html_path)
-        if md_time > inner_html_time:
-            return False
-        if md_time > nice_html_time:
+        engine = get_engine(self.doctype)
+        return self.config.manifest.is_fresh(self.name,
+                                             fs.stat(self.file),
+                                             self.source_digest,
+                                             engine.signature())
+
+    @property
+    def nice_inputs(self):
+        """Everything passed to template except files"""
+        entry = self.config.manifest.get(self.name)
+        digest = entry.get('digest') if entry is not None else None
+        # unset title is loaded from yaml as empty string
+        return (digest, self.title or None, self.slug or None,
+                sorted(self.labels or ()))
+
+    @property
+    def is_nice_html_fresh(self):
+        if not self.config.fs.exists(self.nice_html_path):
             return False
-        return True
+        return self.config.manifest.is_deps_fresh(
+            self.name, self.config.info.template_key, self.nice_inputs)
 
-    def refresh_html(self, force=False):
-        fs = self.config.fs
-        if not force:
-            if self.is_html_fresh:
+    @property
+    def is_html_fresh(self):
+        return self.is_inner_html_fresh and self.is_nice_html_fresh
+
+    def refresh_html(self, force=False, targets=TARGETS):
+        """Regenerate stale html targets, return True if html was generated.
+
+        Generated html is kept in memory for `inner_html`
+        and `nice_html` calls.
+        """
+        nice = self.NICE in targets
+        inner_fresh = not force and self.is_inner_html_fresh
+        if inner_fresh:
+            if not nice or self.is_nice_html_fresh:
+                return False
+            # only template or post attrs have been changed
+            self.log.info(a("Apply template for {self.name!q}"))
+            inner_html = self._load_html('_inner_text', self.inner_html_path)
+        else:
+            self.log.info(a("Generate html for {self.name!q}"))
+            inner_html = self.generate_inner_html(lookup=not force)
+            if inner_html is None:
                 return False
 
-        self.log.info(a("Generate html for {self.name!q}"))
+        self._inner_text = inner_html
+        if nice:
+            self._nice_text = self.generate_nice_html(inner_html)
+        else:
+            # templated html is made on demand
+            self._nice_text = None
+        return True
+
+    def generate_inner_html(self, lookup=True):
+        """Render source, update post attrs from source metadata.
+
+        Return inner html or None for empty source.
+        Render cache is looked up only if lookup is true.
+        """
+        st, digest, inner_html, meta = render_source(
+            self.config.fs, self.file, self.doctype, self.effective_encoding,
+            self.config.render_cache, lookup)
+        if inner_html is None:
+            self.log.warning("Empty source file: '%s'", self.file)
+            return None
+        self.store_inner_html(st, digest, inner_html, meta)
+        return inner_html
+
+    def store_inner_html(self, st, digest, inner_html, meta):
+        """Apply result of render_source"""
+        # update post title
+        if meta.title is not None:
+            self.overwrite_attr('title', meta.title)
+        if meta.slug is not None:
+            slug = meta.slug
+            if slug != self.slug and self.postid:
+                raise ConfigError(
+                    T("Post {0.name!q} has already published, "
+                      "cannot change slug").format(self))
+            self.overwrite_attr('slug', slug)
+
+        if meta.labels is not None:
+            self.overwrite_attr('labels', meta.labels)
+
+        self.config.fs.write(self.inner_html_path, inner_html)
+        # template only changes don't touch post
         self.local_stamp = datetime.datetime.now(tzutc())
 
         engine = get_engine(self.doctype)
+        self.config.manifest.record(self.name, st, digest,
+                                    engine.signature())
 
-        with fs.open(self.file, 'r', self.effective_encoding) as md:
-            source = md.read()
-            if not source:
-                self.log.warning("Empty source file: '%s'", self.file)
-                return False
+    def generate_nice_html(self, inner_html):
+        info = self.config.info
+        if not info.has_template:
+            self.log.warning(T("""
+                User settings has no template specified.
+                Use markdown output as html.
+                """))
+            html = inner_html
+            used = ()
+        else:
+            labels = list(sorted(self.labels or ()))
+            args = dict(
+                title=self.title,
+                slug=self.slug,
+                labels=labels,
+                inner=inner_html)
 
-            inner_html, meta = engine.do(source)
-            # update post title
-
-            if meta.title is not None:
-                self.overwrite_attr('title', meta.title)
-            if meta.slug is not None:
-                slug = meta.slug
-                if slug != self.slug and self.postid:
-                    raise ConfigError(
-                        T("Post {0.name!q} has already published, "
-                          "cannot change slug").format(self))
-                self.overwrite_attr('slug', slug)
-
-            if meta.labels is not None:
-                self.overwrite_attr('labels', meta.labels)
-
-            with fs.open(self.inner_html_path, 'w') as f:
-                f.write(inner_html)
-
-            with fs.open(self.nice_html_path, 'w') as f:
-                info = self.config.info
-                if not info.has_template:
-                    self.log.warning(T("""
-                        User settings has no template specified.
-                        Use markdown output as html.
-                        """))
-                    f.write(inner_html)
-                else:
-                    template = info.template
-                    labels = list(sorted(self.labels))
-                    args = dict(
-                        title=self.title,
-                        slug=self.slug,
-                        labels=labels,
-                        inner=inner_html)
-
-                    TEMPLATE_VARS = self.TEMPLATE_VARS
-                    if sorted(args.keys()) != sorted(TEMPLATE_VARS.keys()):
-                        missing = set(TEMPLATE_VARS) - set(args)
-                        extra = set(args) - set(TEMPLATE_VARS)
-                        missing = ', '.join(sorted(missing))
-                        extra = ', '.join(sorted(extra))
-                        msg = T("""
-                            Bad template vars list:
-                              missing: {missing}
-                              extra: {extra}
-                            """)(missing=missing, extra=extra)
-                        raise RuntimeError(msg)
-                    for line in template.generate(args):
-                        f.write(line)
-        return True
+            TEMPLATE_VARS = self.TEMPLATE_VARS
+            if sorted(args.keys()) != sorted(TEMPLATE_VARS.keys()):
+                missing = set(TEMPLATE_VARS) - set(args)
+                extra = set(args) - set(TEMPLATE_VARS)
+                missing = ', '.join(sorted(missing))
+                extra = ', '.join(sorted(extra))
+                msg = T("""
+                    Bad template vars list:
+                      missing: {missing}
+                      extra: {extra}
+                    """)(missing=missing, extra=extra)
+                raise RuntimeError(msg)
+            html, used = self.render_template(args)
+
+        self.config.fs.write(self.nice_html_path, html)
+        self.config.manifest.record_deps(self.name, info.template_key, used,
+                                         self.nice_inputs)
+        return html
+
+    def render_template(self, args):
+        """Return (html, used files), reuse cached html if possible"""
+        info = self.config.info
+        manifest = self.config.manifest
+        cache = self.config.render_cache
+        inner_digest = manifest.digest(args['inner'].encode('utf-8'))
+        key = cache.key('nice', inner_digest, args['title'], args['slug'],
+                        args['labels'], info.template_key)
+        cached = cache.get(key)
+        if cached is not None:
+            deps, html = cached
+            if all(manifest.file_digest(path) == digest
+                   for path, digest in deps.iteritems()):
+                return html, deps.keys()
+        html, used = info.render_template(args)
+        deps = dict((path, manifest.file_digest(path)) for path in used)
+        cache.put(key, (deps, html))
+        return html, used
+
+    def _load_html(self, text_attr, path):
+        ret = getattr(self, text_attr, None)
+        if ret is None:
+            # fresh html generated before
+            with self.config.fs.open(path, 'r') as f:
+                ret = f.read()
+            setattr(self, text_attr, ret)
+        return ret
 
     def inner_html(self, force=False):
-        self.refresh_html(force)
-        with self.config.fs.open(self.inner_html_path, 'r') as f:
-            return f.read()
+        if self.refresh_html(force, (self.INNER,)):
+            return self._inner_text
+        return self._load_html('_inner_text', self.inner_html_path)
 
     def nice_html(self, force=False):
-        self.refresh_html(force)
-        with self.config.fs.open(self.nice_html_path, 'r') as f:
-            return f.read()
+        if self.refresh_html(force):
+            return self._nice_text
+        return self._load_html('_nice_text', self.nice_html_path)
 
     def info_list(self, long, indent=4):
         changed = '*' if self.changed else ''
@@ -185,6 +318,28 @@ class Post(Record):
                 """, indent=indent)(self=self)
         return ret
 
+    def source_info(self, indent=4):
+        """Current source metadata, values not applied yet are shown"""
+        try:
+            meta = self.scan()
+        except FileNotFoundError:
+            return T("source: missing", indent=indent)
+        ret = T("""
+            doctype: {meta.doctype}
+            words: {meta.words}
+            """, indent=indent)(meta=meta)
+        pending = []
+        if meta.title is not None and meta.title != self.title:
+            pending.append(('title', meta.title))
+        if meta.slug is not None and meta.slug != self.slug:
+            pending.append(('slug', meta.slug))
+        if meta.labels is not None and meta.labels != self.labels:
+            pending.append(('labels', ', '.join(sorted(meta.labels))))
+        for name, val in pending:
+            ret += '\n' + T("source {name}: {val}",
+                             indent=indent)(name=name, val=val)
+        return ret
+
     def overwrite_attr(self, attr_name, new_val, suppress_empty=True):
         config = self.config
         interactive = config.interactive
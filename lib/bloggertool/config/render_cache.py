@@ -0,0 +1,134 @@
+# config/render_cache.py
+# Copyright (C) 2011-2014 Andrew Svetlov
+# andrew.svetlov@gmail.com
+#
+# This module is part of BloggerTool and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+import hashlib
+import marshal
+import os
+import zlib
+
+from bloggertool.log_util import class_logger
+
+from .file_system import DiskImpl
+
+
+class RenderCache(object):
+    """Content addressed cache of rendered html shared by all commands.
+
+    Entry is zlib compressed marshal dump stored in
+    `<folder>/<key[:2]>/<key>`.  Entries are written to temporary file
+    and renamed, so concurrent readers see either whole entry or nothing.
+    Entry mtime is its last use time, `trim` drops least recently used
+    entries if folder grows over `max_size` bytes.
+    """
+    log = class_logger()
+
+    VERSION = 1
+    DEFAULT_SIZE = 64  # megabytes
+    TRIM_RATIO = 0.8  # trim down to part of max_size
+
+    def __init__(self, folder, max_size=None, impl=None):
+        self._folder = folder
+        self._impl = impl if impl is not None else DiskImpl()
+        if max_size is None:
+            max_size = self.DEFAULT_SIZE * 1024 * 1024
+        self._max_size = max_size
+        self._written = False
+
+    @property
+    def folder(self):
+        return self._folder
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    @classmethod
+    def key(cls, *parts):
+        """Make key from parts, parts should have stable repr"""
+        data = repr((cls.VERSION,) + parts)
+        return hashlib.sha1(data).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.folder, key[:2], key)
+
+    def get(self, key):
+        """Return cached value or None"""
+        path = self.path(key)
+        try:
+            with self._impl.open(path, 'rb') as f:
+                data = f.read()
+            ret = marshal.loads(zlib.decompress(data))
+        except (IOError, OSError, EOFError, ValueError, TypeError,
+                zlib.error):
+            return None
+        try:
+            self._impl.utime(path, None)
+        except OSError:
+            pass  # removed by other process
+        return ret
+
+    def put(self, key, value):
+        path = self.path(key)
+        try:
+            impl = self._impl
+            folder = os.path.dirname(path)
+            if not impl.exists(folder):
+                impl.makedirs(folder)
+            # cache entry can be lost on crash, don't fsync
+            with impl.atomic_write(path, 'wb', sync=False) as f:
+                f.write(zlib.compress(marshal.dumps(value)))
+            self._written = True
+        except (IOError, OSError) as ex:
+            self.log.debug("Cannot write render cache entry '%s': %s",
+                           path, ex)
+
+    def entries(self):
+        """Return list of (mtime, size, path) for all entries"""
+        impl = self._impl
+        ret = []
+        try:
+            subdirs = impl.listdir(self.folder)
+        except OSError:
+            return ret
+        for subdir in subdirs:
+            subdir = os.path.join(self.folder, subdir)
+            try:
+                names = impl.listdir(subdir)
+            except OSError:
+                continue
+            for name in names:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(subdir, name)
+                try:
+                    st = impl.stat(path)
+                except OSError:
+                    continue
+                ret.append((st.st_mtime, st.st_size, path))
+        return ret
+
+    def trim(self, force=False):
+        """Drop least recently used entries if cache is too big.
+
+        Folder is scanned only if entries were written by this process.
+        """
+        if not self._written and not force:
+            return
+        self._written = False
+        entries = self.entries()
+        size = sum(entry[1] for entry in entries)
+        if size <= self.max_size:
+            return
+        limit = self.max_size * self.TRIM_RATIO
+        for mtime, entry_size, path in sorted(entries):
+            try:
+                self._impl.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+            if size <= limit:
+                break
@@ -0,0 +1,93 @@
+# config/snapshot.py
+# Copyright (C) 2011-2014 Andrew Svetlov
+# andrew.svetlov@gmail.com
+#
+# This module is part of BloggerTool and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+import hashlib
+import marshal
+import os
+import time
+
+from bloggertool.log_util import class_logger
+
+from .file_system import DiskImpl
+
+
+class Snapshot(object):
+    """Marshalled copy of parsed yaml config.
+
+    Snapshot is valid while source file has the same size and content
+    hash.  Hash check is skipped if size and mtime are unchanged and
+    source was modified long enough before snapshot has been taken,
+    so hand edits and git checkouts in the same second are still detected.
+    """
+    log = class_logger()
+
+    VERSION = 2
+    RACY_WINDOW = 2  # seconds
+
+    def __init__(self, filename, source, impl=None):
+        self._filename = filename
+        self._source = source
+        self._impl = impl if impl is not None else DiskImpl()
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def source(self):
+        return self._source
+
+    @staticmethod
+    def digest(text):
+        return hashlib.sha1(text).hexdigest()
+
+    def load(self):
+        """Return cached data or None if snapshot is missing or stale"""
+        impl = self._impl
+        try:
+            with impl.open(self.filename, 'rb') as f:
+                header, body = marshal.loads(f.read())
+            version, size, mtime, digest, taken = header
+            if version != self.VERSION:
+                return None
+            st = impl.stat(self.source)
+            if st.st_size != size:
+                return None
+            racy = st.st_mtime + self.RACY_WINDOW > taken
+            if st.st_mtime != mtime or racy:
+                with impl.open(self.source, 'rb') as src:
+                    if self.digest(src.read()) != digest:
+                        return None
+            return marshal.loads(body)
+        except (IOError, OSError, EOFError, ValueError, TypeError) as ex:
+            self.log.debug("Ignore config snapshot '%s': %s",
+                           self.filename, ex)
+            return None
+
+    def save(self, data, text, st):
+        """Store data parsed from text.
+
+        text is source content, st is source stat taken with text.
+        """
+        try:
+            body = marshal.dumps(data)
+        except ValueError:
+            # yaml can contain objects unsupported by marshal
+            return
+        header = (self.VERSION, st.st_size, st.st_mtime,
+                  self.digest(text), time.time())
+        try:
+            impl = self._impl
+            folder = os.path.dirname(self.filename)
+            if not impl.exists(folder):
+                impl.makedirs(folder)
+            with impl.atomic_write(self.filename, 'wb') as f:
+                # body is unmarshalled only if snapshot is valid
+                f.write(marshal.dumps((header, body)))
+        except (IOError, OSError) as ex:
+            self.log.debug("Cannot write config snapshot '%s': %s",
+                           self.filename, ex)
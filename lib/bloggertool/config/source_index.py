@@ -0,0 +1,100 @@
+# config/source_index.py
+# Copyright (C) 2011-2014 Andrew Svetlov
+# andrew.svetlov@gmail.com
+#
+# This module is part of BloggerTool and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+import marshal
+import os
+import time
+
+from bloggertool.engine import scan
+from bloggertool.log_util import class_logger
+
+
+class SourceIndex(object):
+    """Metadata scanned from post sources, persisted between commands.
+
+    Entry keeps source size, mtime and content hash, encoding and
+    scanned values.  Source is read only if its stat has been changed,
+    source with the same content is not scanned again.
+    Unlike build manifest index is pure cache, it is saved by
+    read only commands as well.
+    """
+    log = class_logger()
+
+    VERSION = 1
+    RACY_WINDOW = 2  # seconds
+
+    def __init__(self, filename, fs):
+        self._filename = filename
+        self._fs = fs
+        self._entries = None
+        self._dirty = False
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def entries(self):
+        """{rel_path: (size, mtime, digest, checked, encoding, data)}"""
+        if self._entries is None:
+            self._entries = self._load()
+        return self._entries
+
+    def _load(self):
+        try:
+            with self._fs.private.open(self.filename, 'rb') as f:
+                data = marshal.loads(f.read())
+            if data[0] == (self.VERSION, scan.VERSION):
+                return data[1]
+        except (IOError, OSError, EOFError, ValueError, TypeError) as ex:
+            self.log.debug("Ignore source index '%s': %s",
+                           self.filename, ex)
+        return {}
+
+    def scan(self, rel_path, encoding):
+        """Return ScanMeta for source file rel_path"""
+        entry = self.entries.get(rel_path)
+        if entry is not None and entry[4] == encoding:
+            size, mtime, digest, checked, encoding, data = entry
+            st = self._fs.stat(rel_path)
+            racy = st.st_mtime + self.RACY_WINDOW > checked
+            if size == st.st_size and mtime == st.st_mtime and not racy:
+                return scan.ScanMeta.from_tuple(data)
+        else:
+            digest = None
+        source = self._fs.load(rel_path)
+        if source.digest == digest:
+            # touched source, remember new stat
+            meta = scan.ScanMeta.from_tuple(entry[5])
+        else:
+            meta = scan.scan(source.text(encoding))
+        self.entries[rel_path] = (source.st.st_size, source.st.st_mtime,
+                                  source.digest, time.time(), encoding,
+                                  meta.to_tuple())
+        self._dirty = True
+        return meta
+
+    def drop(self, rel_path):
+        if self.entries.pop(rel_path, None) is not None:
+            self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        try:
+            impl = self._fs.private
+            folder = os.path.dirname(self.filename)
+            if not impl.exists(folder):
+                impl.makedirs(folder)
+            # index can be rebuilt from sources, don't fsync
+            with impl.atomic_write(self.filename, 'wb', sync=False) as f:
+                f.write(marshal.dumps(((self.VERSION, scan.VERSION),
+                                       self.entries)))
+            self._dirty = False
+        except (IOError, OSError) as ex:
+            self.log.warning("Cannot write source index '%s': %s",
+                             self.filename, ex)
@@ -0,0 +1,540 @@
+# config/storage.py
+# Copyright (C) 2011-2014 Andrew Svetlov
+# andrew.svetlov@gmail.com
+#
+# This module is part of BloggerTool and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+import json
+import os
+import sqlite3
+
+import yaml
+
+from bloggertool.log_util import class_logger
+
+from bloggertool.exceptions import ConfigError
+
+from .file_system import FileSystem
+from .info import Info
+from .post import Post
+from .snapshot import Snapshot
+
+
+class Storage(object):
+    """Base for project config storages"""
+    log = class_logger()
+
+    LAZY = False
+
+    def __init__(self, config):
+        self._config = config
+
+    @property
+    def config(self):
+        return self._config
+
+    @property
+    def impl(self):
+        """Operations on storage files"""
+        return self.config.fs.private
+
+    def reset(self):
+        """Mark everything as saved"""
+        config = self.config
+        for post in config._posts.itervalues():
+            post.need_save = False
+        config.info.need_save = False
+        config._dropped.clear()
+
+
+class YamlStorage(Storage):
+    """Whole project config kept in single yaml file"""
+    NAME = 'yaml'
+
+    @classmethod
+    def detect(cls, config):
+        return True
+
+    @property
+    def filename(self):
+        return self.config.config_filename
+
+    @property
+    def files(self):
+        return [self.filename]
+
+    @property
+    def snapshot(self):
+        return Snapshot(self.config.cache_path('config.marshal'),
+                        self.filename, self.impl)
+
+    def load(self):
+        snapshot = self.snapshot
+        cfg = snapshot.load()
+        if cfg is None:
+            st, text = self.impl.read(self.filename)
+            text = text[:]  # large file is memory mapped
+            cfg = yaml.load(text)
+            snapshot.save(cfg, text, st)
+
+        if cfg is not None:
+            # keep raw dicts, Config makes Post on first access
+            records = self.config._records
+            for name, data in (cfg.get('posts') or {}).iteritems():
+                records[Post.name.from_yaml(name)] = data
+            self.load_info(cfg.get('info', {}))
+
+    def load_post(self, name, data):
+        config = self.config
+        data['name'] = Post.name.from_yaml(name)
+        post = Post.from_dict(data)
+        post._config = config
+        config._posts[post.name] = post
+        return post
+
+    def load_info(self, data):
+        config = self.config
+        info = Info.from_dict(data)
+        info._config = config
+        config._info = info
+        return info
+
+    def dump(self):
+        config = self.config
+        posts = {}
+        # untouched records are written back as is
+        for name, data in config._records.iteritems():
+            posts[Post.name.to_yaml(name)] = data
+        for post in config._posts.itervalues():
+            posts[Post.name.to_yaml(post.name)] = post.to_dict()
+        return {'posts': posts,
+                'info': config.info.to_dict()}
+
+    def save(self):
+        self.log.debug("Save config to '%s'", self.filename)
+        cfg = self.dump()
+
+        # NB: save data only after building full yaml dict
+        # Otherwise you can corrupt config file if case of errors
+        text = yaml.dump(cfg)
+        with self.impl.atomic_write(self.filename) as f:
+            f.write(text)
+        # project is locked, nobody else changes file
+        st = self.impl.stat(self.filename)
+        self.snapshot.save(cfg, text, st)
+
+    def create(self):
+        list(self.config)  # fetch all posts from lazy source storage
+        YamlStorage.save(self)
+
+
+class JournalStorage(YamlStorage):
+    """Yaml snapshot plus append-only journal of changed records.
+
+    Every save appends only records marked by `need_save` and names
+    of dropped posts.  Load replays journal over snapshot.  Snapshot is
+    rewritten and journal is truncated when journal grows longer than
+    JOURNAL_LIMIT entries.
+    """
+    NAME = 'journal'
+    JOURNAL_LIMIT = 1000
+
+    def __init__(self, config):
+        super(JournalStorage, self).__init__(config)
+        self._entries = 0
+        self._broken = False
+
+    @classmethod
+    def detect(cls, config):
+        return config.fs.private.exists(config.journal_filename)
+
+    @property
+    def journal_filename(self):
+        return self.config.journal_filename
+
+    @property
+    def files(self):
+        return [self.filename, self.journal_filename]
+
+    def load(self):
+        super(JournalStorage, self).load()
+        self._entries = 0
+        if not self.impl.exists(self.journal_filename):
+            return
+        with self.impl.open(self.journal_filename, 'r') as f:
+            try:
+                for entry in yaml.load_all(f):
+                    if entry is not None:
+                        self.replay(entry)
+                        self._entries += 1
+            except yaml.YAMLError as ex:
+                # incomplete tail after interrupted write,
+                # drop it by compaction on next save
+                self.log.warning("Ignore broken journal tail in '%s': %s",
+                                 self.journal_filename, ex)
+                self._broken = True
+
+    def replay(self, entry):
+        config = self.config
+        if 'post' in entry:
+            name = Post.name.from_yaml(entry['post'])
+            config._posts.pop(name, None)
+            config._records[name] = entry['data']
+        elif 'drop' in entry:
+            name = Post.name.from_yaml(entry['drop'])
+            config._posts.pop(name, None)
+            config._records.pop(name, None)
+        elif 'info' in entry:
+            self.load_info(entry['info'])
+
+    def changes(self):
+        config = self.config
+        ret = []
+        for name in sorted(config._dropped):
+            ret.append({'drop': Post.name.to_yaml(name)})
+        for post in config._posts.itervalues():
+            if post.need_save:
+                ret.append({'post': Post.name.to_yaml(post.name),
+                            'data': post.to_dict()})
+        if config.info.need_save:
+            ret.append({'info': config.info.to_dict()})
+        return ret
+
+    def save(self):
+        entries = self.changes()
+        if not entries:
+            return
+        if (self._broken or
+            self._entries + len(entries) > self.JOURNAL_LIMIT):
+            self.compact()
+        else:
+            self.log.debug("Append %d entries to '%s'",
+                           len(entries), self.journal_filename)
+            with self.impl.open(self.journal_filename, 'a') as f:
+                yaml.dump_all(entries, f, explicit_start=True)
+                self.impl.fsync(f)
+            self._entries += len(entries)
+        self.reset()
+
+    def compact(self):
+        self.log.debug("Compact journal '%s'", self.journal_filename)
+        super(JournalStorage, self).save()
+        # replaying journal over compacted snapshot is harmless,
+        # so crash before truncation doesn't lose data
+        with self.impl.atomic_write(self.journal_filename):
+            pass
+        self._entries = 0
+        self._broken = False
+
+    def create(self):
+        list(self.config)  # fetch all posts from lazy source storage
+        self.compact()
+
+
+class ShardedStorage(YamlStorage):
+    """Every post kept in own small yaml file under shards folder.
+
+    .blogspot.yaml holds only project info.  Posts are read on demand
+    and save writes only files for records marked by `need_save`.
+    """
+    NAME = 'sharded'
+    LAZY = True
+
+    SUFFIX = '.yaml'
+
+    @classmethod
+    def detect(cls, config):
+        return config.fs.private.isdir(config.shards_dir)
+
+    @property
+    def shards_dir(self):
+        return self.config.shards_dir
+
+    @property
+    def files(self):
+        return [self.filename, self.shards_dir]
+
+    def shard_path(self, name, root=None):
+        if root is None:
+            root = self.shards_dir
+        return os.path.join(root, Post.name.to_yaml(name) + self.SUFFIX)
+
+    def load(self):
+        with self.impl.open(self.filename, 'r') as f:
+            cfg = yaml.load(f)
+        if cfg is not None:
+            self.load_info(cfg.get('info', {}))
+
+    def fetch(self, name):
+        fname = self.shard_path(name)
+        if not self.impl.exists(fname):
+            return None
+        with self.impl.open(fname, 'r') as f:
+            return self.load_post(name, yaml.load(f) or {})
+
+    def fetch_all(self):
+        config = self.config
+        for name in self.names():
+            if name in config._posts or name in config._dropped:
+                continue
+            self.fetch(name)
+
+    def index_rows(self):
+        # shards have to be parsed anyway, keep them as posts
+        self.fetch_all()
+        return []
+
+    def names(self):
+        impl = self.impl
+        root = self.shards_dir
+        ret = []
+        folders = [root]
+        while folders:
+            folder = folders.pop()
+            try:
+                fnames = impl.listdir(folder)
+            except OSError:
+                continue
+            for fname in fnames:
+                path = os.path.join(folder, fname)
+                if impl.isdir(path):
+                    folders.append(path)
+                elif fname.endswith(self.SUFFIX):
+                    path = path[len(root) + 1:-len(self.SUFFIX)]
+                    ret.append(Post.name.from_yaml(path))
+        return ret
+
+    def write_post(self, post, root=None):
+        fname = self.shard_path(post.name, root)
+        folder = os.path.dirname(fname)
+        if not self.impl.exists(folder):
+            self.impl.makedirs(folder)
+        with self.impl.atomic_write(fname) as f:
+            yaml.dump(post.to_dict(), f, default_flow_style=False)
+
+    def write_info(self):
+        with self.impl.atomic_write(self.filename) as f:
+            yaml.dump({'info': self.config.info.to_dict()}, f,
+                      default_flow_style=False)
+
+    def save(self):
+        self.log.debug("Save config to '%s'", self.shards_dir)
+        config = self.config
+        for name in config._dropped:
+            fname = self.shard_path(name)
+            if self.impl.exists(fname):
+                self.impl.remove(fname)
+        for post in config._posts.itervalues():
+            if post.need_save:
+                self.write_post(post)
+        if config.info.need_save:
+            self.write_info()
+        self.reset()
+
+    def create(self):
+        self.log.debug("Create shards in '%s'", self.shards_dir)
+        posts = list(self.config)
+        # fill folder aside and move it in place only when complete
+        impl = self.impl
+        tmp_dir = self.shards_dir + '.tmp'
+        if impl.exists(tmp_dir):
+            impl.rmtree(tmp_dir)
+        impl.makedirs(tmp_dir)
+        for post in posts:
+            self.write_post(post, tmp_dir)
+        if impl.exists(self.shards_dir):
+            impl.rmtree(self.shards_dir)
+        impl.rename(tmp_dir, self.shards_dir)
+        self.write_info()
+
+
+class SqliteStorage(Storage):
+    """Posts and project info kept in sqlite database.
+
+    Posts are fetched on demand, so point lookups don't depend on
+    project size.  Save writes only changed records in single transaction.
+    """
+    NAME = 'sqlite'
+    LAZY = True
+
+    SCHEMA = """
+        CREATE TABLE info (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            data TEXT NOT NULL);
+        CREATE TABLE posts (
+            name TEXT PRIMARY KEY,
+            file TEXT NOT NULL,
+            postid TEXT,
+            link TEXT,
+            data TEXT NOT NULL);
+        CREATE INDEX posts_file ON posts (file);
+        CREATE INDEX posts_postid ON posts (postid);
+        CREATE INDEX posts_link ON posts (link);
+        CREATE TABLE labels (
+            label TEXT NOT NULL,
+            name TEXT NOT NULL REFERENCES posts (name) ON DELETE CASCADE,
+            PRIMARY KEY (label, name));
+        CREATE INDEX labels_name ON labels (name);
+        """
+
+    def __init__(self, config):
+        super(SqliteStorage, self).__init__(config)
+        self._conn = None
+
+    @classmethod
+    def detect(cls, config):
+        return config.fs.private.exists(config.db_filename)
+
+    @property
+    def filename(self):
+        return self.config.db_filename
+
+    @property
+    def files(self):
+        return [self.filename]
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.filename)
+            self._conn.execute("PRAGMA foreign_keys = ON")
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def load(self):
+        row = self.conn.execute("SELECT data FROM info").fetchone()
+        if row is not None:
+            data = json.loads(row[0])
+        else:
+            data = {}
+        config = self.config
+        info = Info.from_dict(data)
+        info._config = config
+        config._info = info
+
+    def load_post(self, name, data):
+        config = self.config
+        data = json.loads(data)
+        data['name'] = name
+        post = Post.from_dict(data)
+        post._config = config
+        config._posts[post.name] = post
+        return post
+
+    def fetch(self, name):
+        row = self.conn.execute("SELECT data FROM posts WHERE name = ?",
+                                (name,)).fetchone()
+        if row is None:
+            return None
+        return self.load_post(name, row[0])
+
+    def fetch_all(self):
+        config = self.config
+        for name, data in self.conn.execute("SELECT name, data FROM posts"):
+            if name in config._posts or name in config._dropped:
+                continue
+            self.load_post(name, data)
+
+    def names(self):
+        return [name for (name,) in
+                self.conn.execute("SELECT name FROM posts")]
+
+    def index_rows(self):
+        """Yield (name, postid, link, labels) without decoding posts"""
+        conn = self.conn
+        labels = {}
+        for label, name in conn.execute("SELECT label, name FROM labels"):
+            labels.setdefault(name, set()).add(label)
+        for name, postid, link in conn.execute(
+                "SELECT name, postid, link FROM posts"):
+            yield (name, postid or u'', link or u'',
+                   frozenset(labels.get(name, ())))
+
+    def _fetch_where(self, where, arg):
+        """Posts matching where clause, loaded posts are skipped"""
+        config = self.config
+        ret = []
+        for name, data in self.conn.execute(
+                "SELECT posts.name, posts.data FROM posts " + where, (arg,)):
+            if name in config._posts or name in config._dropped:
+                continue
+            ret.append(self.load_post(name, data))
+        return ret
+
+    def post_by_postid(self, postid):
+        posts = self._fetch_where("WHERE postid = ?", postid)
+        return posts[0] if posts else None
+
+    def post_by_link(self, link):
+        posts = self._fetch_where("WHERE link = ?", link)
+        return posts[0] if posts else None
+
+    def posts_by_label(self, label):
+        return self._fetch_where("JOIN labels ON labels.name = posts.name "
+                                 "WHERE labels.label = ?", label)
+
+    def write_post(self, conn, post):
+        name = post.name
+        conn.execute("INSERT OR REPLACE INTO posts "
+                     "(name, file, postid, link, data) "
+                     "VALUES (?, ?, ?, ?, ?)",
+                     (name, post.file, post.postid or None,
+                      post.link or None, json.dumps(post.to_dict())))
+        conn.execute("DELETE FROM labels WHERE name = ?", (name,))
+        conn.executemany("INSERT INTO labels (label, name) VALUES (?, ?)",
+                         [(label, name) for label in post.labels or ()])
+
+    def write_info(self, conn):
+        conn.execute("INSERT OR REPLACE INTO info (id, data) VALUES (0, ?)",
+                     (json.dumps(self.config.info.to_dict()),))
+
+    def save(self):
+        self.log.debug("Save config to '%s'", self.filename)
+        config = self.config
+        conn = self.conn
+        with conn:
+            for name in config._dropped:
+                conn.execute("DELETE FROM posts WHERE name = ?", (name,))
+            for post in config._posts.itervalues():
+                if post.need_save:
+                    self.write_post(conn, post)
+            if config.info.need_save:
+                self.write_info(conn)
+        self.reset()
+
+    def create(self):
+        self.log.debug("Create database '%s'", self.filename)
+        if type(self.config.fs) is not FileSystem:
+            # sqlite works with files on disk only
+            raise ConfigError("Cannot create database for project "
+                              "not kept on disk")
+        posts = list(self.config)
+        self.close()
+        # fill database aside and move it in place only when complete
+        tmp_filename = self.filename + '.tmp'
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+        conn = sqlite3.connect(tmp_filename)
+        try:
+            conn.executescript(self.SCHEMA)
+            with conn:
+                for post in posts:
+                    self.write_post(conn, post)
+                self.write_info(conn)
+        finally:
+            conn.close()
+        os.rename(tmp_filename, self.filename)
+
+
+storages = [SqliteStorage, ShardedStorage, JournalStorage, YamlStorage]
+
+
+def detect_storage(config):
+    for cls in storages:
+        if cls.detect(config):
+            return cls(config)
@@ -23,15 +23,24 @@ def find_type(f):
     raise UnknownDocType()
 
 
+_engines = {}
+
+
 def get_engine(doctype):
-    if doctype == MARKDOWN:
-        from .markdown import Engine
-        return Engine()
-    elif doctype == REST:
-        from .rest import Engine
-        return Engine()
-    else:
-        raise UnknownDocType()
+    """Return engine for doctype.
+
+    Engines are created once per process and reused for all documents.
+    """
+    engine = _engines.get(doctype)
+    if engine is None:
+        if doctype == MARKDOWN:
+            from .markdown import Engine
+        elif doctype == REST:
+            from .rest import Engine
+        else:
+            raise UnknownDocType()
+        engine = _engines[doctype] = Engine()
+    return engine
 
 
 class Meta(object):
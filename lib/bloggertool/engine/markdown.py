@@ -7,9 +7,28 @@
 
 from __future__ import absolute_import
 
+import collections
+import hashlib
+import re
+
 import markdown
+from markdown.extensions.abbr import ABBR_REF_RE
+from markdown.extensions.fenced_code import FencedBlockPreprocessor
+from markdown.extensions.meta import META_RE, BEGIN_RE
+from markdown.preprocessors import ReferencePreprocessor
+
+from bloggertool.engine import Meta, MARKDOWN
+from bloggertool.engine.scan import markdown_meta
+
+LIST_RE = re.compile(r'^[ ]{0,3}(\d+\.|[*+-])[ ]+', re.M)
+QUOTE_RE = re.compile(r'^[ ]{0,3}>', re.M)
+DEF_RE = re.compile(r'^[ ]{0,3}:[ ]{1,3}', re.M)
+HTML_RE = re.compile(r'^<', re.M)
+ID_RE = re.compile(r'\sid="([^"]*)"')
+# noncharacters, neither markdown syntax nor word
+SENTINEL = u'\ufdd0\ufdd1'
+SENTINEL_HTML = u'<p>%s</p>' % SENTINEL
 
-from bloggertool.engine import Meta
 
 class Engine(object):
     MARKDOWN_EXTS = ['abbr',
@@ -26,24 +45,211 @@ class Engine(object):
                      'toc',  # use [TOC] in md file
                      ]
 
+    # sources longer than that are rendered block by block
+    INCREMENTAL_SIZE = 64 * 1024  # characters
+    BLOCK_CACHE_SIZE = 4096  # blocks
+
+    def __init__(self):
+        # extensions loading and regexps compilation are expensive,
+        # converter is built once and reset between documents
+        self._md = None
+        self._patterns = None
+        self._scanned = collections.OrderedDict()
+        self._rendered = collections.OrderedDict()
+
+    @property
+    def md(self):
+        if self._md is None:
+            self._md = markdown.Markdown(extensions=self.MARKDOWN_EXTS)
+            self._patterns = frozenset(self._md.inlinePatterns.keys())
+        return self._md
+
+    def reset(self):
+        md = self.md
+        md.reset()
+        # abbr extension adds inline pattern for every abbreviation
+        # and doesn't remove it on reset
+        patterns = md.inlinePatterns
+        for key in patterns.keys():
+            if key not in self._patterns:
+                del patterns[key]
+        return md
+
+    def signature(self):
+        """Everything affecting generated html except source"""
+        return (MARKDOWN, markdown.version, tuple(self.MARKDOWN_EXTS))
+
+    def do(self, source, cache=None):
+        """Render source, return (inner_html, meta).
+
+        Blocks are cached in memory only, cache is not used.
+        """
+        ret = None
+        if len(source) >= self.INCREMENTAL_SIZE:
+            ret = self.convert_blocks(source)
+        if ret is None:
+            md = self.reset()
+            ret = md.convert(source), md.Meta
+        inner_html, md_meta = ret
+        return inner_html, markdown_meta(md_meta, Meta())
+
+    def normalize(self, source):
+        """Same as markdown NormalizeWhitespace except trailing lines"""
+        source = source.replace(markdown.util.STX, '')
+        source = source.replace(markdown.util.ETX, '')
+        source = source.replace('\r\n', '\n').replace('\r', '\n')
+        source = source.expandtabs(self.md.tab_length)
+        return re.sub(r'(?<=\n) +\n', '\n', source)
+
+    def split_blocks(self, source):
+        """Split normalized source into independently renderable blocks.
+
+        Blocks are separated by blank lines outside of fenced code and
+        keep blank lines following them.  Block is glued to previous one
+        if markdown can merge them: indented continuation, list or quote
+        after list or quote, definition list, meta-like first line.
+        Blocks starting with reference or abbreviation are glued too,
+        definitions are removed and next line can continue previous block.
+        """
+        lines = source.split('\n')
+        fenced = [False] * len(lines)
+        for m in FencedBlockPreprocessor.FENCED_BLOCK_RE.finditer(source):
+            first = source.count('\n', 0, m.start())
+            last = first + m.group().count('\n')
+            fenced[first:last + 1] = [True] * (last + 1 - first)
+
+        starts = [0]
+        units = []  # texts of blocks without trailing blank lines
+        for i, line in enumerate(lines):
+            if not line and not fenced[i]:
+                continue
+            if i == 0 or lines[i - 1] or fenced[i - 1]:
+                continue  # not a first line of blank separated part
+            end = i
+            while end < len(lines) and (lines[end] or fenced[end]):
+                end += 1
+            text = '\n'.join(lines[i:end])
+            if not units:
+                units.append('\n'.join(lines[:i]))
+            unit = units[-1]
+            definition = DEF_RE.search(text)
+            glue = (definition or
+                    line.startswith(' ' * self.md.tab_length) or
+                    META_RE.match(line) or BEGIN_RE.match(line) or
+                    ReferencePreprocessor.RE.match(line) or
+                    ABBR_REF_RE.match(line) or
+                    (LIST_RE.match(line) and LIST_RE.search(unit)) or
+                    (QUOTE_RE.match(line) and QUOTE_RE.search(unit)))
+            if not glue:
+                starts.append(i)
+                units.append(text)
+                continue
+            units[-1] += '\n' + text
+            if definition and len(units) > 1 and DEF_RE.search(units[-2]):
+                # previous paragraph can become term of preceding list
+                del starts[-1]
+                text = units.pop()
+                units[-1] += '\n' + text
+        starts.append(len(lines))
+        return ['\n'.join(lines[first:last])
+                for first, last in zip(starts, starts[1:])]
+
+    def convert_blocks(self, source):
+        """Render source block by block reusing cached blocks.
+
+        Reference links and abbreviations are collected from all blocks
+        and passed to every block, changing them re-renders everything.
+        Return (html, md_meta) or None if source uses features which
+        require full render: footnotes, toc, raw html, header options,
+        duplicated definitions or header ids.
+        """
+        source = self.normalize(source)
+        if '[^' in source or self.md.treeprocessors['toc'].marker in source:
+            return None
+        if SENTINEL in source:
+            return None
+        outside = FencedBlockPreprocessor.FENCED_BLOCK_RE.sub('', source)
+        if HTML_RE.search(outside):
+            return None
+
+        blocks = self.split_blocks(source)
+        references = {}
+        abbrs = collections.OrderedDict()
+        for text in blocks:
+            block_refs, block_abbrs = self._scan(text)
+            for key, val in block_refs.iteritems():
+                if key in references:
+                    return None
+                references[key] = val
+            for key, val in block_abbrs:
+                if key in abbrs:
+                    return None
+                abbrs[key] = val
+        context = hashlib.sha1(repr((sorted(references.items()),
+                                     [(key, val.title)
+                                      for key, val in abbrs.iteritems()])))
+        context = context.hexdigest()
 
-    def do(self, source):
-        md = markdown.Markdown(extensions=self.MARKDOWN_EXTS)
-        inner_html = md.convert(source)
+        ret = []
+        last = len(blocks) - 1
+        for i, text in enumerate(blocks):
+            html, block_meta = self._render(text, i == last,
+                                            context, references, abbrs)
+            if i == 0:
+                md_meta = block_meta
+            ret.append(html)
+        if 'header_level' in md_meta or 'header_forceid' in md_meta:
+            return None
+        ret = ''.join(ret).strip()
+        ids = ID_RE.findall(ret)
+        if len(ids) != len(set(ids)):
+            return None
+        return ret, md_meta
 
-        meta = Meta
+    def _cached(self, cache, key):
+        ret = cache.pop(key, None)
+        if ret is not None:
+            cache[key] = ret
+        return ret
 
-        if 'title' in md.Meta:
-            meta.title = ' '.join(md.Meta['title'])
+    def _store(self, cache, key, val):
+        cache[key] = val
+        if len(cache) > self.BLOCK_CACHE_SIZE:
+            cache.popitem(last=False)
 
-        if 'slug' in md.Meta:
-            assert len(md.Meta['slug']) == 1
-            slug = md.Meta['slug'][0]
-            meta.slug = slug
+    def _scan(self, text):
+        """Return (references, abbreviations) defined by block"""
+        ret = self._cached(self._scanned, text)
+        if ret is None:
+            md = self.reset()
+            lines = text.split('\n')
+            for prep in md.preprocessors.values():
+                lines = prep.run(lines)
+            ret = (dict(md.references),
+                   [(key, md.inlinePatterns[key])
+                    for key in md.inlinePatterns.keys()
+                    if key not in self._patterns])
+            self._store(self._scanned, text, ret)
+        return ret
 
-        if 'labels' in md.Meta:
-            labels_str = ', '.join(md.Meta['labels'])
-            labels = [l.strip() for l in labels_str.split(',')]
-            meta.labels = frozenset(labels)
+    def _render(self, text, last, context, references, abbrs):
+        """Return (html, md_meta) for block.
 
-        return inner_html, meta
+        Block except last one is followed by sentinel paragraph,
+        html is cut before it and keeps separator required by next block.
+        """
+        key = (context, text, last)
+        ret = self._cached(self._rendered, key)
+        if ret is None:
+            md = self.reset()
+            md.references.update(references)
+            for name, pattern in abbrs.iteritems():
+                md.inlinePatterns[name] = pattern
+            if last:
+                html = md.convert(text)
+            else:
+                html = md.convert(text + '\n' + SENTINEL)
+                html = html[:html.rindex(SENTINEL_HTML)]
+            ret = (html, md.Meta)
+            self._store(self._rendered, key, ret)
+        return ret
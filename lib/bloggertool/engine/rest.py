@@ -1,4 +1,4 @@
-# encoding.py
+# engine/rest.py
 # Copyright (C) 2011-2014 Andrew Svetlov
 # andrew.svetlov@gmail.com
 #
@@ -7,26 +7,120 @@
 
 from __future__ import absolute_import
 
-from docutils import core
-from docutils.writers import html4css1
+import collections
+import copy
+import cPickle as pickle
+import hashlib
 
+import docutils
+from docutils import core, frontend, io
+from docutils.parsers.rst import Parser
+from docutils.readers import doctree, standalone
+from docutils.writers import html4css1, null
 
-class Meta(object):
-    pass
+from bloggertool.engine import Meta, REST
 
 
 class Engine(object):
-    def do(self, source):
+    # settings used by parsing and reader transforms
+    PARSER_SETTINGS = {'input_encoding': 'unicode',
+                       'file_insertion_enabled': False,
+                       }
+    # settings used by html writer only, changing them
+    # doesn't require parsing of cached doctrees
+    WRITER_SETTINGS = {'output_encoding': 'unicode',
+                       # only body is used, don't read stylesheet
+                       'embed_stylesheet': False,
+                       'stylesheet_path': '',
+                       }
+
+    DOCTREE_CACHE_SIZE = 64  # documents
+
+    def __init__(self):
+        # option parser construction is expensive,
+        # settings are made once and copied for every document
+        self._settings = None
+        self._parser = Parser()
+        self._reader = standalone.Reader(parser=self._parser)
+        self._doctree_reader = doctree.Reader(parser_name='null')
+        self._doctrees = collections.OrderedDict()  # key -> pickled doctree
+
+    @property
+    def settings(self):
+        if self._settings is None:
+            defaults = dict(self.PARSER_SETTINGS)
+            defaults.update(self.WRITER_SETTINGS)
+            option_parser = frontend.OptionParser(
+                components=(standalone.Reader, Parser, Writer),
+                defaults=defaults)
+            self._settings = option_parser.get_default_values()
+        return self._settings
+
+    def signature(self):
+        """Everything affecting generated html except source"""
+        return (REST, docutils.__version__,
+                tuple(sorted(self.PARSER_SETTINGS.iteritems())),
+                tuple(sorted(self.WRITER_SETTINGS.iteritems())))
+
+    def doctree_key(self, source):
+        data = repr((docutils.__version__,
+                     sorted(self.PARSER_SETTINGS.iteritems())))
+        data += source.encode('utf-8')
+        return hashlib.sha1(data).hexdigest()
+
+    def do(self, source, cache=None):
+        """Render source, return (inner_html, meta).
+
+        Pickled doctree is kept in memory and in cache if passed,
+        only html writer runs for cached doctree.
+        """
+        document = self.doctree(source, cache)
         writer = Writer()
-        core.publish_string(source, writer=writer)
+        pub = core.Publisher(self._doctree_reader, None, writer,
+                             source=io.DocTreeInput(document),
+                             destination_class=io.StringOutput,
+                             settings=copy.copy(self.settings))
+        pub.set_destination(None, None)
+        pub.publish()
         meta = Meta()
-        meta.title = ''.join(writer.title)
-        meta.slug = None
-        meta.labels = []
-        meta.subtitle = ''.join(writer.subtitle)
-        meta.footer = ''.join(writer.footer)
+        title = ''.join(writer.title)
+        meta.title = title if title else None
         return ''.join(writer.body), meta
 
+    def doctree(self, source, cache=None):
+        """Return document tree for source, parse it if not cached"""
+        key = self.doctree_key(source)
+        data = self._doctrees.pop(key, None)
+        if data is None and cache is not None:
+            data = cache.get(cache.key('doctree', key))
+        if data is None:
+            data = self._pickle(self.parse(source))
+            if cache is not None:
+                cache.put(cache.key('doctree', key), data)
+        self._doctrees[key] = data
+        while len(self._doctrees) > self.DOCTREE_CACHE_SIZE:
+            self._doctrees.popitem(last=False)
+        # writer transforms modify document, use fresh copy
+        return pickle.loads(data)
+
+    def parse(self, source):
+        """Parse source and apply reader transforms"""
+        pub = core.Publisher(self._reader, self._parser, null.Writer(),
+                             source=io.StringInput(source),
+                             destination_class=io.NullOutput,
+                             settings=copy.copy(self.settings))
+        pub.set_destination(None, None)
+        pub.publish()
+        return pub.document
+
+    @staticmethod
+    def _pickle(document):
+        # replaced by doctree reader
+        document.settings = None
+        document.reporter = None
+        document.transformer = None
+        return pickle.dumps(document, pickle.HIGHEST_PROTOCOL)
+
 
 class Writer(html4css1.Writer):
     def __init__(self):
@@ -34,13 +128,10 @@ class Writer(html4css1.Writer):
         self.translator_class = Translator
 
     def apply_template(self):
-        subs = self.interpolation_dict()
-        #from pprint import pprint
-        #pprint(subs)
-        return ''.join(writer.body)
+        # parts are taken from writer attributes, template is not used
+        return ''.join(self.body)
 
 
 class Translator(html4css1.HTMLTranslator):
     def __init__(self, document):
         html4css1.HTMLTranslator.__init__(self, document)
-
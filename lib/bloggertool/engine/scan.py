@@ -0,0 +1,133 @@
+# engine/scan.py
+# Copyright (C) 2011-2014 Andrew Svetlov
+# andrew.svetlov@gmail.com
+#
+# This module is part of BloggerTool and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+from __future__ import absolute_import
+
+import re
+
+from markdown.extensions.meta import (META_RE, META_MORE_RE,
+                                      BEGIN_RE, END_RE)
+
+from bloggertool.engine import find_type, Meta, MARKDOWN
+from bloggertool.exceptions import UnknownDocType
+
+VERSION = 1  # change if scanned values are changed
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+ADORNMENT_RE = re.compile(r'^([!-/:-@\[-`{-~])\1+$')
+
+
+class ScanMeta(Meta):
+    """Source metadata found without rendering.
+
+    labels is None if source doesn't specify labels,
+    doctype is None for blank source.
+    """
+    labels = None
+    doctype = None
+    words = 0
+
+    def to_tuple(self):
+        labels = self.labels
+        if labels is not None:
+            labels = tuple(sorted(labels))
+        return (self.doctype, self.title, self.slug, labels, self.words)
+
+    @classmethod
+    def from_tuple(cls, data):
+        ret = cls()
+        ret.doctype, ret.title, ret.slug, labels, ret.words = data
+        if labels is not None:
+            ret.labels = frozenset(labels)
+        return ret
+
+
+def markdown_meta(md_meta, meta):
+    """Fill meta from values of markdown meta extension"""
+    if 'title' in md_meta:
+        meta.title = ' '.join(md_meta['title'])
+
+    if 'slug' in md_meta:
+        assert len(md_meta['slug']) == 1
+        meta.slug = md_meta['slug'][0]
+
+    if 'labels' in md_meta:
+        labels_str = ', '.join(md_meta['labels'])
+        meta.labels = frozenset(l.strip() for l in labels_str.split(','))
+    return meta
+
+
+def _scan_markdown(lines, meta):
+    """Parse meta block like markdown meta extension does.
+
+    Return number of lines in meta block.
+    """
+    md_meta = {}
+    key = None
+    pos = 0
+    if lines and BEGIN_RE.match(lines[0]):
+        pos = 1
+    while pos < len(lines):
+        line = lines[pos].expandtabs(4)
+        if line.strip() == '' or END_RE.match(line):
+            pos += 1
+            break
+        m1 = META_RE.match(line)
+        if m1:
+            key = m1.group('key').lower().strip()
+            md_meta.setdefault(key, []).append(m1.group('value').strip())
+        else:
+            m2 = META_MORE_RE.match(line)
+            if m2 and key:
+                md_meta[key].append(m2.group('value').strip())
+            else:
+                break
+        pos += 1
+    if 'slug' in md_meta and len(md_meta['slug']) != 1:
+        del md_meta['slug']  # rejected by engine
+    markdown_meta(md_meta, meta)
+    return pos
+
+
+def _scan_rest(lines, meta):
+    """Find title of document starting from overlined header.
+
+    Return number of lines before document body.
+    """
+    pos = 0
+    while pos < len(lines) and not lines[pos].strip():
+        pos += 1
+    header = [line.rstrip() for line in lines[pos:pos + 3]]
+    if len(header) == 3 and ADORNMENT_RE.match(header[0]):
+        title = header[1].strip()
+        if title and header[2] == header[0]:
+            meta.title = title
+            return pos + 3
+    return 0
+
+
+def scan(text):
+    """Return ScanMeta for source text.
+
+    Title, slug and labels are the same as rendering engine
+    usually returns, ReST title is taken from overlined header.
+    """
+    meta = ScanMeta()
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    lines = text.split('\n')
+    try:
+        meta.doctype = find_type(lines)
+    except UnknownDocType:
+        return meta
+    if meta.doctype == MARKDOWN:
+        skip = _scan_markdown(lines, meta)
+    else:
+        skip = _scan_rest(lines, meta)
+    # count words of document body only
+    body = '\n'.join(lines[skip:]) if skip else text
+    meta.words = len(WORD_RE.findall(body))
+    return meta
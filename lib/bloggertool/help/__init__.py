@@ -17,6 +17,7 @@ def add_topic(name, title, text):
 
 
 import bloggertool.help.template  # add topics
+import bloggertool.help.storage
 
 from bloggertool.help.help import make_help
 
@@ -0,0 +1,64 @@
+# help/storage.py
+# Copyright (C) 2011-2014 Andrew Svetlov
+# andrew.svetlov@gmail.com
+#
+# This module is part of BloggerTool and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+from bloggertool.str_util import T
+
+from . import add_topic
+
+
+add_topic('storage', T("Project config storage modes"), T("""
+Project database is stored in .blogspot.yaml file under project root.
+
+By default every command changing the project rewrites whole file.
+That is slow for projects with thousands of registered posts.
+
+Journal mode keeps .blogspot.yaml as snapshot and appends only changed
+posts to .blogspot.journal file. Loading replays the journal over the
+snapshot. The snapshot is rewritten and the journal is truncated
+automatically when the journal becomes too long.
+
+SQLite mode keeps posts and project info in .blogspot.db database.
+Posts are read on demand, so commands operating on single post
+don't depend on project size. Empty .blogspot.yaml is kept as project
+root marker.
+
+Sharded mode keeps every post in own small file under .blogspot folder,
+.blogspot.yaml holds only project info. Commands rewrite only files
+for changed posts, so concurrent edits of different posts are easy
+to merge with version control system.
+
+Parsed yaml config is cached in .blogspot.cache folder to speed up
+startup. The cache is checked against size, modification time and
+content hash of .blogspot.yaml, so it's safe to edit the config
+by hand. The folder can be removed at any time.
+
+The same folder keeps build manifest, compiled templates and cache of
+rendered html shared by all commands, so post is not rendered twice for
+the same source, engine and template. Least recently used html is
+dropped when cache grows over limit, 64 MB by default. Use
+$ blog info --render-cache-size 128
+to change the limit.
+
+Doctype, title, slug, labels and word count scanned from sources are
+indexed there too, 'add', 'ls --long' and 'show' display them without
+rendering and read only sources changed since last scan.
+
+Commands lock the project via .blogspot.lock file. Read only commands
+like 'ls', 'rls' or 'show' without options can run in parallel,
+commands changing the project wait for each other. 'html --serve'
+and 'open --serve' lock the project only while regenerating html.
+Config files are written to temporary file first and renamed in place,
+so a crash never leaves half-written config.
+
+Use
+$ blog init --journal path/to/blog
+to create project in journal mode.
+
+Use
+$ blog migrate yaml|journal|sharded|sqlite
+to convert existing project to other storage.
+"""))
@@ -138,6 +138,7 @@ def main():
     setup_encoding(args.console_encoding)
     setup_log(args)
 
+    cmd = None
     try:
         cmd = args.cmd(args)
         if cmd.require_load_config:
@@ -158,3 +159,6 @@ def main():
         else:
             log.warning("Exit by user interrupt")
         return 254
+    finally:
+        if cmd is not None and cmd.config is not None:
+            cmd.config.close()
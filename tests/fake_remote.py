@@ -0,0 +1,72 @@
+"""Remote replacement used by command tests and benchmarks"""
+
+import collections
+import datetime
+from copy import deepcopy
+
+from dateutil.tz import tzutc
+
+from bloggertool.exceptions import RemoteError
+from bloggertool.remote import Blog, Blogs, Post, Posts
+
+
+class FakeRemote(object):
+    """In-memory blog with Remote interface for tests and benchmarks.
+
+    `calls` counts requests by method name.
+    """
+
+    def __init__(self, blogid='1', url='http://example.blogspot.com'):
+        self._blogid = blogid
+        self._url = url
+        self._items = collections.OrderedDict()  # postid -> item
+        self.calls = collections.Counter()
+
+    def _now(self):
+        return datetime.datetime.now(tzutc()).isoformat()
+
+    def get_blogs(self):
+        self.calls['get_blogs'] += 1
+        return Blogs({'items': [self._blog()]})
+
+    def get_blog(self, blogid):
+        self.calls['get_blog'] += 1
+        return Blog(self._blog())
+
+    def _blog(self):
+        return {'id': self._blogid, 'name': 'Blog', 'url': self._url}
+
+    def get_posts(self):
+        self.calls['get_posts'] += 1
+        return Posts([deepcopy(item) for item in self._items.values()])
+
+    def get_post(self, postid):
+        self.calls['get_post'] += 1
+        try:
+            return Post(deepcopy(self._items[postid]))
+        except KeyError:
+            raise RemoteError('Post %s not found' % postid)
+
+    def update_post(self, post):
+        self.calls['update_post'] += 1
+        if post.postid not in self._items:
+            raise RemoteError('Post %s not found' % post.postid)
+        item = deepcopy(post._item)
+        item['updated'] = self._now()
+        self._items[post.postid] = item
+        return Post(deepcopy(item))
+
+    def add_post(self, title, content, slug=None, labels=None):
+        self.calls['add_post'] += 1
+        postid = str(len(self._items) + 1)
+        now = self._now()
+        item = {'id': postid,
+                'blog': {'id': self._blogid},
+                'title': title,
+                'content': content,
+                'labels': list(labels) if labels else [],
+                'published': now,
+                'updated': now,
+                'url': '%s/%s.html' % (self._url, slug or postid)}
+        self._items[postid] = item
+        return Post(deepcopy(item))
@@ -0,0 +1,341 @@
+import argparse
+import os
+import shutil
+import unittest
+
+from bloggertool.commands.add import AddCommand
+from bloggertool.commands.build import BuildCommand
+from bloggertool.commands.html import HtmlCommand
+from bloggertool.commands.ls import LsCommand
+from bloggertool.commands.publish import PublishCommand
+from bloggertool.commands.push import PushCommand
+from bloggertool.config import Config
+from bloggertool.config.lock import FileLock
+from bloggertool.config.memory_fs import MemoryFileSystem
+from bloggertool.exceptions import ConfigError
+
+from fake_remote import FakeRemote
+
+
+class TestCommandIO(unittest.TestCase):
+    """Command flows on in-memory project with I/O budgets"""
+    COUNT = 10
+
+    def setUp(self):
+        here = os.path.dirname(os.path.abspath(__file__))
+        # nothing is written to disk
+        self.root = os.path.join(here, 'tmp_commands')
+        self.fs = MemoryFileSystem(self.root)
+        self.impl = self.fs.impl
+        for name in (Config.CONFIG_FILENAME, Config.SECRET_FILENAME):
+            self.fs.private.store(self.path(name), '')
+        self.remote = FakeRemote()
+        self.files = []
+        for i in range(self.COUNT):
+            fname = self.path('p%d.md' % i)
+            self.impl.store(fname, 'Title: Post %d\nLabels: a\n\ntext %d\n'
+                            % (i, i), mtime=1000)
+            self.files.append(fname)
+
+    def tearDown(self):
+        self.assertFalse(os.path.exists(self.root))
+
+    def path(self, rel_path):
+        return os.path.join(self.root, rel_path)
+
+    def load_config(self, cmd):
+        # every command is new process with empty stat cache
+        self.fs.invalidate()
+        self.impl.reset_counts()
+        cmd.load_config(argparse.Namespace(interactive=False),
+                        cwd=self.root, fs=self.fs, remote=self.remote)
+        return cmd.config
+
+    def ls(self):
+        return LsCommand(argparse.Namespace(root=self.root, long=False,
+                                            sort='name', label=[],
+                                            any_label=[]))
+
+    def run_command(self, cls, **kwargs):
+        cmd = cls(argparse.Namespace(**kwargs))
+        config = self.load_config(cmd)
+        try:
+            cmd.run()
+            if config.need_save:
+                config.save()
+        finally:
+            config.close()
+        return self.impl.counts
+
+    def add(self):
+        return self.run_command(AddCommand, files=self.files)
+
+    def html(self, fname):
+        return self.run_command(HtmlCommand, file=fname,
+                                always=False, serve=False)
+
+    def test_add(self):
+        counts = self.add()
+        # source is read once to detect doctype
+        self.assertEqual(self.COUNT, counts['read'])
+        self.assertEqual(self.COUNT + 1, self.impl.total)
+        self.assertEqual(0, self.impl.bytes_written)
+        self.assertFalse(os.path.exists(self.path('p0.md')))
+
+    def test_html(self):
+        self.add()
+        self.html(self.files[0])
+        self.assertEqual(2, self.impl.counts['write'])
+        self.assertIn('text 0', self.impl.load(self.path('p0.html')))
+        self.assertIn('text 0', self.impl.load(self.path('p0.inner.html')))
+
+        # fresh html costs directory scan and source stat
+        self.html(self.files[0])
+        self.assertEqual(0, self.impl.bytes_read)
+        self.assertEqual(0, self.impl.bytes_written)
+        self.assertLessEqual(self.impl.total, 2)
+
+        self.impl.store(self.files[0], 'Title: Post 0\n\nnew text\n')
+        self.html(self.files[0])
+        self.assertIn('new text', self.impl.load(self.path('p0.html')))
+
+    def test_build_and_ls(self):
+        self.add()
+        self.run_command(BuildCommand, root=self.root, always=False, jobs=1)
+        self.assertEqual(2 * self.COUNT, self.impl.counts['write'])
+
+        # freshness of whole project is checked by scan of project folder
+        self.run_command(BuildCommand, root=self.root, always=False, jobs=1)
+        self.assertEqual(1, self.impl.counts['listdir'])
+        self.assertEqual(self.COUNT, self.impl.counts['stat'])
+        self.assertEqual(0, self.impl.bytes_read)
+        self.assertEqual(0, self.impl.bytes_written)
+
+        # long listing stats sources to check scanned metadata
+        self.run_command(LsCommand, root=self.root, long=True, sort='name',
+                         label=['a'], any_label=[])
+        self.assertEqual(self.COUNT, self.impl.counts['stat'])
+        self.assertEqual(0, self.impl.bytes_read)
+
+        self.run_command(LsCommand, root=self.root, long=False, sort='name',
+                         label=['a'], any_label=[])
+        self.assertLessEqual(self.impl.total, 1)
+
+    def test_build_jobs(self):
+        self.add()
+        self.run_command(BuildCommand, root=self.root, always=False, jobs=2)
+        self.assertEqual(self.COUNT, self.impl.counts['read'])
+        self.assertEqual(2 * self.COUNT, self.impl.counts['write'])
+        self.assertIn('text 0', self.impl.load(self.path('p0.html')))
+
+    def test_config_in_memory(self):
+        self.add()
+        self.assertIn('p0.md', self.fs.private.load(
+            self.path(Config.CONFIG_FILENAME)))
+        self.run_command(BuildCommand, root=self.root, always=False, jobs=1)
+        self.assertTrue(self.fs.private.exists(
+            os.path.join(self.path(Config.CACHE_DIRNAME), 'manifest')))
+        # project is locked by running command
+        config = self.load_config(self.ls())
+        try:
+            self.assertRaises(ConfigError, self.load_config,
+                              AddCommand(argparse.Namespace(files=[])))
+        finally:
+            config.close()
+
+    def test_scan(self):
+        self.add()
+        config = self.load_config(self.ls())
+        try:
+            post = config['p0']
+            # metadata is not applied before rendering
+            self.assertEqual(u'', post.title)
+            self.assertEqual(u'\n'.join([
+                u'    doctype: Markdown',
+                u'    words: 2',
+                u'    source title: Post 0',
+                u'    source labels: a']), post.source_info())
+            # scanned by add
+            self.assertEqual(0, self.impl.bytes_read)
+
+            self.impl.store(self.files[0],
+                            'Title: Post 0\n\nnew longer text\n')
+            config.fs.invalidate()
+            meta = post.scan()
+            self.assertEqual(3, meta.words)
+            self.assertIsNone(meta.labels)
+            self.assertEqual(1, self.impl.counts['read'])
+        finally:
+            config.close()
+
+    def test_publish_and_push(self):
+        self.add()
+        self.run_command(PublishCommand, file=self.files[0], always=False)
+        self.assertEqual(1, self.remote.calls['add_post'])
+        rpost = self.remote.get_posts()[0]
+        self.assertIn('text 0', rpost.content)
+        self.assertEqual(u'Post 0', rpost.title)
+
+        # published html is fresh, nothing is rendered or written
+        self.run_command(PushCommand, file=self.files[0], always=False)
+        self.assertEqual(1, self.remote.calls['update_post'])
+        self.assertEqual(0, self.impl.bytes_written)
+        self.assertLessEqual(self.impl.total, 3)
+
+        self.impl.store(self.files[0], 'Title: Post 0\n\nchanged\n')
+        self.run_command(PushCommand, file=self.files[0], always=False)
+        self.assertIn('changed', self.remote.get_post('1').content)
+        # nice html is not required for push
+        self.assertNotIn(self.path('p0.html'),
+                         [self.path(name) for name in
+                          self.impl.listdir(self.root)])
+
+
+class TestBuild(unittest.TestCase):
+    NAMES = ('one', 'two', 'three')
+
+    def setUp(self):
+        here = os.path.dirname(os.path.abspath(__file__))
+        self.root = os.path.join(here, 'tmp_build')
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+        os.makedirs(self.root)
+        for name in (Config.CONFIG_FILENAME, Config.SECRET_FILENAME):
+            with open(os.path.join(self.root, name), 'w'):
+                pass
+        for name in self.NAMES:
+            self.write(name, 'Title: %s\n\ntext of %s\n' % (name, name))
+        config = Config.load(cwd=self.root)
+        for name in self.NAMES:
+            config.add(name, name + '.md')
+        config.save()
+        config.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def path(self, rel_path):
+        return os.path.join(self.root, rel_path)
+
+    def write(self, name, text):
+        with open(self.path(name + '.md'), 'w') as f:
+            f.write(text)
+
+    def build(self, jobs=1, always=False):
+        cmd = BuildCommand(argparse.Namespace(root=self.root, always=always,
+                                              jobs=jobs))
+        cmd.config = Config.load(cwd=self.root)
+        cmd.config.interactive = False
+        try:
+            ret = cmd.run()
+            if cmd.config.need_save:
+                cmd.config.save()
+        finally:
+            cmd.config.close()
+        return ret, cmd
+
+    def read_html(self, name):
+        with open(self.path(name + '.html')) as f:
+            return f.read()
+
+    def test_stale_and_fresh(self):
+        ret, cmd = self.build()
+        self.assertEqual(None, ret)
+        self.assertEqual((3, 0, 0), (cmd.rendered, cmd.skipped, cmd.failed))
+        self.assertIn('text of two', self.read_html('two'))
+
+        ret, cmd = self.build()
+        self.assertEqual((0, 3, 0), (cmd.rendered, cmd.skipped, cmd.failed))
+
+        self.write('two', 'Title: two\n\nnew text\n')
+        ret, cmd = self.build()
+        self.assertEqual((1, 2, 0), (cmd.rendered, cmd.skipped, cmd.failed))
+        self.assertIn('new text', self.read_html('two'))
+
+    def test_jobs(self):
+        ret, cmd = self.build(jobs=2)
+        self.assertEqual(None, ret)
+        self.assertEqual((3, 0, 0), (cmd.rendered, cmd.skipped, cmd.failed))
+        for name in self.NAMES:
+            self.assertIn('text of ' + name, self.read_html(name))
+        config = Config.load(exclusive=False, cwd=self.root)
+        try:
+            self.assertEqual(u'three', config['three'].title)
+        finally:
+            config.close()
+
+    def test_missing_source(self):
+        self.build()
+        os.remove(self.path('two.md'))
+        for name in ('one', 'three'):
+            self.write(name, 'Title: %s\n\nnew text\n' % name)
+        ret, cmd = self.build()
+        self.assertEqual(1, ret)
+        self.assertEqual((2, 0, 1), (cmd.rendered, cmd.skipped, cmd.failed))
+        self.assertIn('new text', self.read_html('one'))
+        self.assertIn('new text', self.read_html('three'))
+
+        ret, cmd = self.build(jobs=2, always=True)
+        self.assertEqual(1, ret)
+        self.assertEqual((2, 0, 1), (cmd.rendered, cmd.skipped, cmd.failed))
+
+
+class TestServe(unittest.TestCase):
+    def setUp(self):
+        here = os.path.dirname(os.path.abspath(__file__))
+        self.root = os.path.join(here, 'tmp_serve')
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+        os.makedirs(self.root)
+        for name in (Config.CONFIG_FILENAME, Config.SECRET_FILENAME):
+            with open(os.path.join(self.root, name), 'w'):
+                pass
+        self.write('Title: First\n\ntext\n')
+        config = Config.load(cwd=self.root)
+        config.add('a', 'a.md')
+        config.save()
+        config.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, text):
+        with open(os.path.join(self.root, 'a.md'), 'w') as f:
+            f.write(text)
+
+    def read(self, name):
+        with open(os.path.join(self.root, name)) as f:
+            return f.read()
+
+    def lock(self):
+        lock = FileLock(os.path.join(self.root, Config.LOCK_FILENAME))
+        lock.acquire(exclusive=True, blocking=False)
+        lock.release()
+
+    def test_refresh(self):
+        cmd = HtmlCommand(argparse.Namespace(file='a.md', always=False,
+                                             serve=True))
+        cmd.config = Config.load(cwd=self.root)
+        cmd.config.interactive = True
+        self.assertRaises(ConfigError, self.lock)
+        cmd.release_config()
+        # other commands are not blocked while waiting for changes
+        self.lock()
+
+        # changed by other process
+        config = Config.load(cwd=self.root)
+        config['a'].link = u'http://example.com/a.html'
+        config.save()
+        config.close()
+
+        self.write('Title: Second\n\nnew text\n')
+        cmd.refresh(self.root, 'a')
+        self.lock()
+        self.assertIn('new text', self.read('a.html'))
+        config = Config.load(exclusive=False, cwd=self.root)
+        try:
+            post = config['a']
+            self.assertEqual(u'Second', post.title)
+            self.assertEqual(u'http://example.com/a.html', post.link)
+        finally:
+            config.close()
@@ -33,6 +33,18 @@ class SampleRecord3(Record):
     a = sample_attr()
 
 
+class custom_attr(sample_attr):
+    def setup(self, instance, value):
+        super(custom_attr, self).setup(instance, value * 2)
+
+    def get_val(self, instance):
+        return super(custom_attr, self).get_val(instance) + 1
+
+
+class SampleRecord4(Record):
+    a = custom_attr(0)
+
+
 class TestAttr(unittest.TestCase):
     def test_ctor(self):
         a = sample_attr()
@@ -132,6 +144,25 @@ class TestTimestampAttr(unittest.TestCase):
         r.t = self.dt
         self.assertEqual(self.dt, r.t)
 
+    def test_lazy_decode(self):
+        r = SampleRecord.from_dict({'t': self.t})
+        self.assertEqual(self.t, r._t)
+        self.assertFalse(hasattr(r, '_t_dt'))
+        self.assertEqual(self.t, SampleRecord.t.stamp(r))
+        self.assertEqual(self.dt, r.t)
+        self.assertEqual(self.dt, r._t_dt)
+
+    def test_set_val_stamp(self):
+        r = SampleRecord(SampleConfig())
+        self.assertEqual(None, SampleRecord.t.stamp(r))
+        r.t = self.dt
+        self.assertEqual(self.t, SampleRecord.t.stamp(r))
+        self.assertEqual(self.t, r.to_dict()['t'])
+
+    def test_load_yaml_datetime(self):
+        r = SampleRecord.from_dict({'t': self.dt})
+        self.assertEqual(self.t, SampleRecord.t.stamp(r))
+
 
 class TestSetOfStrAttr(unittest.TestCase):
     def test_from_yaml(self):
@@ -246,3 +277,23 @@ class TestRecord(unittest.TestCase):
         r.a = 234
         r.changed = False
         self.assertEquals({'changed': False, 'a': 234}, r.to_dict())
+
+
+class TestCompiledSerializers(unittest.TestCase):
+    def test_custom_attr(self):
+        r = SampleRecord4.from_dict({'a': 2})
+        self.assertEqual(5, r.a)
+        self.assertEqual({'changed': True, 'a': 5}, r.to_dict())
+
+    def test_default(self):
+        r = SampleRecord4.from_dict({})
+        self.assertEqual({'changed': True, 'a': 1}, r.to_dict())
+
+    def test_unknown_keys_ignored(self):
+        r = SampleRecord3.from_dict({'a': 1, 'b': 2, 'changed': False})
+        self.assertEqual({'changed': False, 'a': 1}, r.to_dict())
+
+    def test_inherited(self):
+        r = SampleRecord2.from_dict({'c': 'c', 'e': 'e'})
+        self.assertEqual(u'c', r.c)
+        self.assertEqual(u'e', r.e)
@@ -1,10 +1,15 @@
 # -*- encoding: utf-8 -*-
 
+import errno
+import hashlib
+import mmap
 import os
 import shutil
 import unittest
 
-from bloggertool.config.file_system import FileSystem
+from bloggertool.config.file_system import (BackgroundWriter, FileSystem,
+                                             MMAP_SIZE, atomic_write,
+                                             write_file)
 from bloggertool.exceptions import FileNotFoundError, FileOutOfProject
 
 
@@ -36,6 +41,7 @@ class TestFileSystem(unittest.TestCase):
 
         with open(fname, 'w'):
             pass
+        self.fs.invalidate()
 
         self.assertTrue(self.fs.exists(rel_name))
         self.assertTrue(self.fs.exists(fname))
@@ -85,6 +91,36 @@ class TestFileSystem(unittest.TestCase):
             content = f.read()
             self.assertEqual('Русский текст 2', content)
 
+    def test_atomic_write(self):
+        fname = os.path.join(self.tmpdir, 'filename')
+        with open(fname, 'w') as f:
+            f.write('old')
+
+        with atomic_write(fname) as f:
+            f.write('new')
+            with open(fname) as f2:
+                self.assertEqual('old', f2.read())
+
+        with open(fname) as f:
+            self.assertEqual('new', f.read())
+        self.assertEqual(['filename'], os.listdir(self.tmpdir))
+
+    def test_atomic_write_error(self):
+        fname = os.path.join(self.tmpdir, 'filename')
+        with open(fname, 'w') as f:
+            f.write('old')
+
+        try:
+            with atomic_write(fname) as f:
+                f.write('new')
+                raise RuntimeError()
+        except RuntimeError:
+            pass
+
+        with open(fname) as f:
+            self.assertEqual('old', f.read())
+        self.assertEqual(['filename'], os.listdir(self.tmpdir))
+
     def test_replace_text(self):
         self.assertEqual('file.html', self.fs.replace_ext('file.md', '.html'))
 
@@ -112,6 +148,7 @@ class TestFileSystem(unittest.TestCase):
 
         with open(fname, 'w'):
             pass
+        self.fs.invalidate(rel_name)
 
         self.assertEqual(fname, self.fs.abs_path(rel_name))
 
@@ -147,3 +184,203 @@ class TestFileSystem(unittest.TestCase):
         os.chdir(dir_name)
         #import pdb;pdb.set_trace()
         self.assertEqual(rel_name, self.fs.rel_path(abs_path))
+
+
+class TestBackgroundWrite(unittest.TestCase):
+    def setUp(self):
+        here = os.path.dirname(os.path.abspath(__file__))
+        self.tmpdir = os.path.join(here, 'tmp_writer')
+        if not os.path.exists(self.tmpdir):
+            os.makedirs(self.tmpdir)
+        self.fs = FileSystem(self.tmpdir)
+
+    def tearDown(self):
+        self.fs.flush()
+        shutil.rmtree(self.tmpdir)
+
+    def test_write(self):
+        self.fs.write('a.html', u'ф')
+        self.assertTrue(self.fs.exists('a.html'))
+        with self.fs.open('a.html', 'r') as f:
+            self.assertEqual(u'ф', f.read())
+        self.fs.flush()
+        self.assertEqual([], [name for name in os.listdir(self.tmpdir)
+                              if name.endswith('.tmp')])
+
+    def test_last_write_wins(self):
+        for i in range(20):
+            self.fs.write('a.html', unicode(i))
+        self.fs.flush()
+        with open(os.path.join(self.tmpdir, 'a.html')) as f:
+            self.assertEqual('19', f.read())
+
+    def test_error(self):
+        self.fs.write('missing/a.html', u'text')
+        self.assertRaises(IOError, self.fs.flush)
+        self.fs.flush()  # error is reported once
+
+    def test_unexpected_error(self):
+        def write(path, data):
+            if path.endswith('bad.html'):
+                raise ValueError(path)
+            write_file(path, data)
+        writer = BackgroundWriter(write)
+        writer.write(os.path.join(self.tmpdir, 'bad.html'), 'text')
+        self.assertRaises(ValueError, writer.wait)
+        # writer thread is still running
+        writer.write(os.path.join(self.tmpdir, 'a.html'), 'text')
+        writer.wait()
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir, 'a.html')))
+
+
+class TestStatCache(unittest.TestCase):
+    def setUp(self):
+        here = os.path.dirname(os.path.abspath(__file__))
+        self.tmpdir = os.path.join(here, 'tmp_stats')
+        if not os.path.exists(self.tmpdir):
+            os.makedirs(self.tmpdir)
+        for i in range(10):
+            with open(os.path.join(self.tmpdir, '%d.md' % i), 'w') as f:
+                f.write('text')
+        self.fs = FileSystem(self.tmpdir)
+        self.calls = []
+        impl = self.fs._impl
+        for name in ('exists', 'stat', 'listdir'):
+            setattr(impl, name, self.counter(name, getattr(impl, name)))
+
+    def tearDown(self):
+        self.fs.flush()
+        shutil.rmtree(self.tmpdir)
+
+    def counter(self, name, func):
+        def wrapper(*args):
+            self.calls.append(name)
+            return func(*args)
+        return wrapper
+
+    def test_single_scan(self):
+        for i in range(10):
+            self.assertTrue(self.fs.exists('%d.md' % i))
+            self.assertFalse(self.fs.exists('%d.html' % i))
+            self.assertEqual(4, self.fs.stat('%d.md' % i).st_size)
+            self.assertEqual(self.fs.stat('%d.md' % i).st_mtime,
+                             self.fs.getmtime('%d.md' % i))
+        self.assertEqual(['listdir'] + ['stat'] * 10, self.calls)
+
+    def test_missing(self):
+        self.assertRaises(FileNotFoundError, self.fs.stat, 'missing.md')
+        self.assertRaises(OSError, self.fs.stats.stat,
+                          os.path.join(self.tmpdir, 'missing.md'))
+        self.assertFalse(self.fs.exists('missing/a.md'))
+        self.assertEqual(['listdir', 'listdir'], self.calls)
+
+    def test_unreadable_folder(self):
+        os.makedirs(os.path.join(self.tmpdir, 'sub'))
+        with open(os.path.join(self.tmpdir, 'sub', 'a.md'), 'w') as f:
+            f.write('text')
+        listdir = self.fs._impl.listdir
+
+        def execute_only(folder):
+            if folder.endswith('sub'):
+                self.calls.append('listdir')
+                raise OSError(errno.EACCES, os.strerror(errno.EACCES),
+                              folder)
+            return listdir(folder)
+        self.fs._impl.listdir = execute_only
+        self.assertTrue(self.fs.exists('sub/a.md'))
+        self.assertFalse(self.fs.exists('sub/b.md'))
+        self.assertEqual(4, self.fs.stat('sub/a.md').st_size)
+        self.assertEqual(['listdir', 'exists', 'listdir', 'exists',
+                          'listdir', 'exists', 'listdir', 'stat'],
+                         self.calls)
+
+    def test_root(self):
+        self.fs.rel_path(self.tmpdir)
+        self.assertTrue(self.fs.exists('0.md'))
+        # parent of project is not listed
+        self.assertEqual(['listdir'], self.calls)
+
+    def test_write(self):
+        self.assertEqual(4, self.fs.stat('0.md').st_size)
+        self.assertFalse(self.fs.exists('0.html'))
+        self.fs.write('0.md', u'new text')
+        self.fs.write('0.html', u'html')
+        self.fs.flush()
+        self.assertEqual(8, self.fs.stat('0.md').st_size)
+        self.assertTrue(self.fs.exists('0.html'))
+        with self.fs.open('1.md', 'w') as f:
+            f.write(u'other text')
+        self.assertEqual(10, self.fs.stat('1.md').st_size)
+        self.assertEqual(1, self.calls.count('listdir'))
+
+    def test_invalidate(self):
+        self.assertEqual(4, self.fs.stat('0.md').st_size)
+        os.remove(os.path.join(self.tmpdir, '1.md'))
+        with open(os.path.join(self.tmpdir, '0.md'), 'w') as f:
+            f.write('changed outside')
+        self.assertTrue(self.fs.exists('1.md'))
+        self.fs.invalidate('0.md')
+        self.assertFalse(self.fs.exists('1.md'))
+        self.assertEqual(15, self.fs.stat('0.md').st_size)
+        self.fs.invalidate()
+        self.assertEqual(15, self.fs.stat('0.md').st_size)
+        self.assertEqual(3, self.calls.count('listdir'))
+
+
+class TestSource(unittest.TestCase):
+    def setUp(self):
+        here = os.path.dirname(os.path.abspath(__file__))
+        self.tmpdir = os.path.join(here, 'tmp_source')
+        if not os.path.exists(self.tmpdir):
+            os.makedirs(self.tmpdir)
+        self.fs = FileSystem(self.tmpdir)
+        self.reads = []
+        read = self.fs._impl.read
+
+        def counter(path):
+            self.reads.append(path)
+            return read(path)
+        self.fs._impl.read = counter
+
+    def tearDown(self):
+        self.fs.flush()
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, rel_path, data):
+        with open(os.path.join(self.tmpdir, rel_path), 'wb') as f:
+            f.write(data)
+        self.fs.invalidate(rel_path)
+
+    def test_load(self):
+        data = u'\n\u0422\u0435\u043a\u0441\u0442\n'.encode('utf-8')
+        self.write('a.md', data)
+        source = self.fs.load('a.md')
+        self.assertEqual(data, source.data)
+        self.assertEqual(len(data), source.st.st_size)
+        self.assertEqual(hashlib.sha1(data).hexdigest(), source.digest)
+        text = source.text('utf-8')
+        self.assertEqual(data.decode('utf-8'), text)
+        self.assertIs(text, source.text('utf-8'))
+        self.assertEqual(data.decode('cp1251'), source.text('cp1251'))
+        self.assertEqual([u'\n', text[1:]],
+                         list(source.lines('utf-8')))
+        self.assertIs(source, self.fs.load('a.md'))
+        self.assertEqual(1, len(self.reads))
+        self.assertRaises(FileNotFoundError, self.fs.load, 'b.md')
+
+    def test_reload(self):
+        self.write('a.md', 'text')
+        self.fs.load('a.md')
+        self.fs.write('a.md', u'new text')
+        self.assertEqual('new text', self.fs.load('a.md').data)
+        self.write('a.md', 'changed outside')
+        self.assertEqual('changed outside', self.fs.load('a.md').data)
+        self.assertEqual(3, len(self.reads))
+
+    def test_mmap(self):
+        data = 'line\n' * (MMAP_SIZE // 5 + 1)
+        self.write('a.md', data)
+        source = self.fs.load('a.md')
+        self.assertIsInstance(source.data, mmap.mmap)
+        self.assertEqual(hashlib.sha1(data).hexdigest(), source.digest)
+        self.assertEqual(data, source.text('ascii'))
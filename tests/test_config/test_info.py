@@ -1 +1,100 @@
+import os
+import shutil
 import unittest
+
+from bloggertool.config import Config
+
+
+class TestTemplate(unittest.TestCase):
+    def setUp(self):
+        here = os.path.dirname(os.path.abspath(__file__))
+        self.root = os.path.join(here, 'tmp_info')
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+        os.makedirs(os.path.join(self.root, 'tmpl'))
+        with open(os.path.join(self.root, Config.CONFIG_FILENAME), 'w'):
+            pass
+        self.write('tmpl/base.html',
+                   '<link href="{{ "style.css"|abspath }}">'
+                   '{% block body %}{% endblock %}')
+        self.write('tmpl/page.html',
+                   '{% extends "base.html" %}'
+                   '{% block body %}{% include "part.html" %}'
+                   '{{ inner }}{% endblock %}')
+        self.write('tmpl/part.html', 'part')
+        self.write('tmpl/style.css', 'body {}')
+        self.config = self.make_config()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, rel_path, text):
+        with open(os.path.join(self.root, rel_path), 'w') as f:
+            f.write(text)
+
+    def make_config(self):
+        config = Config(self.root)
+        config.storage.load()
+        config.info.template_dir = 'tmpl'
+        config.info.template_file = 'page.html'
+        return config
+
+    def count_compiles(self, env):
+        compiled = []
+        compile = env.compile
+
+        def wrapper(source, name=None, *args, **kwargs):
+            compiled.append(name)
+            return compile(source, name, *args, **kwargs)
+        env.compile = wrapper
+        return compiled
+
+    def test_bytecode_cache(self):
+        info = self.config.info
+        compiled = self.count_compiles(info.template_env)
+        html, used = info.render_template({'inner': 'text'})
+        self.assertEqual(['base.html', 'page.html', 'part.html'],
+                         sorted(compiled))
+        self.assertEqual(3, len(os.listdir(self.config.cache_path('jinja'))))
+
+        info = self.make_config().info
+        compiled = self.count_compiles(info.template_env)
+        self.assertEqual((html, used), info.render_template({'inner': 'text'}))
+        self.assertEqual([], compiled)
+
+    def test_changed_template(self):
+        info = self.config.info
+        info.render_template({})
+        self.write('tmpl/part.html', 'new part')
+        info = self.make_config().info
+        compiled = self.count_compiles(info.template_env)
+        html, used = info.render_template({})
+        self.assertIn('new part', html)
+        self.assertEqual(['part.html'], compiled)
+
+    def test_abspath_memoized(self):
+        info = self.config.info
+        env = info.template_env
+        calls = []
+        abs_path = env.fs.abs_path
+
+        def wrapper(rel_path, *args, **kwargs):
+            calls.append(rel_path)
+            return abs_path(rel_path, *args, **kwargs)
+        env.fs.abs_path = wrapper
+        style = os.path.join(self.root, 'tmpl', 'style.css')
+        for i in range(3):
+            html, used = info.render_template({})
+            self.assertIn(style, html)
+            self.assertIn(style, used)
+        self.assertEqual(['style.css'], calls)
+
+    def test_warm_up(self):
+        info = self.config.info
+        compiled = self.count_compiles(info.template_env)
+        info.warm_up_template()
+        self.assertEqual(['base.html', 'page.html', 'part.html'],
+                         sorted(compiled))
+        info.render_template({})
+        info.warm_up_template()
+        self.assertEqual(3, len(compiled))
@@ -0,0 +1,106 @@
+import unittest
+
+from bloggertool.config.labels import (LabelTable, bitmap_of, iter_bits,
+                                      popcount)
+from bloggertool.config.attrs import labels_attr, Record
+from bloggertool.config.index import Index
+
+
+class SampleConfig(object):
+    need_save = False
+
+
+class LabeledRecord(Record):
+    labels = labels_attr()
+
+
+class TestLabelTable(unittest.TestCase):
+    def test_bits(self):
+        self.assertEqual([0, 3, 70], list(iter_bits(1 | 8 | 1 << 70)))
+        self.assertEqual(3, popcount(1 | 8 | 1 << 70))
+        self.assertEqual([], list(iter_bits(0)))
+        self.assertEqual(1 | 8 | 1 << 70, bitmap_of([70, 0, 3, 3]))
+        self.assertEqual(0, bitmap_of([]))
+
+    def test_intern(self):
+        table = LabelTable()
+        self.assertEqual(0, table.intern('a'))
+        self.assertEqual(1, table.intern('b'))
+        self.assertEqual(0, table.intern('a'))
+        self.assertEqual(None, table.id('c'))
+        self.assertEqual('b', table.label(1))
+        self.assertEqual(2, len(table))
+
+    def test_encode_decode(self):
+        table = LabelTable()
+        bits = table.encode(['a', 'b'])
+        self.assertEqual(3, bits)
+        self.assertEqual(frozenset(['a', 'b']), table.decode(bits))
+        self.assertIs(table.decode(bits), table.decode(3))
+        self.assertEqual(0, table.encode(None))
+        self.assertEqual(frozenset(), table.decode(0))
+
+
+class TestLabelsAttr(unittest.TestCase):
+    def setUp(self):
+        self.config = SampleConfig()
+
+    def test_shared_sets(self):
+        r1 = LabeledRecord(self.config)
+        r2 = LabeledRecord(self.config)
+        r1.labels = ['a', 'b']
+        r2.labels = set(['b', 'a'])
+        self.assertEqual(frozenset(['a', 'b']), r1.labels)
+        self.assertIs(r1.labels, r2.labels)
+        bits = LabeledRecord.labels.bits(r1)
+        self.assertTrue(isinstance(bits, (int, long)))
+
+    def test_default(self):
+        r = LabeledRecord(self.config)
+        self.assertEqual(None, r.labels)
+        self.assertEqual(0, LabeledRecord.labels.bits(r))
+        self.assertEqual([], r.to_dict()['labels'])
+
+    def test_serialize(self):
+        r = LabeledRecord.from_dict({'labels': ['b', 'a']})
+        self.assertEqual(frozenset([u'a', u'b']), r.labels)
+        self.assertEqual(['a', 'b'], r.to_dict()['labels'])
+
+
+class TestIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = Index(LabelTable())
+        self.index.add_all([('c', '3', None, ['x']),
+                            ('a', '1', 'http://a', ['x', 'y']),
+                            ('b/2', None, None, None),
+                            ('b/1', '2', None, ['y'])])
+
+    def test_add_all(self):
+        index = self.index
+        self.assertEqual(['a', 'b/1', 'b/2', 'c'], index.by_prefix(''))
+        self.assertEqual(['b/1', 'b/2'], index.by_prefix('b/'))
+        self.assertEqual('b/1', index.by_postid('2'))
+        self.assertEqual('a', index.by_link('http://a'))
+        self.assertEqual(['a', 'c'], index.by_label('x'))
+        self.assertEqual({'x': 2, 'y': 2}, index.label_counts())
+
+    def test_add_remove(self):
+        index = self.index
+        index.add('b/0', None, None, ['x'])
+        index.remove('a', '1', 'http://a', ['x', 'y'])
+        self.assertEqual(['b/0', 'b/1', 'b/2', 'c'], index.by_prefix(''))
+        self.assertEqual(['b/0', 'c'], index.by_label('x'))
+        self.assertEqual(None, index.by_postid('1'))
+
+    def test_compact(self):
+        index = self.index
+        index.remove('a', '1', 'http://a', ['x', 'y'])
+        index.remove('b/2', None, None, None)
+        index.remove('b/1', '2', None, ['y'])
+        # removed rows are renumbered
+        self.assertEqual({'c': 0}, index._rows)
+        self.assertEqual(['c'], index.by_label('x'))
+        self.assertEqual([], index.by_label('y'))
+        index.add('d', None, None, ['y'])
+        self.assertEqual(['d'], index.by_label('y'))
+        self.assertEqual({'x': 1}, index.label_counts(['c', 'e']))
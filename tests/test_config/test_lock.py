@@ -0,0 +1,58 @@
+import os
+import shutil
+import unittest
+
+from bloggertool.config.lock import FileLock
+from bloggertool.exceptions import ConfigError
+
+
+class TestFileLock(unittest.TestCase):
+    def setUp(self):
+        here = os.path.dirname(os.path.abspath(__file__))
+        self.root = os.path.join(here, 'tmp_lock')
+        if not os.path.exists(self.root):
+            os.makedirs(self.root)
+        self.fname = os.path.join(self.root, 'lock')
+        self.locks = []
+
+    def tearDown(self):
+        for lock in self.locks:
+            lock.release()
+        shutil.rmtree(self.root)
+
+    def make_lock(self):
+        lock = FileLock(self.fname)
+        self.locks.append(lock)
+        return lock
+
+    def test_shared(self):
+        lock1 = self.make_lock()
+        lock2 = self.make_lock()
+        lock1.acquire(False)
+        lock2.acquire(False, blocking=False)
+        self.assertTrue(lock1.locked)
+        self.assertFalse(lock1.exclusive)
+        self.assertTrue(lock2.locked)
+
+    def test_exclusive(self):
+        lock1 = self.make_lock()
+        lock2 = self.make_lock()
+        lock1.acquire(True)
+        self.assertTrue(lock1.exclusive)
+        self.assertRaises(ConfigError, lock2.acquire, False, False)
+        self.assertFalse(lock2.locked)
+
+    def test_exclusive_after_shared(self):
+        lock1 = self.make_lock()
+        lock2 = self.make_lock()
+        lock1.acquire(False)
+        self.assertRaises(ConfigError, lock2.acquire, True, False)
+
+    def test_release(self):
+        lock1 = self.make_lock()
+        lock2 = self.make_lock()
+        lock1.acquire(True)
+        lock1.release()
+        self.assertFalse(lock1.locked)
+        lock2.acquire(True, blocking=False)
+        self.assertTrue(lock2.exclusive)
@@ -0,0 +1,300 @@
+import argparse
+import os
+import shutil
+import unittest
+
+from bloggertool.commands.build import BuildCommand
+from bloggertool.config import Config
+from bloggertool.config.post import Post
+from bloggertool.config.manifest import Manifest
+
+
+class ManifestTestCase(unittest.TestCase):
+    def setUp(self):
+        here = os.path.dirname(os.path.abspath(__file__))
+        self.root = os.path.join(here, 'tmp_manifest')
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+        os.makedirs(self.root)
+
+    def tearDown(self):
+        config = getattr(self, 'config', None)
+        if config is not None:
+            config.fs.flush()
+        shutil.rmtree(self.root)
+
+    def write(self, rel_path, text, age=10):
+        fname = os.path.join(self.root, rel_path)
+        with open(fname, 'w') as f:
+            f.write(text)
+        # out of racy window
+        old = int(os.path.getmtime(fname)) - age
+        os.utime(fname, (old, old))
+        config = getattr(self, 'config', None)
+        if config is not None:
+            # changed outside of config file system
+            config.fs.invalidate()
+        return os.stat(fname)
+
+
+class TestManifest(ManifestTestCase):
+    def setUp(self):
+        super(TestManifest, self).setUp()
+        self.manifest = Manifest(os.path.join(self.root, 'cache', 'manifest'))
+        self.reads = []
+
+    def reader(self, text):
+        def digest():
+            self.reads.append(text)
+            return Manifest.digest(text)
+        return digest
+
+    def record(self, text, engine=('E', 1)):
+        st = self.write('a.md', text)
+        self.manifest.record('a', st, Manifest.digest(text), engine)
+        return st
+
+    def test_missing(self):
+        st = self.write('a.md', 'text')
+        self.assertFalse(self.manifest.is_fresh('a', st,
+                                                self.reader('text'),
+                                                ('E', 1)))
+
+    def test_stat_check(self):
+        st = self.record('text')
+        self.assertTrue(self.manifest.is_fresh('a', st,
+                                               self.reader('text'),
+                                               ('E', 1)))
+        self.assertEqual([], self.reads)
+
+    def test_touched(self):
+        self.record('text')
+        st = self.write('a.md', 'text', age=5)
+        self.assertTrue(self.manifest.is_fresh('a', st,
+                                               self.reader('text'),
+                                               ('E', 1)))
+        self.assertEqual(['text'], self.reads)
+        # new stat is remembered
+        self.assertTrue(self.manifest.is_fresh('a', st,
+                                               self.reader('text'),
+                                               ('E', 1)))
+        self.assertEqual(['text'], self.reads)
+
+    def test_changed(self):
+        self.record('text')
+        st = self.write('a.md', 'TEXT', age=5)
+        self.assertFalse(self.manifest.is_fresh('a', st,
+                                                self.reader('TEXT'),
+                                                ('E', 1)))
+
+    def test_engine_changed(self):
+        st = self.record('text')
+        self.assertFalse(self.manifest.is_fresh('a', st,
+                                                self.reader('text'),
+                                                ('E', 2)))
+
+    def test_save_load(self):
+        st = self.record('text')
+        self.manifest.save()
+        manifest = Manifest(self.manifest.filename)
+        self.assertTrue(manifest.is_fresh('a', st, self.reader('text'),
+                                          ('E', 1)))
+
+    def test_drop(self):
+        st = self.record('text')
+        self.manifest.drop('a')
+        self.assertFalse(self.manifest.is_fresh('a', st,
+                                                self.reader('text'),
+                                                ('E', 1)))
+
+
+class TestPostFreshness(ManifestTestCase):
+    def setUp(self):
+        super(TestPostFreshness, self).setUp()
+        with open(os.path.join(self.root, Config.CONFIG_FILENAME), 'w'):
+            pass
+        self.write('a.md', 'Title: A\n\ntext\n')
+        self.config = Config(self.root)
+        self.config.storage.load()
+        self.post = self.config.add('a', 'a.md')
+
+    def test_refresh(self):
+        self.assertFalse(self.post.is_html_fresh)
+        self.assertTrue(self.post.refresh_html())
+        self.assertTrue(self.post.is_html_fresh)
+        self.assertFalse(self.post.refresh_html())
+
+    def test_touch(self):
+        self.post.refresh_html()
+        os.utime(os.path.join(self.root, 'a.md'), None)
+        self.assertTrue(self.post.is_html_fresh)
+
+    def test_modified(self):
+        self.post.refresh_html()
+        self.write('a.md', 'Title: A\n\nother text\n', age=5)
+        self.assertFalse(self.post.is_html_fresh)
+
+    def test_saved(self):
+        self.post.refresh_html()
+        self.config.save()
+        config = Config(self.root)
+        config.storage.load()
+        self.assertTrue(config['a'].is_html_fresh)
+
+    def test_saved_without_title(self):
+        self.write('b.md', 'text without meta\n')
+        post = self.config.add('b', 'b.md')
+        post.refresh_html()
+        self.assertIsNone(post.title or None)
+        self.config.save()
+        config = Config(self.root)
+        config.storage.load()
+        # unset title is loaded from yaml as empty string
+        self.assertEqual(u'', config['b'].title)
+        self.assertTrue(config['b'].is_nice_html_fresh)
+        self.assertFalse(config['b'].refresh_html())
+
+
+class TestTemplateDeps(ManifestTestCase):
+    def setUp(self):
+        super(TestTemplateDeps, self).setUp()
+        with open(os.path.join(self.root, Config.CONFIG_FILENAME), 'w'):
+            pass
+        os.makedirs(os.path.join(self.root, 'tmpl'))
+        self.write('tmpl/base.html',
+                   '<link href="{{ "style.css"|abspath }}">'
+                   '{% block body %}{% endblock %}')
+        self.write('tmpl/page.html',
+                   '{% extends "base.html" %}'
+                   '{% block body %}{% include "part.html" %}'
+                   '{{ inner }}{% endblock %}')
+        self.write('tmpl/part.html', 'part')
+        self.write('tmpl/style.css', 'body {}')
+        self.write('a.md', 'text\n')
+        self.config = Config(self.root)
+        self.config.storage.load()
+        self.config.info.template_dir = 'tmpl'
+        self.config.info.template_file = 'page.html'
+        self.post = self.config.add('a', 'a.md')
+        self.post.refresh_html()
+
+    def read(self, rel_path):
+        self.config.fs.flush()
+        with open(os.path.join(self.root, rel_path)) as f:
+            return f.read()
+
+    def test_deps(self):
+        entry = self.config.manifest.get('a')
+        tmpl = os.path.join(self.root, 'tmpl')
+        self.assertEqual(sorted(os.path.join(tmpl, name)
+                                for name in ('base.html', 'page.html',
+                                             'part.html', 'style.css')),
+                         sorted(entry['deps']))
+        self.assertEqual(('tmpl', 'page.html'), entry['template'])
+        self.assertTrue(self.post.is_html_fresh)
+
+    def test_include_changed(self):
+        # inner html is reused, source is not rendered again
+        self.config.save()
+        self.write('a.inner.html', 'cached')
+        self.write('tmpl/part.html', 'new part', age=5)
+        self.config = Config(self.root)
+        self.config.storage.load()
+        post = self.config['a']
+        self.assertTrue(post.is_inner_html_fresh)
+        self.assertFalse(post.is_nice_html_fresh)
+        self.assertTrue(post.refresh_html())
+        self.assertIn('new partcached', self.read('a.html'))
+        self.assertTrue(post.is_html_fresh)
+
+    def reload_pushed(self):
+        """Reload config with post marked as pushed"""
+        self.post.changed = False
+        self.config.save()
+        self.config = Config(self.root)
+        self.config.storage.load()
+        return self.config['a']
+
+    def test_template_changed_keeps_post(self):
+        post = self.reload_pushed()
+        stamp = Post.local_stamp.stamp(post)
+        self.write('tmpl/part.html', 'new part', age=5)
+        self.assertTrue(post.refresh_html())
+        self.assertIn('new part', self.read('a.html'))
+        self.assertFalse(post.changed)
+        self.assertFalse(self.config.need_save)
+        self.assertEqual(stamp, Post.local_stamp.stamp(post))
+        self.assertTrue(post.is_html_fresh)
+
+    def test_build_template_changed_keeps_post(self):
+        post = self.reload_pushed()
+        self.write('tmpl/part.html', 'new part', age=5)
+        cmd = BuildCommand(argparse.Namespace(root=self.root, always=False,
+                                              jobs=1))
+        cmd.config = self.config
+        cmd.run()
+        self.assertEqual(1, cmd.rendered)
+        self.assertIn('new part', self.read('a.html'))
+        self.assertFalse(post.changed)
+        self.assertFalse(self.config.need_save)
+
+    def test_source_changed_marks_post(self):
+        post = self.reload_pushed()
+        self.write('a.md', 'new text\n', age=5)
+        self.assertTrue(post.refresh_html())
+        self.assertTrue(post.changed)
+        self.assertIsNotNone(post.local_stamp)
+
+    def test_abspath_file_changed(self):
+        self.write('tmpl/style.css', 'body {color: red}', age=5)
+        self.assertFalse(self.post.is_nice_html_fresh)
+
+    def test_template_setting_changed(self):
+        self.write('tmpl/other.html', '{{ inner }}')
+        self.config.info.template_file = 'other.html'
+        self.assertFalse(self.post.is_nice_html_fresh)
+        self.assertTrue(self.post.is_inner_html_fresh)
+
+    def test_unrelated_file(self):
+        self.write('tmpl/unused.html', 'unused')
+        self.assertTrue(self.post.is_html_fresh)
+
+    def test_inner_target(self):
+        self.write('a.md', 'other text\n', age=5)
+        self.assertTrue(self.post.refresh_html(targets=(self.post.INNER,)))
+        self.assertTrue(self.post.is_inner_html_fresh)
+        self.assertFalse(self.post.is_nice_html_fresh)
+        self.assertIn('other text', self.post.inner_html())
+        self.assertIn('other text', self.post.nice_html())
+        self.assertTrue(self.post.is_html_fresh)
+
+    def test_title_changed(self):
+        self.post.title = u'New title'
+        self.assertTrue(self.post.is_inner_html_fresh)
+        self.assertFalse(self.post.is_nice_html_fresh)
+
+
+class TestProjectFreshness(ManifestTestCase):
+    def test_single_scan(self):
+        with open(os.path.join(self.root, Config.CONFIG_FILENAME), 'w'):
+            pass
+        config = self.config = Config(self.root)
+        config.storage.load()
+        for i in range(20):
+            self.write('%d.md' % i, 'text %d\n' % i)
+            config.add(str(i), '%d.md' % i).refresh_html()
+        config.save()
+        config.close()
+
+        self.config = Config(self.root)
+        self.config.storage.load()
+        calls = []
+        impl = self.config.fs._impl
+
+        def listdir(path):
+            calls.append(path)
+            return os.listdir(path)
+        impl.listdir = listdir
+        for post in self.config:
+            self.assertTrue(post.is_html_fresh)
+        self.assertEqual([self.root], calls)
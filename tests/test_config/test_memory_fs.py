@@ -0,0 +1,57 @@
+# -*- encoding: utf-8 -*-
+
+import time
+import unittest
+
+from bloggertool.config.memory_fs import MemoryFileSystem
+from bloggertool.exceptions import FileNotFoundError
+
+
+class TestMemoryFileSystem(unittest.TestCase):
+    def setUp(self):
+        self.fs = MemoryFileSystem('/project')
+        self.impl = self.fs.impl
+
+    def test_read(self):
+        self.impl.store('/project/a.md', u'Русский'.encode('utf-8'),
+                        mtime=1000)
+        self.assertTrue(self.fs.exists('a.md'))
+        self.assertFalse(self.fs.exists('b.md'))
+        self.assertEqual(1000, self.fs.getmtime('a.md'))
+        self.assertEqual(14, self.fs.stat('a.md').st_size)
+        with self.fs.open('a.md', 'r') as f:
+            self.assertEqual(u'Русский', f.read())
+        with self.fs.open('a.md', 'rb', None) as f:
+            self.assertEqual(u'Русский'.encode('utf-8'), f.read())
+        self.assertEqual({'listdir': 1, 'stat': 1, 'open': 2},
+                         dict(self.impl.counts))
+        self.assertEqual(28, self.impl.bytes_read)
+        self.assertRaises(FileNotFoundError, self.fs.open, 'b.md', 'r')
+
+    def test_write(self):
+        with self.fs.open('a.html', 'w') as f:
+            f.write(u'Русский')
+        self.fs.write('b.html', u'текст')
+        self.fs.flush()
+        self.assertEqual(u'Русский'.encode('utf-8'),
+                         self.impl.load('/project/a.html'))
+        self.assertEqual(u'текст'.encode('utf-8'),
+                         self.impl.load('/project/b.html'))
+        self.assertEqual(24, self.impl.bytes_written)
+        self.assertEqual(['a.html', 'b.html'],
+                         self.impl.listdir('/project'))
+        self.fs.write('missing/c.html', u'text')
+        self.assertRaises(IOError, self.fs.flush)
+
+    def test_reset_counts(self):
+        self.fs.exists('a.md')
+        self.assertEqual(1, self.impl.total)
+        self.impl.reset_counts()
+        self.assertEqual(0, self.impl.total)
+
+    def test_latency(self):
+        self.impl.latency = 0.01
+        start = time.time()
+        for i in range(5):
+            self.impl.exists('/project/a.md')
+        self.assertGreaterEqual(time.time() - start, 0.05)
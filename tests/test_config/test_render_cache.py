@@ -0,0 +1,134 @@
+import os
+import shutil
+import unittest
+
+from bloggertool.config import Config
+from bloggertool.config.render_cache import RenderCache
+from bloggertool.engine import get_engine, MARKDOWN
+
+
+class RenderCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        here = os.path.dirname(os.path.abspath(__file__))
+        self.root = os.path.join(here, 'tmp_render_cache')
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+        os.makedirs(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+
+class TestRenderCache(RenderCacheTestCase):
+    def setUp(self):
+        super(TestRenderCache, self).setUp()
+        self.cache = RenderCache(os.path.join(self.root, 'render'),
+                                 max_size=1000)
+
+    def test_key(self):
+        self.assertEqual(RenderCache.key('a', 1, (u'x',)),
+                         RenderCache.key('a', 1, (u'x',)))
+        self.assertNotEqual(RenderCache.key('a', 1),
+                            RenderCache.key('a', 2))
+
+    def test_get_put(self):
+        key = RenderCache.key('a')
+        self.assertEqual(None, self.cache.get(key))
+        self.cache.put(key, (u'html', None))
+        self.assertEqual((u'html', None), self.cache.get(key))
+        with open(self.cache.path(key), 'rb') as f:
+            self.assertNotIn('html', f.read())  # compressed
+
+    def test_broken_entry(self):
+        key = RenderCache.key('a')
+        self.cache.put(key, u'html')
+        with open(self.cache.path(key), 'wb') as f:
+            f.write('garbage')
+        self.assertEqual(None, self.cache.get(key))
+
+    def test_trim(self):
+        keys = [RenderCache.key(i) for i in range(10)]
+        for i, key in enumerate(keys):
+            self.cache.put(key, os.urandom(200))
+            stamp = 1000000 + i
+            os.utime(self.cache.path(key), (stamp, stamp))
+        # first entry is recently used
+        self.cache.get(keys[0])
+        self.cache.trim()
+        left = [key for key in keys if self.cache.get(key) is not None]
+        # about 210 bytes per entry, trimmed down to 800 bytes
+        self.assertEqual(keys[:1] + keys[8:], left)
+
+    def test_trim_not_written(self):
+        key = RenderCache.key('a')
+        self.cache.put(key, os.urandom(2000))
+        cache = RenderCache(self.cache.folder, max_size=1000)
+        cache.trim()
+        self.assertNotEqual(None, cache.get(key))
+        cache.trim(force=True)
+        self.assertEqual(None, cache.get(key))
+
+
+class TestPostRenderCache(RenderCacheTestCase):
+    def setUp(self):
+        super(TestPostRenderCache, self).setUp()
+        with open(os.path.join(self.root, Config.CONFIG_FILENAME), 'w'):
+            pass
+        os.makedirs(os.path.join(self.root, 'tmpl'))
+        with open(os.path.join(self.root, 'tmpl', 'page.html'), 'w') as f:
+            f.write('<title>{{ title }}</title>{{ inner }}')
+        with open(os.path.join(self.root, 'a.md'), 'w') as f:
+            f.write('Title: A\n\ntext\n')
+        self.engine = get_engine(MARKDOWN)
+        self.calls = []
+        self.engine.do = self.do
+
+    def tearDown(self):
+        del self.engine.do
+        self.config.fs.flush()
+        super(TestPostRenderCache, self).tearDown()
+
+    def do(self, source, cache=None):
+        self.calls.append(source)
+        return type(self.engine).do(self.engine, source, cache)
+
+    def make_config(self):
+        config = self.config = Config(self.root)
+        config.storage.load()
+        config.info.template_dir = 'tmpl'
+        config.info.template_file = 'page.html'
+        return config
+
+    def read(self, rel_path):
+        self.config.fs.flush()
+        with open(os.path.join(self.root, rel_path)) as f:
+            return f.read()
+
+    def test_shared_between_posts(self):
+        with open(os.path.join(self.root, 'b.md'), 'w') as f:
+            f.write('Title: A\n\ntext\n')
+        config = self.make_config()
+        config.add('a', 'a.md').refresh_html()
+        b = config.add('b', 'b.md')
+        b.refresh_html()
+        self.assertEqual(1, len(self.calls))
+        self.assertEqual(u'A', b.title)
+        self.assertEqual(self.read('a.html'), self.read('b.html'))
+
+    def test_sidecars_removed(self):
+        config = self.make_config()
+        config.add('a', 'a.md').refresh_html()
+        html = self.read('a.html')
+        os.remove(os.path.join(self.root, 'a.html'))
+        os.remove(os.path.join(self.root, 'a.inner.html'))
+        config.fs.invalidate()
+        self.assertTrue(config['a'].refresh_html())
+        self.assertEqual(1, len(self.calls))
+        self.assertEqual(html, self.read('a.html'))
+
+    def test_force(self):
+        config = self.make_config()
+        post = config.add('a', 'a.md')
+        post.refresh_html()
+        post.refresh_html(force=True)
+        self.assertEqual(2, len(self.calls))
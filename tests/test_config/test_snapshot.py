@@ -0,0 +1,68 @@
+import os
+import shutil
+import unittest
+
+from bloggertool.config.snapshot import Snapshot
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        here = os.path.dirname(os.path.abspath(__file__))
+        self.root = os.path.join(here, 'tmp_snapshot')
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+        os.makedirs(self.root)
+        self.source = os.path.join(self.root, 'source.yaml')
+        self.snapshot = Snapshot(os.path.join(self.root, 'cache', 'snap'),
+                                 self.source)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, text):
+        with open(self.source, 'w') as f:
+            f.write(text)
+        return os.stat(self.source)
+
+    def test_missing(self):
+        self.write('a: 1')
+        self.assertEqual(None, self.snapshot.load())
+
+    def test_valid(self):
+        st = self.write('a: 1')
+        self.snapshot.save({'a': 1}, 'a: 1', st)
+        self.assertEqual({'a': 1}, self.snapshot.load())
+
+    def test_not_racy(self):
+        st = self.write('a: 1')
+        old = st.st_mtime - 10
+        os.utime(self.source, (old, old))
+        self.snapshot.save({'a': 1}, 'a: 1', os.stat(self.source))
+        # same size and mtime, content is not checked anymore
+        with open(self.source, 'w') as f:
+            f.write('a: 2')
+        os.utime(self.source, (old, old))
+        self.assertEqual({'a': 1}, self.snapshot.load())
+
+    def test_same_size_edit(self):
+        st = self.write('a: 1')
+        self.snapshot.save({'a': 1}, 'a: 1', st)
+        self.write('a: 2')
+        self.assertEqual(None, self.snapshot.load())
+
+    def test_touched(self):
+        st = self.write('a: 1')
+        self.snapshot.save({'a': 1}, 'a: 1', st)
+        os.utime(self.source, (st.st_mtime + 100, st.st_mtime + 100))
+        self.assertEqual({'a': 1}, self.snapshot.load())
+
+    def test_size_changed(self):
+        st = self.write('a: 1')
+        self.snapshot.save({'a': 1}, 'a: 1', st)
+        self.write('a: 10')
+        self.assertEqual(None, self.snapshot.load())
+
+    def test_unmarshallable(self):
+        st = self.write('a: 1')
+        self.snapshot.save({'a': object()}, 'a: 1', st)
+        self.assertFalse(os.path.exists(self.snapshot.filename))
@@ -0,0 +1,83 @@
+# -*- encoding: utf-8 -*-
+
+import time
+import unittest
+
+from bloggertool.config.memory_fs import MemoryFileSystem
+from bloggertool.config.source_index import SourceIndex
+from bloggertool.exceptions import FileNotFoundError
+
+
+class TestSourceIndex(unittest.TestCase):
+    def setUp(self):
+        self.filename = '/project/.blogspot.cache/sources'
+        self.fs = MemoryFileSystem('/project')
+        self.impl = self.fs.impl
+        self.index = SourceIndex(self.filename, self.fs)
+
+    def store(self, text, mtime=1000):
+        self.impl.store('/project/a.md', text.encode('utf-8'), mtime)
+        self.fs.invalidate()
+        self.impl.reset_counts()
+
+    def test_scan(self):
+        self.store(u'Title: Заголовок\nLabels: a\n\nТекст поста')
+        meta = self.index.scan('a.md', 'utf-8')
+        self.assertEqual('Markdown', meta.doctype)
+        self.assertEqual(u'Заголовок', meta.title)
+        self.assertEqual(frozenset([u'a']), meta.labels)
+        self.assertEqual(2, meta.words)
+        self.assertEqual(1, self.impl.counts['read'])
+
+    def test_persisted(self):
+        self.store(u'Title: Post\n\ntext')
+        self.index.scan('a.md', 'utf-8')
+        self.index.save()
+        self.fs.invalidate()
+        self.impl.reset_counts()
+        index = SourceIndex(self.filename, self.fs)
+        self.assertEqual(u'Post', index.scan('a.md', 'utf-8').title)
+        self.assertEqual(0, self.impl.bytes_read)
+
+    def test_changed(self):
+        self.store(u'Title: Post\n\ntext')
+        self.index.scan('a.md', 'utf-8')
+        self.store(u'Title: New post\n\ntext', mtime=2000)
+        self.assertEqual(u'New post', self.index.scan('a.md', 'utf-8').title)
+        self.assertEqual(1, self.impl.counts['read'])
+
+    def test_touched(self):
+        self.store(u'Title: Post\n\ntext')
+        self.index.scan('a.md', 'utf-8')
+        self.store(u'Title: Post\n\ntext', mtime=2000)
+        self.assertEqual(u'Post', self.index.scan('a.md', 'utf-8').title)
+        # content is hashed, stat is remembered
+        self.assertEqual(1, self.impl.counts['read'])
+        self.fs.invalidate()
+        self.index.scan('a.md', 'utf-8')
+        self.assertEqual(1, self.impl.counts['read'])
+
+    def test_racy(self):
+        self.store(u'Title: Post\n\ntext', mtime=time.time())
+        self.index.scan('a.md', 'utf-8')
+        self.fs.invalidate()
+        self.index.scan('a.md', 'utf-8')
+        # same stat but modified shortly before scan
+        self.assertEqual(2, self.impl.counts['read'])
+
+    def test_encoding(self):
+        self.store(u'Title: Пост\n\ntext')
+        self.index.scan('a.md', 'utf-8')
+        meta = self.index.scan('a.md', 'cp1251')
+        self.assertEqual(u'Пост'.encode('utf-8').decode('cp1251'),
+                         meta.title)
+
+    def test_missing(self):
+        self.assertRaises(FileNotFoundError, self.index.scan,
+                          'a.md', 'utf-8')
+
+    def test_drop(self):
+        self.store(u'text')
+        self.index.scan('a.md', 'utf-8')
+        self.index.drop('a.md')
+        self.assertEqual({}, self.index.entries)
@@ -0,0 +1,410 @@
+import os
+import shutil
+import unittest
+
+from bloggertool.config import Config
+from bloggertool.config.storage import (YamlStorage, JournalStorage,
+                                        ShardedStorage, SqliteStorage)
+
+
+class StorageTestCase(unittest.TestCase):
+    def setUp(self):
+        here = os.path.dirname(os.path.abspath(__file__))
+        self.root = os.path.join(here, 'tmp_storage')
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+        os.makedirs(self.root)
+        with open(os.path.join(self.root, Config.CONFIG_FILENAME), 'w'):
+            pass
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, rel_path, text):
+        with open(os.path.join(self.root, rel_path), 'w') as f:
+            f.write(text)
+
+    def make_config(self):
+        config = Config(self.root)
+        config.storage.load()
+        return config
+
+
+class TestYamlStorage(StorageTestCase):
+    def test_default(self):
+        config = Config(self.root)
+        self.assertEqual(YamlStorage, type(config.storage))
+
+    def test_roundtrip(self):
+        self.write('a.md', 'text')
+        config = self.make_config()
+        post = config.add('a', 'a.md')
+        post.labels = ['x', 'y']
+        config.info.blogid = '123'
+        config.save()
+
+        config2 = self.make_config()
+        self.assertEqual(1, len(config2))
+        self.assertEqual(frozenset([u'x', u'y']), config2['a'].labels)
+        self.assertEqual(u'123', config2.info.blogid)
+
+
+class TestJournalStorage(StorageTestCase):
+    def setUp(self):
+        super(TestJournalStorage, self).setUp()
+        self.write(Config.JOURNAL_FILENAME, '')
+        self.write('a.md', 'text a')
+        self.write('b.md', 'text b')
+
+    def journal(self):
+        with open(os.path.join(self.root, Config.JOURNAL_FILENAME)) as f:
+            return f.read()
+
+    def test_detect(self):
+        config = Config(self.root)
+        self.assertEqual(JournalStorage, type(config.storage))
+
+    def test_append_only_changed(self):
+        config = self.make_config()
+        config.add('a', 'a.md')
+        config.add('b', 'b.md')
+        config.save()
+        self.assertEqual(2, self.journal().count('---'))
+
+        config = self.make_config()
+        self.assertEqual(2, len(config))
+        config['a'].title = 'Title'
+        config.save()
+        self.assertEqual(3, self.journal().count('---'))
+
+        config = self.make_config()
+        self.assertEqual(u'Title', config['a'].title)
+        self.assertEqual(u'', config['b'].title)
+
+    def test_drop(self):
+        config = self.make_config()
+        config.add('a', 'a.md')
+        config.add('b', 'b.md')
+        config.save()
+
+        config = self.make_config()
+        config.drop('a')
+        config.save()
+
+        config = self.make_config()
+        self.assertEqual(['b'], [post.name for post in config])
+
+    def test_compact(self):
+        config = self.make_config()
+        config.storage.JOURNAL_LIMIT = 2
+        config.add('a', 'a.md')
+        config.save()
+        config['a'].title = 'Title'
+        config.add('b', 'b.md')
+        config.save()
+        self.assertEqual('', self.journal())
+
+        config = self.make_config()
+        self.assertEqual(2, len(config))
+        self.assertEqual(u'Title', config['a'].title)
+
+    def test_broken_tail(self):
+        config = self.make_config()
+        config.add('a', 'a.md')
+        config.save()
+        with open(os.path.join(self.root, Config.JOURNAL_FILENAME),
+                  'a') as f:
+            f.write('--- {post: b, data: [\n')
+
+        config = self.make_config()
+        self.assertEqual(['a'], [post.name for post in config])
+        config['a'].title = 'Title'
+        config.save()
+        self.assertEqual('', self.journal())
+
+
+class TestSqliteStorage(StorageTestCase):
+    def setUp(self):
+        super(TestSqliteStorage, self).setUp()
+        self.write('a.md', 'text a')
+        self.write('b.md', 'text b')
+        config = self.make_config()
+        post = config.add('a', 'a.md')
+        post.labels = ['x']
+        post.postid = '1'
+        config.add('b', 'b.md')
+        config.info.blogid = '123'
+        SqliteStorage(config).create()
+
+    def test_detect(self):
+        config = Config(self.root)
+        self.assertEqual(SqliteStorage, type(config.storage))
+
+    def test_lazy_lookup(self):
+        config = self.make_config()
+        self.assertEqual(u'123', config.info.blogid)
+        self.assertEqual({}, config._posts)
+        post = config['a']
+        self.assertEqual(frozenset([u'x']), post.labels)
+        self.assertEqual(u'1', post.postid)
+        self.assertEqual(['a'], config._posts.keys())
+        self.assertTrue('b' in config)
+        self.assertFalse('c' in config)
+        self.assertRaises(KeyError, config.__getitem__, 'c')
+        self.assertEqual(2, len(config))
+
+    def test_save_changed(self):
+        config = self.make_config()
+        config['b'].title = 'Title'
+        config.drop('a')
+        config.save()
+
+        config = self.make_config()
+        self.assertEqual(['b'], [post.name for post in config])
+        self.assertEqual(u'Title', config['b'].title)
+
+    def test_labels_table(self):
+        config = self.make_config()
+        config['a'].labels = ['y', 'z']
+        config.save()
+        rows = config.storage.conn.execute(
+            "SELECT label, name FROM labels ORDER BY label").fetchall()
+        self.assertEqual([(u'y', u'a'), (u'z', u'a')], rows)
+
+    def test_back_to_yaml(self):
+        config = self.make_config()
+        YamlStorage(config).create()
+        os.remove(config.db_filename)
+
+        config = self.make_config()
+        self.assertEqual(YamlStorage, type(config.storage))
+        self.assertEqual(2, len(config))
+        self.assertEqual(u'1', config['a'].postid)
+        self.assertEqual(u'123', config.info.blogid)
+
+
+class TestLazyRecords(StorageTestCase):
+    def setUp(self):
+        super(TestLazyRecords, self).setUp()
+        self.write('a.md', 'text a')
+        self.write('b.md', 'text b')
+        config = self.make_config()
+        config.add('a', 'a.md')
+        config.add('b', 'b.md')
+        config.save()
+
+    def test_load_keeps_raw(self):
+        config = self.make_config()
+        self.assertEqual({}, config._posts)
+        self.assertEqual(set(['a', 'b']), set(config._records))
+        self.assertEqual(2, len(config))
+        self.assertTrue('a' in config)
+        self.assertEqual(['a'], config._posts.keys())
+        self.assertEqual(['b'], config._records.keys())
+
+    def test_save_untouched_as_is(self):
+        config = self.make_config()
+        raw = dict(config._records['b'])
+        config['a'].title = 'Title'
+        config.save()
+
+        config = self.make_config()
+        self.assertEqual(raw, config._records['b'])
+        self.assertEqual(u'Title', config['a'].title)
+
+    def test_iter_materializes(self):
+        config = self.make_config()
+        self.assertEqual(['a', 'b'], sorted(post.name for post in config))
+        self.assertEqual({}, config._records)
+
+    def test_snapshot(self):
+        config = self.make_config()
+        self.assertTrue(config.storage.snapshot.load() is not None)
+        config['a'].title = 'Title'
+        config.save()
+
+        config = self.make_config()
+        self.assertEqual(u'Title', config['a'].title)
+
+
+class TestShardedStorage(StorageTestCase):
+    def setUp(self):
+        super(TestShardedStorage, self).setUp()
+        os.makedirs(os.path.join(self.root, 'dir'))
+        self.write('a.md', 'text a')
+        self.write('dir/b.md', 'text b')
+        config = self.make_config()
+        config.add('a', 'a.md')
+        config.add('dir/b', 'dir/b.md')
+        config.info.blogid = '123'
+        ShardedStorage(config).create()
+
+    def shard(self, name):
+        return os.path.join(self.root, Config.SHARDS_DIRNAME,
+                            name + ShardedStorage.SUFFIX)
+
+    def test_detect(self):
+        config = Config(self.root)
+        self.assertEqual(ShardedStorage, type(config.storage))
+
+    def test_layout(self):
+        self.assertTrue(os.path.exists(self.shard('a')))
+        self.assertTrue(os.path.exists(self.shard('dir/b')))
+        config = self.make_config()
+        self.assertEqual(u'123', config.info.blogid)
+        self.assertEqual({}, config._posts)
+        self.assertEqual(set(['a', 'dir/b']), set(config._names()))
+
+    def test_save_only_changed(self):
+        old = int(os.path.getmtime(self.shard('a'))) - 10
+        os.utime(self.shard('a'), (old, old))
+        config = self.make_config()
+        config['dir/b'].title = 'Title'
+        config.save()
+        self.assertEqual(old, os.path.getmtime(self.shard('a')))
+
+        config = self.make_config()
+        self.assertEqual(u'Title', config['dir/b'].title)
+
+    def test_drop(self):
+        config = self.make_config()
+        config.drop('a')
+        config.save()
+        self.assertFalse(os.path.exists(self.shard('a')))
+        config = self.make_config()
+        self.assertEqual(['dir/b'], [post.name for post in config])
+
+    def test_back_to_yaml(self):
+        config = self.make_config()
+        YamlStorage(config).create()
+        shutil.rmtree(config.shards_dir)
+
+        config = self.make_config()
+        self.assertEqual(YamlStorage, type(config.storage))
+        self.assertEqual(2, len(config))
+        self.assertEqual(u'123', config.info.blogid)
+
+
+class TestIndex(StorageTestCase):
+    def setUp(self):
+        super(TestIndex, self).setUp()
+        os.makedirs(os.path.join(self.root, 'dir'))
+        for name in ('a', 'dir/b', 'dir/c'):
+            self.write(name + '.md', 'text')
+        config = self.make_config()
+        a = config.add('a', 'a.md')
+        a.postid = '1'
+        a.link = 'http://a'
+        a.labels = ['x', 'y']
+        b = config.add('dir/b', 'dir/b.md')
+        b.labels = ['x']
+        config.add('dir/c', 'dir/c.md')
+        config.save()
+
+    def check(self, config):
+        self.assertEqual('a', config.post_by_postid('1').name)
+        self.assertEqual(None, config.post_by_postid('2'))
+        self.assertEqual('a', config.post_by_link('http://a').name)
+        self.assertEqual(['a', 'dir/b'],
+                         [p.name for p in config.posts_by_label('x')])
+        self.assertEqual(['dir/b', 'dir/c'],
+                         [p.name for p in config.posts_by_prefix('dir/')])
+        self.assertEqual([u'x', u'y'], config.labels())
+
+    def test_raw_records(self):
+        config = self.make_config()
+        self.assertEqual('a', config.post_by_postid('1').name)
+        self.assertEqual(['a'], config._posts.keys())
+        self.check(config)
+
+    def test_sqlite(self):
+        SqliteStorage(self.make_config()).create()
+        config = self.make_config()
+        self.assertEqual('a', config.post_by_postid('1').name)
+        self.assertEqual(['a'], config._posts.keys())
+        self.check(config)
+
+    def test_sqlite_queries(self):
+        SqliteStorage(self.make_config()).create()
+        config = self.make_config()
+
+        def fail():
+            self.fail("full scan")
+        config.storage.index_rows = fail
+        config.storage.fetch_all = fail
+        self.assertEqual('a', config.post_by_postid('1').name)
+        self.assertEqual(['a'], config._posts.keys())
+        self.assertEqual('a', config.post_by_link('http://a').name)
+        self.assertEqual(None, config.post_by_link('http://b'))
+        config['dir/c']  # unlabeled post
+        self.assertEqual(['a', 'dir/b'],
+                         [p.name for p in config.posts_by_label('x')])
+        # unsaved changes of loaded posts
+        config['a'].postid = '2'
+        config['dir/b'].labels = ['z']
+        config.drop('dir/c')
+        self.assertEqual(None, config.post_by_postid('1'))
+        self.assertEqual('a', config.post_by_postid('2').name)
+        self.assertEqual(['a'],
+                         [p.name for p in config.posts_by_label('x')])
+        self.assertEqual(['dir/b'],
+                         [p.name for p in config.posts_by_label('z')])
+        self.assertEqual(None, config._index)
+
+    def test_sharded(self):
+        ShardedStorage(self.make_config()).create()
+        self.check(self.make_config())
+
+    def test_updates(self):
+        config = self.make_config()
+        config.index
+        a = config['a']
+        a.postid = '2'
+        a.link = 'http://a2'
+        a.labels = ['y']
+        self.assertEqual(None, config.post_by_postid('1'))
+        self.assertEqual(a, config.post_by_postid('2'))
+        self.assertEqual(a, config.post_by_link('http://a2'))
+        self.assertEqual(['dir/b'],
+                         [p.name for p in config.posts_by_label('x')])
+
+    def test_add_drop(self):
+        config = self.make_config()
+        config.index
+        config.drop('a')
+        self.assertEqual(None, config.post_by_postid('1'))
+        self.assertEqual([u'x'], config.labels())
+        self.write('dir/d.md', 'text')
+        config.add('dir/d', 'dir/d.md')
+        self.assertEqual(['dir/b', 'dir/c', 'dir/d'],
+                         [p.name for p in config.posts_by_prefix('dir')])
+
+    def test_label_queries(self):
+        config = self.make_config()
+        config['dir/c'].labels = ['y', 'z']
+        self.assertEqual(['a'],
+                         [p.name for p in config.posts_by_labels(['x', 'y'])])
+        self.assertEqual(['a', 'dir/c'],
+                         [p.name for p in config.posts_by_labels(
+                             any_labels=['y', 'z'])])
+        self.assertEqual(['dir/c'],
+                         [p.name for p in config.posts_by_labels(
+                             ['z'], ['x', 'y'])])
+        self.assertEqual([], config.posts_by_labels(['unknown']))
+        self.assertEqual({'x': 2, 'y': 2, 'z': 1}, config.label_counts())
+        self.assertEqual({'x': 1, 'y': 1},
+                         config.label_counts(['a', 'dir/d']))
+
+    def test_rename_label(self):
+        config = self.make_config()
+        config.save()
+        posts = config.rename_label('y', 'w')
+        self.assertEqual(['a'], [p.name for p in posts])
+        self.assertEqual(frozenset(['x', 'w']), config['a'].labels)
+        self.assertTrue(config['a'].need_save)
+        self.assertFalse(config['dir/b'].need_save)
+        self.assertEqual([u'w', u'x'], config.labels())
+        config.save()
+        config = self.make_config()
+        self.assertEqual(['a'],
+                         [p.name for p in config.posts_by_label('w')])
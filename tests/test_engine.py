@@ -0,0 +1,329 @@
+# -*- encoding: utf-8 -*-
+
+import os
+import random
+import shutil
+import sys
+import unittest
+
+import markdown
+
+from docutils.core import publish_parts
+
+from bloggertool.engine import get_engine, Meta, MARKDOWN, REST
+from bloggertool.config.render_cache import RenderCache
+from bloggertool.engine.markdown import Engine
+from bloggertool.engine.rest import Engine as RestEngine
+from bloggertool.engine.scan import scan, ScanMeta
+
+
+DOCS = [
+    u"""Title: First
+Labels: a, b
+
+# Header
+
+Text with footnote[^1] and HTML abbr.
+
+*[HTML]: Hyper Text Markup Language
+
+[^1]: Footnote text.
+""",
+    u"""Slug: second
+
+[TOC]
+
+# Header
+
+## Header
+
+Term
+:   Definition
+
+| a | b |
+|---|---|
+| 1 | 2 |
+""",
+    u"""# Header
+
+Plain text, no meta, HTML is not abbreviation here.
+
+```
+code
+```
+""",
+]
+
+
+class TestMarkdownEngine(unittest.TestCase):
+    def fresh(self, source):
+        md = markdown.Markdown(extensions=get_engine(MARKDOWN).MARKDOWN_EXTS)
+        return md.convert(source)
+
+    def test_cached(self):
+        self.assertIs(get_engine(MARKDOWN), get_engine(MARKDOWN))
+        self.assertIs(get_engine(REST), get_engine(REST))
+
+    def test_reused_output(self):
+        engine = get_engine(MARKDOWN)
+        for i in range(2):
+            for source in DOCS:
+                html, meta = engine.do(source)
+                self.assertEqual(self.fresh(source), html)
+
+    def test_meta_not_leaked(self):
+        engine = get_engine(MARKDOWN)
+        html, meta = engine.do(DOCS[0])
+        self.assertEqual(u'First', meta.title)
+        self.assertEqual(frozenset([u'a', u'b']), meta.labels)
+        html, meta = engine.do(DOCS[1])
+        self.assertEqual(None, meta.title)
+        self.assertEqual(u'second', meta.slug)
+        html, meta = engine.do(DOCS[2])
+        self.assertEqual(None, meta.title)
+        self.assertEqual(None, meta.slug)
+
+
+PARTS = [
+    u"Para with [link][id] and HTML.",
+    u"[id]: http://example.com \"Title\"",
+    u"[other]: http://example.org\n  'Other'",
+    u"*[HTML]: Hyper Text Markup Language",
+    u"Use [other] and CSS here.",
+    u"*[CSS]: Cascading Style Sheets",
+    u"# Header",
+    u"Setext\n======",
+    u"Head\n----",
+    u"* a\n* b",
+    u"+ plus\n+ more",
+    u"1. one\n2. two",
+    u"- item\n\n    para in item",
+    u"- a\n    - nested",
+    u"text\n* not list",
+    u"    code\n    more",
+    u"\tTab code",
+    u"  indented 2",
+    u"> quote\n> more",
+    u"para\n> quote",
+    u"> quote\n\n    indented",
+    u"Term\n:   Definition",
+    u":   lone definition",
+    u"```\ncode\n\n<b>\n```",
+    u"~~~ python\nx = 1\n~~~",
+    u"---",
+    u"* * *",
+    u"| a | b |\n|---|---|\n| 1 | 2 |",
+    u"Note: looks like meta",
+    u"**bold** and `code` and *HTML*",
+    u"",
+]
+
+SEPARATORS = [u"\n", u"\n\n", u"\n\n\n", u"\n\n\n\n"]
+
+
+class TestIncremental(unittest.TestCase):
+    def setUp(self):
+        self.engine = Engine()
+        self.engine.INCREMENTAL_SIZE = 0
+        self.full = Engine()
+        self.full.INCREMENTAL_SIZE = sys.maxint
+
+    def check(self, source):
+        html, meta = self.engine.do(source)
+        expected, expected_meta = self.full.do(source)
+        self.assertEqual(expected, html, source)
+        self.assertEqual(expected_meta.title, meta.title)
+        self.assertEqual(expected_meta.slug, meta.slug)
+        self.assertEqual(expected_meta.labels, meta.labels)
+
+    def test_random_documents(self):
+        rnd = random.Random(0)
+        incremental = 0
+        for i in range(300):
+            source = u''.join(rnd.choice(PARTS) + rnd.choice(SEPARATORS)
+                              for j in range(rnd.randint(1, 12)))
+            if rnd.random() < 0.3:
+                source = u"Title: Post\nLabels: a, b\n\n" + source
+            if self.engine.convert_blocks(source) is not None:
+                incremental += 1
+            self.check(source)
+        # most documents should not fall back to full render
+        self.assertGreater(incremental, 200)
+
+    def test_documents(self):
+        for source in DOCS:
+            self.check(source)
+
+    def test_fallback(self):
+        for source in [u"Text[^1]\n\n[^1]: Note",
+                       u"[TOC]\n\n# Header",
+                       u"<div>\n\nraw\n\n</div>",
+                       u"# Header\n\ntext\n\n# Header",
+                       u"[id]: http://a\n\ntext\n\n[id]: http://b",
+                       u"header_level: 2\n\n# Header"]:
+            self.assertIsNone(self.engine.convert_blocks(source))
+            self.check(source)
+
+    def test_changed_block(self):
+        sections = [u"## Section %d\n\nText %d with [link] and HTML.\n" %
+                    (i, i) for i in range(10)]
+        footer = u"[link]: http://example.com\n*[HTML]: Hyper"
+        source = u'\n'.join(sections + [footer])
+        self.check(source)
+        rendered = len(self.engine._rendered)
+
+        sections[5] = u"## Section 5\n\nChanged text.\n"
+        source = u'\n'.join(sections + [footer])
+        self.check(source)
+        self.assertEqual(rendered + 1, len(self.engine._rendered))
+
+        # changed reference is used by every block
+        footer = u"[link]: http://example.org\n*[HTML]: Hyper"
+        source = u'\n'.join(sections + [footer])
+        self.check(source)
+        self.assertEqual(2 * rendered + 1, len(self.engine._rendered))
+
+    def test_edits(self):
+        rnd = random.Random(1)
+        parts = [rnd.choice(PARTS) for i in range(20)]
+        for i in range(100):
+            parts[rnd.randrange(len(parts))] = rnd.choice(PARTS)
+            self.check(u'\n\n'.join(parts))
+
+    def test_size_threshold(self):
+        engine = Engine()
+        engine.do(DOCS[2])
+        self.assertEqual(0, len(engine._rendered))
+
+
+META_DOCS = [
+    u"Title: Long\n    title\nSlug: s\nLabels: a,b\n    c\n\ntext",
+    u"Title:\tTabbed\n\tcontinued\n\ntext",
+    u"---\nTitle: Yaml\nLabels: x\n---\ntext here",
+    u"Slug: one\nSlug: two\n\ntext",
+    u"title: lower\nno meta line\n\ntext",
+    u"\n\n  Title: indented\n\ntext",
+    u"Title: crlf\r\nLabels: a\r\n\r\ntext\r\n",
+    u"Not: meta: really\n\ntext",
+]
+
+
+class TestScan(unittest.TestCase):
+    def check(self, source):
+        meta = scan(source)
+        try:
+            html, expected = Engine().do(source)
+        except AssertionError:
+            # engine rejects repeated slug
+            expected = Meta()
+            expected.slug = None
+        self.assertEqual(MARKDOWN, meta.doctype)
+        self.assertEqual(expected.title, meta.title, source)
+        self.assertEqual(expected.slug, meta.slug, source)
+        if 'labels' in vars(expected):
+            self.assertEqual(expected.labels, meta.labels, source)
+        else:
+            self.assertIsNone(meta.labels, source)
+
+    def test_same_as_engine(self):
+        for source in DOCS + META_DOCS:
+            self.check(source)
+
+    def test_words(self):
+        self.assertEqual(3, scan(u"Title: Many words\n\none, two\nthree")
+                         .words)
+        self.assertEqual(2, scan(u"Русский"
+                                 u" текст").words)
+
+    def test_rest(self):
+        meta = scan(u"\n=====\nTitle\n=====\n\nBody of text\n")
+        self.assertEqual(REST, meta.doctype)
+        self.assertEqual(u'Title', meta.title)
+        self.assertEqual(3, meta.words)
+
+    def test_blank(self):
+        meta = scan(u"  \n\n")
+        self.assertIsNone(meta.doctype)
+        self.assertEqual(0, meta.words)
+
+    def test_tuple(self):
+        meta = scan(META_DOCS[0])
+        data = meta.to_tuple()
+        self.assertEqual((MARKDOWN, u'Long title', u's',
+                          (u'a', u'b', u'c'), 1), data)
+        self.assertEqual(data, ScanMeta.from_tuple(data).to_tuple())
+
+
+REST_DOC = u"""=====
+Title
+=====
+
+Some *text* with a link_.
+
+.. _link: http://example.com
+
+Section
+-------
+
+- item [#]_
+
+.. [#] footnote
+"""
+
+
+class CountingEngine(RestEngine):
+    def __init__(self):
+        super(CountingEngine, self).__init__()
+        self.parsed = 0
+
+    def parse(self, source):
+        self.parsed += 1
+        return super(CountingEngine, self).parse(source)
+
+
+class H2Engine(CountingEngine):
+    WRITER_SETTINGS = dict(RestEngine.WRITER_SETTINGS,
+                           initial_header_level=2)
+
+
+class TestRestEngine(unittest.TestCase):
+    def setUp(self):
+        here = os.path.dirname(os.path.abspath(__file__))
+        self.folder = os.path.join(here, 'tmp_rest')
+        self.cache = RenderCache(self.folder)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_do(self):
+        html, meta = CountingEngine().do(REST_DOC)
+        parts = publish_parts(REST_DOC, writer_name='html4css1',
+                              settings_overrides={'output_encoding':
+                                                  'unicode'})
+        self.assertEqual(parts['body'], html)
+        self.assertEqual(u'Title', meta.title)
+        self.assertIsNone(meta.slug)
+
+    def test_no_title(self):
+        html, meta = CountingEngine().do(u"Just text\n")
+        self.assertEqual(u'<p>Just text</p>\n', html)
+        self.assertIsNone(meta.title)
+
+    def test_doctree_reused(self):
+        engine = CountingEngine()
+        html, meta = engine.do(REST_DOC)
+        self.assertEqual(html, engine.do(REST_DOC)[0])
+        self.assertEqual(1, engine.parsed)
+        engine.do(REST_DOC + u"\nMore text.\n")
+        self.assertEqual(2, engine.parsed)
+
+    def test_writer_settings(self):
+        engine = CountingEngine()
+        html, meta = engine.do(REST_DOC, self.cache)
+        self.assertIn(u'<h1>Section</h1>', html)
+        # doctree is loaded from cache, only writer runs
+        h2 = H2Engine()
+        html, meta = h2.do(REST_DOC, self.cache)
+        self.assertIn(u'<h2>Section</h2>', html)
+        self.assertEqual(0, h2.parsed)
+        self.assertNotEqual(engine.signature(), h2.signature())